@@ -0,0 +1,261 @@
+from sqlalchemy import exists, func
+from sqlalchemy.orm import Session
+from datetime import date, datetime
+from typing import Dict, Iterator, Optional, Tuple
+import logging
+from app.aggregates import STATE_VERSION, BatchAggregates, merge_samples
+from app.database import AccountAggregate, AccountAggregateEntry, AnalysisResult, EmailMetadata
+from app.email_batch import MISSING_TIMESTAMP, EmailBatch, name_key
+from app.email_batch_analysis import aggregate_batch
+from app.encryption import EncryptionManager
+from app.subject_clusters import SubjectClusterStore
+
+logger = logging.getLogger(__name__)
+
+# Emails per subject cluster assignment during a rebuild
+_REBUILD_CHUNK = 5000
+# Keys per IN (...) when loading entries to update
+_KEY_CHUNK = 500
+# Top senders of the sketch whose names load() reads (the longest list an endpoint returns)
+_NAMED_SENDERS = 100
+
+SENDER = "sender"
+DAY = "day"
+CLUSTER = "cluster"
+# State fields kept as AccountAggregateEntry rows instead of in encrypted_state
+_KEYED_FIELDS = ("subject_cluster_counts", "subject_cluster_samples", "day_counts")
+
+def _entries(aggregates: BatchAggregates) -> Iterator[Tuple[str, str, int, object]]:
+    """(kind, key, count, detail) of every keyed counter of ``aggregates`` (a batch: it has per-sender counts)."""
+    for sender, count in aggregates.sender_counts.items():
+        yield SENDER, sender, count, {
+            "name": aggregates.sender_names.get(sender),
+            "received": aggregates.sender_name_received.get(sender, MISSING_TIMESTAMP),
+        }
+    for day, count in aggregates.day_counts.items():
+        yield DAY, day.isoformat(), count, None
+    for cluster_id, count in aggregates.subject_cluster_counts.items():
+        yield CLUSTER, str(cluster_id), count, aggregates.subject_cluster_samples.get(cluster_id, [])
+
+
+class AccountAggregateStore:
+    """
+    Account-wide BatchAggregates kept current in O(delta).
+
+    The bounded part of the state (totals, top-k sketches, hour × weekday histogram,
+    categories, date range) is one encrypted row; the unbounded keyed counters (per
+    sender, received day and subject cluster) are AccountAggregateEntry rows, so merging
+    a range's delta rewrites the bounded row and only the entries the delta touches.
+    Exact per-sender counts exist only as those rows: load() reads the distinct sender
+    count and the names of the sketch's top senders, not every sender.
+
+    The first merge into an account creates the row. A null state means the state is
+    not trustworthy (a destructive change happened); deltas are then skipped and the
+    next read rebuilds from the analyzed emails. Methods other than rebuild leave the
+    commit to the caller, so the merge lands in the same transaction as the results. A
+    state written under an older STATE_VERSION is treated as invalid too.
+    """
+
+    def __init__(self, db: Session, user_id: int, account_id: int):
+        self.db = db
+        self.account_id = account_id
+        self.enc_manager = EncryptionManager(user_id)
+
+    def _row(self) -> Optional[AccountAggregate]:
+        return self.db.query(AccountAggregate).filter(
+            AccountAggregate.account_id == self.account_id
+        ).first()
+
+    def _load_summary(self, row: Optional[AccountAggregate]) -> Optional[BatchAggregates]:
+        """The bounded part of the stored state, or None if missing, invalidated or from an older layout."""
+        if row is None or row.encrypted_state is None:
+            return None
+        state = self.enc_manager.decrypt_json(row.encrypted_state)
+        if state.get("version") != STATE_VERSION:
+            return None
+        return BatchAggregates.from_state(state)
+
+    def _write_summary(self, row: Optional[AccountAggregate], aggregates: BatchAggregates) -> None:
+        if row is None:
+            row = AccountAggregate(account_id=self.account_id)
+            self.db.add(row)
+        state = aggregates.to_state()
+        for field in _KEYED_FIELDS:
+            state.pop(field, None)
+        row.encrypted_state = self.enc_manager.encrypt(state)
+        row.email_count = aggregates.total
+        row.updated_at = datetime.utcnow()
+
+    def load(self) -> Optional[BatchAggregates]:
+        """
+        Stored state with its day and cluster counters, distinct sender count and top sender
+        names, or None if missing, invalidated or from an older layout.
+        """
+        aggregates = self._load_summary(self._row())
+        if aggregates is None:
+            return None
+        entries = self.db.query(
+            AccountAggregateEntry.kind,
+            AccountAggregateEntry.key,
+            AccountAggregateEntry.count,
+            AccountAggregateEntry.detail
+        ).filter(
+            AccountAggregateEntry.account_id == self.account_id,
+            AccountAggregateEntry.kind.in_([DAY, CLUSTER])
+        ).yield_per(5000)
+        for kind, key, count, detail in entries:
+            if kind == DAY:
+                aggregates.day_counts[date.fromisoformat(key)] = count
+            elif kind == CLUSTER:
+                aggregates.subject_cluster_counts[int(key)] = count
+                aggregates.subject_cluster_samples[int(key)] = list(detail or [])
+        aggregates.unique_senders = self.db.query(func.count(AccountAggregateEntry.id)).filter(
+            AccountAggregateEntry.account_id == self.account_id,
+            AccountAggregateEntry.kind == SENDER
+        ).scalar() or 0
+        top_senders = [entry.item for entry in aggregates.sender_sketch.top(_NAMED_SENDERS)]
+        if top_senders:
+            senders = self.db.query(AccountAggregateEntry.key, AccountAggregateEntry.detail).filter(
+                AccountAggregateEntry.account_id == self.account_id,
+                AccountAggregateEntry.kind == SENDER,
+                AccountAggregateEntry.key.in_(top_senders)
+            )
+            for key, detail in senders:
+                aggregates.sender_names[key] = detail["name"]
+                aggregates.sender_name_received[key] = detail["received"]
+        return aggregates
+
+    def replace(self, aggregates: BatchAggregates) -> None:
+        """Store a batch's aggregates (with its per-sender counts) as the account's full state."""
+        self._write_summary(self._row(), aggregates)
+        self.db.query(AccountAggregateEntry).filter(
+            AccountAggregateEntry.account_id == self.account_id
+        ).delete(synchronize_session=False)
+        self.db.bulk_insert_mappings(AccountAggregateEntry, [
+            {"account_id": self.account_id, "kind": kind, "key": key, "count": count, "detail": detail}
+            for kind, key, count, detail in _entries(aggregates)
+        ])
+
+    def merge_delta(self, delta: BatchAggregates) -> bool:
+        """
+        Merge one range's aggregates into the stored state; False if the state is invalid.
+        Call after the range's results are flushed: an account without a row gets one,
+        from the delta alone when it is the account's only analyzed data.
+        """
+        row = self._row()
+        if row is None:
+            if self._analyzed_count() == delta.total:
+                self.replace(delta)
+            else:
+                # Emails analyzed before account_aggregates existed; counted once here
+                self._recompute()
+            return True
+        current = self._load_summary(row)
+        if current is None:
+            return False
+        # current has no keyed counters, so the merge costs O(delta)
+        self._write_summary(row, current.merge(delta))
+        self._merge_entries(delta)
+        return True
+
+    def _merge_entries(self, delta: BatchAggregates) -> None:
+        """Add the delta's keyed counters to the stored entries."""
+        by_kind: Dict[str, Dict[str, Tuple[int, object]]] = {}
+        for kind, key, count, detail in _entries(delta):
+            by_kind.setdefault(kind, {})[key] = (count, detail)
+        for kind, entries in by_kind.items():
+            keys = sorted(entries)
+            existing: Dict[str, AccountAggregateEntry] = {}
+            for start in range(0, len(keys), _KEY_CHUNK):
+                rows = self.db.query(AccountAggregateEntry).filter(
+                    AccountAggregateEntry.account_id == self.account_id,
+                    AccountAggregateEntry.kind == kind,
+                    AccountAggregateEntry.key.in_(keys[start:start + _KEY_CHUNK])
+                ).all()
+                existing.update((row.key, row) for row in rows)
+            for key, (count, detail) in entries.items():
+                row = existing.get(key)
+                if row is None:
+                    self.db.add(AccountAggregateEntry(
+                        account_id=self.account_id, kind=kind, key=key, count=count, detail=detail
+                    ))
+                    continue
+                row.count += count
+                if kind == SENDER:
+                    # The same name choice as BatchAggregates.merge
+                    if name_key(detail["received"], detail["name"]) > name_key(
+                        row.detail["received"], row.detail["name"]
+                    ):
+                        row.detail = detail
+                elif kind == CLUSTER:
+                    row.detail = merge_samples(row.detail, detail)
+
+    def _analyzed_count(self) -> int:
+        return self.db.query(func.count(EmailMetadata.id)).filter(
+            EmailMetadata.account_id == self.account_id,
+            exists().where(AnalysisResult.email_id == EmailMetadata.id)
+        ).scalar() or 0
+
+    def invalidate(self) -> None:
+        """Mark the state stale after emails or results were deleted outside the delta path."""
+        self.db.query(AccountAggregate).filter(
+            AccountAggregate.account_id == self.account_id
+        ).update({AccountAggregate.encrypted_state: None}, synchronize_session=False)
+
+    def rebuild(self) -> BatchAggregates:
+        """Recompute the state from every analyzed email of the account, commit it and load it."""
+        self._recompute()
+        self.db.commit()
+        aggregates = self.load()
+        logger.info(f"Rebuilt account aggregates for account {self.account_id}: {aggregates.total} emails")
+        return aggregates
+
+    def _recompute(self) -> None:
+        """
+        Rewrite the state from every analyzed email of the account. Emails are read in
+        chunks; each chunk's delta is merged into the summary and its entries, so no
+        per-sender counter of the whole account is held in memory.
+        """
+        self.db.query(AccountAggregateEntry).filter(
+            AccountAggregateEntry.account_id == self.account_id
+        ).delete(synchronize_session=False)
+        rows = self.db.query(
+            EmailMetadata.sender_email,
+            EmailMetadata.sender_name,
+            EmailMetadata.subject,
+            EmailMetadata.date_received
+        ).filter(
+            EmailMetadata.account_id == self.account_id,
+            exists().where(AnalysisResult.email_id == EmailMetadata.id)
+        ).order_by(EmailMetadata.date_received).yield_per(5000)
+
+        summary = BatchAggregates()
+        clusters = SubjectClusterStore(self.db, self.account_id)
+        batch = EmailBatch()
+
+        def add_batch():
+            delta, _ = aggregate_batch(batch, clusters.assign(batch.subjects))
+            self._merge_entries(delta)
+            # The next chunk's entry lookups must see the rows added here
+            self.db.flush()
+            return summary.merge(delta)
+
+        for row in rows:
+            batch.append({
+                'sender_email': row.sender_email,
+                'sender_name': row.sender_name,
+                'subject': row.subject or '',
+                'date_received': row.date_received
+            })
+            if len(batch) >= _REBUILD_CHUNK:
+                summary = add_batch()
+                batch = EmailBatch()
+        if len(batch):
+            summary = add_batch()
+        self._write_summary(self._row(), summary)
+
+    def get_or_rebuild(self) -> BatchAggregates:
+        current = self.load()
+        if current is None:
+            current = self.rebuild()
+        return current
@@ -0,0 +1,119 @@
+"""
+Per-account counters behind /summary.
+
+``account_stats`` holds one row per account with its email count, distinct
+normalized sender count, earliest/latest received date and processed-range
+count, so the summary reads one row per account instead of counting
+email_metadata. Ingestion updates the row incrementally in the same transaction
+as the emails it stores (``record_emails``); DateTracker keeps ``range_count``
+current, and paths that delete emails call ``refresh``, which recomputes the
+row with aggregates over the account's indexes.
+
+``data_version`` is incremented by all of these and by ``bump_versions`` (analysis
+results, recalculation, custom-category changes); it keys app.response_cache.
+"""
+from datetime import datetime
+from typing import Iterable, Optional, Sequence, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import AccountStats, EmailMetadata, ProcessedDateRange
+from app.range_semantics import stored_wall_clock
+
+# Senders per IN (...) when checking which of a chunk's senders are new
+_SENDER_CHUNK = 500
+
+
+def bump_versions(db: Session, account_ids: Sequence[int]) -> None:
+    """Increment data_version of the accounts' stats rows (accounts without one have nothing cached)."""
+    if not account_ids:
+        return
+    db.query(AccountStats).filter(AccountStats.account_id.in_(list(account_ids))).update(
+        {AccountStats.data_version: AccountStats.data_version + 1}, synchronize_session=False
+    )
+
+
+class AccountStatsStore:
+    """Stats row of one account; the caller commits, so counters land with the rows they count."""
+
+    def __init__(self, db: Session, account_id: int):
+        self.db = db
+        self.account_id = account_id
+
+    def get(self) -> Optional[AccountStats]:
+        return self.db.query(AccountStats).filter(AccountStats.account_id == self.account_id).first()
+
+    def get_or_refresh(self) -> AccountStats:
+        """The stats row, computed from the stored emails if the account has none yet."""
+        return self.get() or self.refresh()
+
+    def refresh(self) -> AccountStats:
+        """Recompute the row from email_metadata and processed_date_ranges."""
+        self.db.flush()
+        email_count, earliest, latest = self.db.query(
+            func.count(EmailMetadata.id),
+            func.min(EmailMetadata.date_received),
+            func.max(EmailMetadata.date_received),
+        ).filter(EmailMetadata.account_id == self.account_id).one()
+        sender_count = self.db.query(
+            func.count(func.distinct(EmailMetadata.sender_normalized))
+        ).filter(EmailMetadata.account_id == self.account_id).scalar()
+
+        stats = self.get()
+        if stats is None:
+            stats = AccountStats(account_id=self.account_id)
+            self.db.add(stats)
+        stats.email_count = email_count or 0
+        stats.sender_count = sender_count or 0
+        stats.earliest_date = earliest
+        stats.latest_date = latest
+        stats.range_count = self._count_ranges()
+        stats.data_version = (stats.data_version or 0) + 1
+        return stats
+
+    def new_senders(self, senders: Iterable[str]) -> Set[str]:
+        """The normalized senders that have no stored email in the account yet."""
+        candidates = sorted({sender for sender in senders if sender is not None})
+        known: Set[str] = set()
+        for start in range(0, len(candidates), _SENDER_CHUNK):
+            rows = self.db.query(EmailMetadata.sender_normalized).filter(
+                EmailMetadata.account_id == self.account_id,
+                EmailMetadata.sender_normalized.in_(candidates[start:start + _SENDER_CHUNK])
+            ).distinct().all()
+            known.update(sender for sender, in rows)
+        return set(candidates) - known
+
+    def record_emails(self, stats: AccountStats, dates: Iterable[Optional[datetime]], new_senders: int) -> None:
+        """
+        Count newly inserted emails (their received dates) and ``new_senders`` first-seen senders.
+        Dates are kept as the column stores them (wall clock, tzinfo dropped), so the row matches
+        what ``refresh`` reads back.
+        """
+        for received in dates:
+            stats.email_count = (stats.email_count or 0) + 1
+            received = stored_wall_clock(received)
+            if received is None:
+                continue
+            if stats.earliest_date is None or received < stats.earliest_date:
+                stats.earliest_date = received
+            if stats.latest_date is None or received > stats.latest_date:
+                stats.latest_date = received
+        stats.sender_count = (stats.sender_count or 0) + new_senders
+        stats.data_version = (stats.data_version or 0) + 1
+
+    def refresh_range_count(self) -> None:
+        """Recount processed ranges after DateTracker changed them (no-op before the row exists)."""
+        stats = self.get()
+        if stats is not None:
+            self.db.flush()
+            stats.range_count = self._count_ranges()
+            stats.data_version = (stats.data_version or 0) + 1
+
+    def bump_version(self) -> None:
+        bump_versions(self.db, [self.account_id])
+
+    def _count_ranges(self) -> int:
+        return self.db.query(func.count(ProcessedDateRange.id)).filter(
+            ProcessedDateRange.account_id == self.account_id
+        ).scalar() or 0
@@ -0,0 +1,322 @@
+"""
+Mergeable batch aggregates behind the batch analysis dict.
+
+``BatchAggregates`` holds everything the batch analysis dict is derived from
+(sender and domain top-k sketches, subject cluster and category counters,
+per-day and hour-of-day × weekday histograms, min/max dates) as plain state.
+``merge`` is associative, so an account-level summary can be kept up to date by
+merging each analyzed range's delta into the stored state instead of re-reading
+the mailbox (see app.account_aggregates).
+
+Exact per-sender counts and names exist only for a batch's own emails: they feed
+the batch's sketches and its analysis dict, but are neither merged nor part of
+the state, so the state's sender part stays bounded by the sketch capacity. The
+account store keeps them as per-sender rows.
+
+Nothing depends on the order emails or ranges arrive in, so merged deltas equal
+a rebuild from email_metadata: dates are on the stored clock (wall clock as
+received, tzinfo dropped), each sender's name comes from its latest-received
+email (app.email_batch.name_key), and cluster samples are the cluster's
+smallest distinct subjects.
+"""
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence
+
+from app.categorization import default_engine
+from app.email_batch import MISSING_TIMESTAMP, EmailBatch, from_timestamp, name_key, to_timestamp
+from app.range_semantics import stored_wall_clock
+from app.sender_identity import normalize_sender
+from app.sketches import SpaceSaving
+
+# Unique subjects kept per subject cluster, and clusters listed in the analysis dict
+SUBJECT_SAMPLES_PER_CLUSTER = 3
+TOP_SUBJECT_CLUSTERS = 20
+# Bumped when the state layout changes; older states are rebuilt (app.account_aggregates)
+STATE_VERSION = 8
+HOURS_PER_DAY = 24
+DAYS_PER_WEEK = 7
+
+
+def merge_samples(current: Optional[List[str]], new: Optional[List[str]]) -> List[str]:
+    """The SUBJECT_SAMPLES_PER_CLUSTER smallest distinct subjects of both sample lists."""
+    return sorted(set(current or ()) | set(new or ()))[:SUBJECT_SAMPLES_PER_CLUSTER]
+
+
+def _is_representative(subject) -> bool:
+    return bool(subject) and bool(str(subject).strip())
+
+
+def _representative(samples: List[str]) -> Optional[str]:
+    """Shortest non-blank sample subject, else the first one."""
+    candidates = [subject for subject in samples if _is_representative(subject)]
+    if candidates:
+        return min(candidates, key=len)
+    return samples[0] if samples else None
+
+
+class BatchAggregates:
+    """Counters, min/max and category vector for a set of emails."""
+
+    def __init__(self):
+        self.total = 0
+        # Batch only (see the module docstring): exact count and name per normalized sender,
+        # and the timestamp of the email each name came from (see name_key)
+        self.sender_counts: Counter = Counter()
+        self.sender_names: Dict[str, Optional[str]] = {}
+        self.sender_name_received: Dict[str, int] = {}
+        # Distinct senders; None after a merge (the operands' senders may overlap)
+        self.unique_senders: Optional[int] = 0
+        # Bounded top-k summaries behind the top sender / domain lists
+        self.sender_sketch = SpaceSaving()
+        self.domain_sketch = SpaceSaving()
+        self.subject_cluster_counts: Counter = Counter()
+        self.subject_cluster_samples: Dict[int, List[str]] = {}
+        self.day_counts: Counter = Counter()
+        # (weekday, hour) -> count, on the same clock as day_counts (the received date as parsed)
+        self.hour_weekday_counts: Counter = Counter()
+        self.start: Optional[datetime] = None
+        self.end: Optional[datetime] = None
+        self.categories: Counter = Counter()
+
+    def add(self, email: Dict, category: str, subject_cluster: Optional[int] = None) -> None:
+        """Account for one email (in order) already assigned ``category`` and ``subject_cluster``."""
+        self.total += 1
+
+        identity = normalize_sender(email.get("sender_email", ""))
+        sender = identity.address
+        self.sender_counts[sender] += 1
+        self.unique_senders = len(self.sender_counts)
+        self.sender_sketch.update(sender)
+        if identity.domain:
+            self.domain_sketch.update(identity.domain)
+        received = email.get("date_received")
+        self._offer_name(
+            sender, email.get("sender_name"), MISSING_TIMESTAMP if received is None else to_timestamp(received)
+        )
+
+        if subject_cluster is not None:
+            self.subject_cluster_counts[subject_cluster] += 1
+            self.subject_cluster_samples[subject_cluster] = merge_samples(
+                self.subject_cluster_samples.get(subject_cluster), [email.get("subject") or ""]
+            )
+
+        if received:
+            self.day_counts[received.date()] += 1
+            self.hour_weekday_counts[(received.weekday(), received.hour)] += 1
+        if received is not None:
+            normalized = stored_wall_clock(received)
+            if self.start is None or normalized < self.start:
+                self.start = normalized
+            if self.end is None or normalized > self.end:
+                self.end = normalized
+
+        self.categories[category] += 1
+
+    def _offer_name(self, sender: str, name: Optional[str], received: int) -> None:
+        """Keep name for sender if its email (received at timestamp received) wins under name_key."""
+        current = self.sender_name_received.get(sender)
+        if current is None or name_key(received, name) > name_key(current, self.sender_names.get(sender)):
+            self.sender_names[sender] = name
+            self.sender_name_received[sender] = received
+
+    @classmethod
+    def from_batch(
+        cls,
+        batch: EmailBatch,
+        categories: Sequence[str],
+        subject_cluster_ids: Sequence[Optional[int]],
+    ) -> "BatchAggregates":
+        """
+        Same state as ``add`` for every email of ``batch`` in order, computed column-wise:
+        counters over the id arrays, then one step per unique sender, subject and day.
+        ``categories`` is per email; ``subject_cluster_ids`` is per entry of ``batch.subjects``.
+        """
+        aggregates = cls()
+        aggregates.total = len(batch)
+        if not aggregates.total:
+            return aggregates
+
+        # Several raw addresses can share one normalized sender; name_key picks among their names
+        sender_counts = Counter(batch.sender_ids)
+        for sender_id, sender in enumerate(batch.senders):
+            address = normalize_sender(sender).address
+            aggregates.sender_counts[address] += sender_counts[sender_id]
+            aggregates._offer_name(address, batch.sender_names[sender_id], batch.sender_name_received[sender_id])
+        aggregates.unique_senders = len(aggregates.sender_counts)
+        # The batch's counts are exact, so its sketches hold the exact top-k
+        domain_counts = Counter()
+        for address, count in aggregates.sender_counts.items():
+            domain = normalize_sender(address).domain
+            if domain:
+                domain_counts[domain] += count
+        aggregates.sender_sketch = SpaceSaving.from_counts(aggregates.sender_counts)
+        aggregates.domain_sketch = SpaceSaving.from_counts(domain_counts)
+
+        subject_counts = Counter(batch.subject_ids)
+        for subject_id, subject in enumerate(batch.subjects):
+            cluster_id = subject_cluster_ids[subject_id]
+            if cluster_id is None:
+                continue
+            aggregates.subject_cluster_counts[cluster_id] += subject_counts[subject_id]
+            aggregates.subject_cluster_samples[cluster_id] = merge_samples(
+                aggregates.subject_cluster_samples.get(cluster_id), [subject or ""]
+            )
+
+        for (ordinal, hour), count in Counter(zip(batch.day_ordinals, batch.hours)).items():
+            if ordinal:
+                aggregates.day_counts[date.fromordinal(ordinal)] += count
+                # Ordinal 1 (0001-01-01) is a Monday
+                aggregates.hour_weekday_counts[((ordinal - 1) % DAYS_PER_WEEK, hour)] += count
+        if MISSING_TIMESTAMP in batch.timestamps:
+            dated = [value for value in batch.timestamps if value != MISSING_TIMESTAMP]
+        else:
+            dated = batch.timestamps
+        if dated:
+            aggregates.start = from_timestamp(min(dated))
+            aggregates.end = from_timestamp(max(dated))
+
+        aggregates.categories = Counter(categories)
+        return aggregates
+
+    def merge(self, other: "BatchAggregates") -> "BatchAggregates":
+        """
+        State of self's emails followed by other's; neither operand is modified. Per-sender
+        counts and names are not merged, and unique_senders is left unknown (None).
+        """
+        merged = BatchAggregates()
+        merged.total = self.total + other.total
+        merged.unique_senders = None
+        merged.sender_sketch = self.sender_sketch.merge(other.sender_sketch)
+        merged.domain_sketch = self.domain_sketch.merge(other.domain_sketch)
+
+        merged.subject_cluster_counts = self.subject_cluster_counts + other.subject_cluster_counts
+        merged.subject_cluster_samples = {
+            cluster_id: merge_samples(samples, other.subject_cluster_samples.get(cluster_id))
+            for cluster_id, samples in self.subject_cluster_samples.items()
+        }
+        for cluster_id, samples in other.subject_cluster_samples.items():
+            if cluster_id not in merged.subject_cluster_samples:
+                merged.subject_cluster_samples[cluster_id] = list(samples)
+
+        merged.day_counts = self.day_counts + other.day_counts
+        merged.hour_weekday_counts = self.hour_weekday_counts + other.hour_weekday_counts
+        starts = [d for d in (self.start, other.start) if d is not None]
+        ends = [d for d in (self.end, other.end) if d is not None]
+        merged.start = min(starts) if starts else None
+        merged.end = max(ends) if ends else None
+        merged.categories = self.categories + other.categories
+        return merged
+
+    def hour_weekday_matrix(self) -> List[List[int]]:
+        """Counts as 7 rows (Monday first) of 24 hours."""
+        return [
+            [self.hour_weekday_counts.get((weekday, hour), 0) for hour in range(HOURS_PER_DAY)]
+            for weekday in range(DAYS_PER_WEEK)
+        ]
+
+    def month_counts(self) -> Dict[str, int]:
+        """Emails per "YYYY-MM" month, in month order, from the per-day histogram."""
+        months: Counter = Counter()
+        for day, count in self.day_counts.items():
+            months[f"{day.year:04d}-{day.month:02d}"] += count
+        return dict(sorted(months.items()))
+
+    def to_analysis(self) -> Dict:
+        """The batch analysis dict for these emails (historical analyze_batch shape)."""
+        if not self.total:
+            return {
+                "sender_patterns": {},
+                "subject_clusters": [],
+                "frequency_analysis": {},
+                "categories": {},
+                "total_emails": 0,
+                "unique_senders": 0,
+                "date_range": {"start": None, "end": None},
+            }
+
+        categories = default_engine.empty_counts()
+        for category, count in self.categories.items():
+            categories[category] = categories.get(category, 0) + count
+
+        return {
+            "sender_patterns": {
+                "top_senders": [
+                    {
+                        "email": entry.item,
+                        "name": self.sender_names.get(entry.item),
+                        "count": entry.count,
+                        "percentage": round(entry.count / self.total * 100, 2),
+                    }
+                    for entry in self.sender_sketch.top(20)
+                ],
+                "top_domains": [
+                    {"domain": entry.item, "count": entry.count}
+                    for entry in self.domain_sketch.top(10)
+                ],
+                "total_unique_senders": self.unique_senders or 0,
+            },
+            "subject_clusters": [
+                {
+                    "cluster_id": cluster_id,
+                    "subjects": list(self.subject_cluster_samples.get(cluster_id, [])),
+                    "count": count,
+                    "representative": _representative(self.subject_cluster_samples.get(cluster_id, [])),
+                }
+                # Ties in cluster id order, not in the order the counters were filled
+                for cluster_id, count in sorted(
+                    self.subject_cluster_counts.items(), key=lambda item: (-item[1], item[0])
+                )[:TOP_SUBJECT_CLUSTERS]
+            ],
+            "frequency_analysis": {
+                "daily_average": round(self.total / max(len(self.day_counts), 1), 2),
+            },
+            "categories": categories,
+            "total_emails": self.total,
+            "unique_senders": self.unique_senders or 0,
+            "date_range": {
+                "start": self.start.isoformat() if self.start else None,
+                "end": self.end.isoformat() if self.end else None,
+            },
+        }
+
+    def to_state(self) -> Dict:
+        """JSON-serializable state (inverse of from_state), without the batch-only sender fields."""
+        return {
+            "version": STATE_VERSION,
+            "total": self.total,
+            "sender_sketch": self.sender_sketch.to_state(),
+            "domain_sketch": self.domain_sketch.to_state(),
+            "subject_cluster_counts": {str(k): v for k, v in self.subject_cluster_counts.items()},
+            "subject_cluster_samples": {str(k): v for k, v in self.subject_cluster_samples.items()},
+            "day_counts": {day.isoformat(): count for day, count in self.day_counts.items()},
+            "hour_weekday_counts": self.hour_weekday_matrix(),
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+            "categories": dict(self.categories),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "BatchAggregates":
+        aggregates = cls()
+        aggregates.total = state.get("total", 0)
+        aggregates.unique_senders = None
+        aggregates.sender_sketch = SpaceSaving.from_state(state.get("sender_sketch"))
+        aggregates.domain_sketch = SpaceSaving.from_state(state.get("domain_sketch"))
+        aggregates.subject_cluster_counts = Counter({
+            int(k): v for k, v in (state.get("subject_cluster_counts") or {}).items()
+        })
+        aggregates.subject_cluster_samples = {
+            int(k): list(v) for k, v in (state.get("subject_cluster_samples") or {}).items()
+        }
+        aggregates.day_counts = Counter({
+            date.fromisoformat(day): count for day, count in (state.get("day_counts") or {}).items()
+        })
+        for weekday, hours in enumerate(state.get("hour_weekday_counts") or []):
+            for hour, count in enumerate(hours):
+                if count:
+                    aggregates.hour_weekday_counts[(weekday, hour)] = count
+        aggregates.start = datetime.fromisoformat(state["start"]) if state.get("start") else None
+        aggregates.end = datetime.fromisoformat(state["end"]) if state.get("end") else None
+        aggregates.categories = Counter(state.get("categories") or {})
+        return aggregates
@@ -7,6 +7,8 @@ import re
 import logging
 from typing import List, Dict, Any, Optional
 
+from app.sender_identity import normalize_sender
+
 logger = logging.getLogger(__name__)
 
 MAIN_CATEGORIES = [
@@ -52,9 +54,7 @@ def _normalize(s: str) -> str:
 
 
 def _domain(email: str) -> str:
-    if "@" in email:
-        return _normalize(email.split("@", 1)[1])
-    return ""
+    return normalize_sender(email).domain or ""
 
 
 def rule_based_suggest(sender_email: str, sender_name: Optional[str] = None) -> Dict[str, Any]:
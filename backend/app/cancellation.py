@@ -0,0 +1,98 @@
+"""
+Cooperative cancellation for analysis runs.
+
+``process_batch_analysis`` registers a token per run and hands it to the analysis
+service, which passes it on to the connector fetch loops. ``/runs/{id}/stop`` sets
+the token, and the loops check it per message and per page and raise
+``AnalysisCancelled`` instead of fetching on. A token also polls the run's status
+row at a throttled interval, so a stop issued by another worker process is seen too.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between status-row polls of one token
+POLL_INTERVAL_SECONDS = float(os.getenv("MAILMIND_CANCEL_POLL_SECONDS", "3"))
+
+
+class AnalysisCancelled(Exception):
+    """Raised from a fetch or analysis loop once its run has been cancelled."""
+
+
+class CancellationToken:
+    """Thread-safe cancelled flag with an optional throttled external check."""
+
+    def __init__(self, check: Optional[Callable[[], bool]] = None, poll_interval: float = POLL_INTERVAL_SECONDS):
+        self._event = threading.Event()
+        self._check = check
+        self._poll_interval = poll_interval
+        self._checked_at = time.monotonic()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self._check is not None:
+            now = time.monotonic()
+            if now - self._checked_at >= self._poll_interval:
+                self._checked_at = now
+                try:
+                    if self._check():
+                        self._event.set()
+                except Exception as e:
+                    logger.warning(f"Cancellation check failed: {e}")
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise AnalysisCancelled("Analysis run was cancelled")
+
+
+def run_cancelled_in_db(run_id: int) -> bool:
+    """True if analysis_runs marks the run cancelled (used as a token's external check)."""
+    from app.database import engine
+    with engine.connect() as conn:
+        status = conn.execute(
+            text("SELECT status FROM analysis_runs WHERE id = :run_id"),
+            {"run_id": run_id},
+        ).scalar()
+    return status == "cancelled"
+
+
+class CancellationRegistry:
+    """run_id -> CancellationToken for runs live in this process."""
+
+    def __init__(self):
+        self._tokens: Dict[int, CancellationToken] = {}
+        self._lock = threading.Lock()
+
+    def register(self, run_id: int) -> CancellationToken:
+        token = CancellationToken(check=lambda: run_cancelled_in_db(run_id))
+        with self._lock:
+            self._tokens[run_id] = token
+        return token
+
+    def cancel(self, run_id: int) -> bool:
+        """Cancel a live run's token; False if the run is not live in this process."""
+        with self._lock:
+            token = self._tokens.get(run_id)
+        if token is None:
+            return False
+        token.cancel()
+        return True
+
+    def discard(self, run_id: int) -> None:
+        with self._lock:
+            self._tokens.pop(run_id, None)
+
+
+cancellation_registry = CancellationRegistry()
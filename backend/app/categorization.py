@@ -0,0 +1,104 @@
+"""
+Keyword categorization engine shared by batch analysis, AnalysisService and
+/insights/recalculate.
+
+The rule tables are compiled once into two app.keyword_automaton automata,
+one over the subject keywords and one over the sender keywords, each keyword
+tagged with its rule's position. Classifying an email walks each string once
+and takes the earliest rule found in either, which equals checking the rules in
+order with ``any(kw in text for kw in keywords)``. Custom subject rules
+(app.custom_rules) use the same matcher. scripts/bench_categorization.py
+checks the engine against those per-rule scans and times both.
+"""
+import hashlib
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.keyword_automaton import KeywordAutomaton
+
+SUBJECT = "subject"
+SENDER = "sender"
+
+
+class KeywordRule(NamedTuple):
+    category: str
+    keywords: Tuple[str, ...]
+    fields: Tuple[str, ...]
+
+
+# Checked in order; the first rule with a keyword in one of its fields wins
+DEFAULT_RULES: Tuple[KeywordRule, ...] = (
+    KeywordRule("notifications", ("notification", "alert", "reminder", "confirm", "receipt"), (SUBJECT,)),
+    KeywordRule("newsletters", ("newsletter", "digest", "weekly", "monthly", "unsubscribe"), (SUBJECT, SENDER)),
+    KeywordRule("social", ("facebook", "twitter", "linkedin", "instagram", "social"), (SENDER,)),
+    KeywordRule("shopping", ("order", "purchase", "shipping", "delivery", "amazon", "ebay"), (SUBJECT, SENDER)),
+    KeywordRule("work", ("meeting", "calendar", "team", "project", "deadline"), (SUBJECT,)),
+)
+
+# Senders with an address that is not an automated mailbox are personal
+PERSONAL_CATEGORY = "personal"
+FALLBACK_CATEGORY = "other"
+NOREPLY_MARKERS: Tuple[str, ...] = ("noreply", "no-reply", "donotreply")
+
+
+class CategoryEngine:
+    """Compiled keyword rules; ``classify(subject, sender)`` returns a category name."""
+
+    def __init__(
+        self,
+        rules: Iterable[KeywordRule] = DEFAULT_RULES,
+        noreply_markers: Iterable[str] = NOREPLY_MARKERS,
+    ):
+        self.rules: Tuple[KeywordRule, ...] = tuple(rules)
+        self.categories: List[str] = list(
+            dict.fromkeys([rule.category for rule in self.rules] + [PERSONAL_CATEGORY, FALLBACK_CATEGORY])
+        )
+        self._table = tuple(
+            (
+                rule.category,
+                tuple(kw.lower() for kw in rule.keywords) if SUBJECT in rule.fields else (),
+                tuple(kw.lower() for kw in rule.keywords) if SENDER in rule.fields else (),
+            )
+            for rule in self.rules
+        )
+        self._noreply_markers = tuple(marker.lower() for marker in noreply_markers)
+        self._subject_automaton = KeywordAutomaton(
+            (keyword, position) for position, (_, keywords, _) in enumerate(self._table) for keyword in keywords
+        )
+        self._sender_automaton = KeywordAutomaton(
+            (keyword, position) for position, (_, _, keywords) in enumerate(self._table) for keyword in keywords
+        )
+        self._noreply_automaton = KeywordAutomaton((marker, 0) for marker in self._noreply_markers)
+        # Changes whenever the compiled tables do; keys cached classifications (app.classification_cache)
+        self.fingerprint = hashlib.blake2b(
+            repr((self._table, self._noreply_markers)).encode("utf-8"), digest_size=8
+        ).hexdigest()
+
+    @property
+    def subject_keywords(self) -> Tuple[str, ...]:
+        """Every lowercased keyword matched against subjects."""
+        return tuple(keyword for _, subject_keywords, _ in self._table for keyword in subject_keywords)
+
+    def empty_counts(self) -> Dict[str, int]:
+        """Zeroed counts for every category, in rule order."""
+        return {category: 0 for category in self.categories}
+
+    def classify(self, subject: Optional[str], sender: Optional[str]) -> str:
+        subject_hit = self._subject_automaton.match(subject)
+        sender_hit = self._sender_automaton.match(sender)
+        if subject_hit is not None or sender_hit is not None:
+            position = min(hit for hit in (subject_hit, sender_hit) if hit is not None)
+            return self._table[position][0]
+
+        if sender and "@" in sender:
+            if self._noreply_automaton.match(sender) is not None:
+                return FALLBACK_CATEGORY
+            return PERSONAL_CATEGORY
+        return FALLBACK_CATEGORY
+
+
+default_engine = CategoryEngine()
+
+
+def categorize(subject: Optional[str], sender: Optional[str]) -> str:
+    """Category of one email under the default rules."""
+    return default_engine.classify(subject, sender)
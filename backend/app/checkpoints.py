@@ -0,0 +1,154 @@
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+from app.database import AnalysisCheckpoint
+from app.range_semantics import naive_utc_instant
+
+logger = logging.getLogger(__name__)
+
+# Days of slack around the frontier when trimming a resumed window: the provider files a
+# message under its own received date, which can fall a day from the Date header's
+COVERAGE_SLACK = timedelta(days=1)
+
+
+class CheckpointStore:
+    """
+    Durable in-range checkpoints so a failed or interrupted range resumes where it stopped.
+
+    A checkpoint is keyed by the half-open window [range_start, range_end) that
+    DateTracker.get_unprocessed_ranges handed to the analysis service. It is advanced
+    only after a page of emails has been committed, so everything before ``cursor``
+    is already in email_metadata. It is deleted once the window is marked processed.
+
+    Each page also adds its emails to ``day_counts`` (per received day, UTC) and moves
+    ``frontier_day`` to the day of its last email. Providers list a window in date order
+    (Gmail newest first, Yahoo by ascending UID), so every covered day on the far side of
+    the frontier is complete and a resumed fetch only needs ``uncovered_window``.
+    """
+
+    def __init__(self, db: Session, account_id: int):
+        self.db = db
+        self.account_id = account_id
+
+    def get(self, range_start: datetime, range_end: datetime) -> Optional[AnalysisCheckpoint]:
+        """Checkpoint for exactly this window, if an earlier attempt left one."""
+        return self.db.query(AnalysisCheckpoint).filter(
+            AnalysisCheckpoint.account_id == self.account_id,
+            AnalysisCheckpoint.range_start == naive_utc_instant(range_start),
+            AnalysisCheckpoint.range_end == naive_utc_instant(range_end)
+        ).first()
+
+    def save(
+        self,
+        range_start: datetime,
+        range_end: datetime,
+        cursor: Optional[str],
+        page_emails: List[Dict],
+        run_id: Optional[int] = None
+    ) -> AnalysisCheckpoint:
+        """
+        Record that page_emails are stored and fetching continues at cursor.
+        cursor=None means the provider has no further pages for this window.
+        """
+        checkpoint = self.get(range_start, range_end)
+        if checkpoint is None:
+            checkpoint = AnalysisCheckpoint(
+                account_id=self.account_id,
+                range_start=naive_utc_instant(range_start),
+                range_end=naive_utc_instant(range_end),
+                emails_stored=0,
+                day_counts={}
+            )
+            self.db.add(checkpoint)
+
+        # Reassign (not mutate) so SQLAlchemy sees the JSON change
+        day_counts = dict(checkpoint.day_counts or {})
+        for email_data in page_emails:
+            received = naive_utc_instant(email_data.get('date_received'))
+            if received is None:
+                continue
+            day = received.date()
+            day_counts[day.isoformat()] = day_counts.get(day.isoformat(), 0) + 1
+            checkpoint.frontier_day = day
+
+        checkpoint.cursor = cursor
+        checkpoint.fetch_complete = cursor is None
+        checkpoint.emails_stored = (checkpoint.emails_stored or 0) + len(page_emails)
+        checkpoint.day_counts = day_counts
+        checkpoint.run_id = run_id
+        checkpoint.updated_at = datetime.utcnow()
+
+        try:
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"ERROR committing checkpoint for [{range_start}, {range_end}): {e}", exc_info=True)
+            self.db.rollback()
+            raise
+        return checkpoint
+
+    def uncovered_window(self, checkpoint: AnalysisCheckpoint) -> Optional[Tuple[datetime, datetime]]:
+        """
+        The part of the checkpoint's window that still needs fetching, or None when its
+        coverage cannot tell (nothing dated stored yet, or the pages were not in date order).
+
+        Pages stored newest first leave [range_start, frontier] to fetch, pages stored oldest
+        first [frontier, range_end); the frontier day itself may be partial and is fetched
+        again (with COVERAGE_SLACK), its stored messages being skipped as already known.
+        """
+        days = [date.fromisoformat(day) for day in (checkpoint.day_counts or {})]
+        frontier = checkpoint.frontier_day
+        if not days or frontier is None or min(days) == max(days):
+            return None
+        frontier_start = datetime.combine(frontier, datetime.min.time())
+        if frontier == min(days):
+            end = min(checkpoint.range_end, frontier_start + timedelta(days=1) + COVERAGE_SLACK)
+            return checkpoint.range_start, max(end, checkpoint.range_start)
+        if frontier == max(days):
+            start = max(checkpoint.range_start, frontier_start - COVERAGE_SLACK)
+            return min(start, checkpoint.range_end), checkpoint.range_end
+        return None
+
+    def clear(self, range_start: datetime, range_end: datetime) -> None:
+        """Drop the checkpoint for a window that has been fully processed."""
+        self.clear_overlapping(range_start, range_end, contained_only=True)
+
+    def clear_overlapping(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        contained_only: bool = False
+    ) -> int:
+        """
+        Delete checkpoints overlapping [start_date, end_date) (or only those fully inside it).
+        Used when the window's data is processed, deleted or re-analyzed.
+        """
+        start_date = naive_utc_instant(start_date)
+        end_date = naive_utc_instant(end_date)
+        query = self.db.query(AnalysisCheckpoint).filter(
+            AnalysisCheckpoint.account_id == self.account_id
+        )
+        if contained_only:
+            query = query.filter(
+                AnalysisCheckpoint.range_start >= start_date,
+                AnalysisCheckpoint.range_end <= end_date
+            )
+        else:
+            query = query.filter(
+                AnalysisCheckpoint.range_start < end_date,
+                AnalysisCheckpoint.range_end > start_date
+            )
+        deleted = query.delete(synchronize_session=False)
+        self.db.commit()
+        if deleted:
+            logger.info(f"Cleared {deleted} checkpoint(s) for [{start_date}, {end_date})")
+        return deleted
+
+    def clear_for_run(self, run_id: int) -> int:
+        """Delete checkpoints last advanced by run_id (its stored emails are being reverted)."""
+        deleted = self.db.query(AnalysisCheckpoint).filter(
+            AnalysisCheckpoint.account_id == self.account_id,
+            AnalysisCheckpoint.run_id == run_id
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return deleted
@@ -0,0 +1,159 @@
+"""
+Bounded LRU cache of per-email classifications across batches and runs.
+
+Newsletter-heavy mailboxes repeat one (sender, subject template) pair thousands
+of times ("Your order 294 has shipped", "Your order 295 has shipped", ...), so
+``CachedClassifier`` classifies each pair once and reuses the (category,
+custom_category_id) for every later email of the same template.
+
+Keys are (user, rules fingerprint, sender, subject key):
+
+  sender       the lowercased address. Keyword rules also see the "+tag" that
+               normalize_sender drops, so the canonical address could merge
+               senders that classify differently.
+  subject key  normalize_subject(subject) (the clustering template) when every
+               subject keyword and custom subject rule is a plain word that
+               template folding cannot create or destroy; otherwise the
+               lowercased subject, so cached results always equal uncached ones.
+
+The fingerprint covers the keyword tables (CategoryEngine.fingerprint) and the
+user's custom rules (CustomRuleEngine.fingerprint), so changed rules never hit
+stale entries; rule endpoints also call ``invalidate(user_id)`` to free them.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.categorization import CategoryEngine, default_engine
+from app.custom_rules import CustomRuleEngine
+from app.email_batch import EmailBatch
+from app.subject_clustering import REPLY_PREFIXES, normalize_subject
+
+CLASSIFICATION_CACHE_SIZE = int(os.getenv("MAILMIND_CLASSIFICATION_CACHE_SIZE", "100000"))
+
+Classification = Tuple[str, Optional[int]]  # (category, custom_category_id)
+
+
+def _template_safe(pattern: str) -> bool:
+    """
+    True if ``pattern in subject.lower()`` equals ``pattern in normalize_subject(subject)``:
+    letters only (digit folding and punctuation collapsing never touch it) and not part
+    of a reply prefix, the only text normalization removes.
+    """
+    return pattern.isalpha() and not any(pattern in prefix for prefix in REPLY_PREFIXES)
+
+
+class ClassificationCache:
+    """Thread-safe LRU mapping of classification keys to results, with hit/miss counters."""
+
+    def __init__(self, max_entries: int = CLASSIFICATION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Classification]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple) -> Optional[Classification]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple, value: Classification) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: Optional[int] = None) -> int:
+        """Drop the user's entries, or every entry when user_id is None; returns the number dropped."""
+        with self._lock:
+            if user_id is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [key for key in self._entries if key[0] == user_id]
+                for key in stale:
+                    del self._entries[key]
+                dropped = len(stale)
+            self.invalidations += 1
+            return dropped
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+classification_cache = ClassificationCache()
+
+
+class CachedClassifier:
+    """(category, custom_category_id) of emails for one user's rules, through a ClassificationCache."""
+
+    def __init__(
+        self,
+        user_id: int,
+        custom_rules: CustomRuleEngine,
+        engine: CategoryEngine = default_engine,
+        cache: ClassificationCache = classification_cache,
+    ):
+        self.user_id = user_id
+        self.custom_rules = custom_rules
+        self.engine = engine
+        self.cache = cache
+        self._fingerprint = f"{engine.fingerprint}:{custom_rules.fingerprint}"
+        self._templated = all(
+            _template_safe(pattern) for pattern in engine.subject_keywords + custom_rules.subject_patterns
+        )
+
+    def subject_key(self, subject: Optional[str]) -> str:
+        if self._templated:
+            return normalize_subject(subject)
+        return (subject or "").lower()
+
+    def classify(self, subject: Optional[str], sender: Optional[str]) -> Classification:
+        key = (self.user_id, self._fingerprint, (sender or "").lower(), self.subject_key(subject))
+        result = self.cache.get(key)
+        if result is None:
+            result = (self.engine.classify(subject, sender), self.custom_rules.classify(subject, sender))
+            self.cache.put(key, result)
+        return result
+
+    def classify_batch(self, batch: EmailBatch) -> Tuple[List[str], List[Optional[int]]]:
+        """
+        Category and custom_category_id per email of ``batch``, looked up once per distinct
+        (subject, sender) pair. Categories assigned while parsing are kept.
+        """
+        pair_results: Dict[Tuple[int, int], Classification] = {}
+        categories: List[str] = []
+        custom_categories: List[Optional[int]] = []
+        for parsed_category, pair in zip(batch.categories, zip(batch.subject_ids, batch.sender_ids)):
+            result = pair_results.get(pair)
+            if result is None:
+                result = pair_results[pair] = self.classify(batch.subjects[pair[0]], batch.senders[pair[1]])
+            categories.append(parsed_category if parsed_category is not None else result[0])
+            custom_categories.append(result[1])
+        return categories, custom_categories
@@ -0,0 +1,120 @@
+"""
+User-defined categories applied at ingestion.
+
+``CustomRuleEngine`` compiles a user's SenderCategoryMapping and SubjectRule rows
+once per run: sender mappings become a dict keyed by normalized address, and the
+``subject_contains`` patterns one Aho-Corasick automaton, so a subject is matched
+against every rule in a single pass over its characters. The resolved
+custom_category_id is stored on each AnalysisResult, which makes per-category
+insights a GROUP BY on analysis_results.
+
+Precedence: an explicit sender mapping wins; otherwise the oldest matching subject
+rule (lowest id). Subject matching is case-insensitive substring matching.
+"""
+import hashlib
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import AnalysisResult, EmailMetadata, SenderCategoryMapping, SubjectRule
+from app.keyword_automaton import KeywordAutomaton
+from app.sender_identity import normalize_sender
+
+# Result rows re-evaluated per query in reapply()
+REAPPLY_BATCH_SIZE = 5000
+
+
+class CustomRuleEngine:
+    """Compiled custom-category rules of one user; ``classify`` returns a custom_category_id or None."""
+
+    def __init__(
+        self,
+        sender_categories: Dict[str, int],
+        subject_rules: Sequence[Tuple[str, int]],
+    ):
+        # Mappings made before sender normalization hold the lowercased raw address
+        self.sender_categories = {
+            normalize_sender(sender).address: category_id for sender, category_id in sender_categories.items()
+        }
+        self._rule_categories = [category_id for _, category_id in subject_rules]
+        self.subject_patterns = tuple(pattern.lower() for pattern, _ in subject_rules if pattern)
+        # Changes whenever the rules do; keys cached classifications (app.classification_cache)
+        self.fingerprint = hashlib.blake2b(
+            repr((sorted(self.sender_categories.items()), list(subject_rules))).encode("utf-8"), digest_size=8
+        ).hexdigest()
+        self._automaton = KeywordAutomaton(
+            (pattern, priority) for priority, (pattern, _) in enumerate(subject_rules)
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.sender_categories) or bool(self._automaton)
+
+    @classmethod
+    def load(cls, db: Session, user_id: int) -> "CustomRuleEngine":
+        mappings = db.query(
+            SenderCategoryMapping.sender_email, SenderCategoryMapping.custom_category_id
+        ).filter(SenderCategoryMapping.user_id == user_id).all()
+        rules = db.query(
+            SubjectRule.subject_contains, SubjectRule.custom_category_id
+        ).filter(SubjectRule.user_id == user_id).order_by(SubjectRule.id).all()
+        return cls(
+            {sender: category_id for sender, category_id in mappings},
+            [(pattern, category_id) for pattern, category_id in rules],
+        )
+
+    def match_subject(self, subject: Optional[str]) -> Optional[int]:
+        priority = self._automaton.match(subject)
+        return None if priority is None else self._rule_categories[priority]
+
+    def classify(self, subject: Optional[str], sender: Optional[str]) -> Optional[int]:
+        category_id = self.sender_categories.get(normalize_sender(sender).address)
+        if category_id is not None:
+            return category_id
+        return self.match_subject(subject)
+
+    def reapply(
+        self,
+        db: Session,
+        account_ids: Sequence[int],
+        senders: Optional[Iterable[str]] = None,
+        custom_category_id: Optional[int] = None,
+    ) -> int:
+        """
+        Re-evaluate stored results after the rules changed; returns the number of rows updated.
+
+        ``senders`` (normalized addresses) or ``custom_category_id`` narrow the rows to those
+        the change can affect. The caller commits.
+        """
+        if not account_ids:
+            return 0
+        query = db.query(
+            AnalysisResult.id,
+            AnalysisResult.custom_category_id,
+            EmailMetadata.sender_email,
+            EmailMetadata.subject,
+        ).join(EmailMetadata, AnalysisResult.email_id == EmailMetadata.id).filter(
+            EmailMetadata.account_id.in_(account_ids)
+        )
+        if senders is not None:
+            query = query.filter(EmailMetadata.sender_normalized.in_(list(senders)))
+        if custom_category_id is not None:
+            query = query.filter(AnalysisResult.custom_category_id == custom_category_id)
+
+        updated = 0
+        last_id = 0
+        while True:
+            rows = query.filter(AnalysisResult.id > last_id).order_by(AnalysisResult.id).limit(
+                REAPPLY_BATCH_SIZE
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            changes = []
+            for row in rows:
+                resolved = self.classify(row.subject, row.sender_email)
+                if resolved != row.custom_category_id:
+                    changes.append({"id": row.id, "custom_category_id": resolved})
+            if changes:
+                db.bulk_update_mappings(AnalysisResult, changes)
+                updated += len(changes)
+        return updated
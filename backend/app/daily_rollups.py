@@ -0,0 +1,134 @@
+"""
+Materialized per-day counts behind the frequency and category insights.
+
+``daily_rollups`` holds one row per (account, received day, category, sender
+domain) with the number of analysis results in it, so dashboard queries read a
+few rows per day instead of aggregating email_metadata / analysis_results. The
+rows mirror analysis_results exactly: every path that inserts results adds their
+counts and every path that deletes results subtracts them first, in the same
+transaction. ``rebuild`` recomputes an account from its results (after bulk
+rewrites, or via scripts/rebuild_daily_rollups.py); the insights endpoints also
+rebuild accounts whose results predate the table on first read.
+
+The day is ``date_received.date()`` as stored, the same day the per-day histograms
+of app.aggregates use.
+"""
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import AnalysisResult, DailyRollup, EmailMetadata
+from app.email_batch import EmailBatch
+from app.sender_identity import normalize_sender
+
+# (day, category, domain); domain is "" for senders without one
+RollupKey = Tuple[date, str, str]
+
+# Days per IN (...) when loading rows to update, and result rows streamed per fetch
+_DAY_CHUNK = 500
+_STREAM_PAGE = 5000
+
+
+def batch_counts(batch: EmailBatch, categories: Iterable[str]) -> Counter:
+    """Rollup counts of a batch about to be stored as results with ``categories``."""
+    domains = [normalize_sender(sender).domain or "" for sender in batch.senders]
+    keyed = Counter(zip(batch.day_ordinals, categories, batch.sender_ids))
+    counts: Counter = Counter()
+    for (ordinal, category, sender_id), count in keyed.items():
+        if ordinal:
+            counts[(date.fromordinal(ordinal), category or "", domains[sender_id])] += count
+    return counts
+
+
+class DailyRollupStore:
+    """Rollup rows of one account; the caller commits, so rollups land with the results they count."""
+
+    def __init__(self, db: Session, account_id: int):
+        self.db = db
+        self.account_id = account_id
+
+    def result_counts(self, *criteria) -> Counter:
+        """Rollup counts of the account's results matching ``criteria`` (AnalysisResult / EmailMetadata filters)."""
+        rows = self.db.query(
+            EmailMetadata.date_received,
+            AnalysisResult.category,
+            EmailMetadata.sender_domain,
+        ).join(
+            EmailMetadata, AnalysisResult.email_id == EmailMetadata.id
+        ).filter(
+            EmailMetadata.account_id == self.account_id,
+            *criteria
+        ).yield_per(_STREAM_PAGE)
+        counts: Counter = Counter()
+        for received, category, domain in rows:
+            if received is not None:
+                counts[(received.date(), category or "", domain or "")] += 1
+        return counts
+
+    def add(self, counts: Dict[RollupKey, int]) -> None:
+        self._apply(counts, 1)
+
+    def subtract(self, counts: Dict[RollupKey, int]) -> None:
+        self._apply(counts, -1)
+
+    def subtract_results(self, *criteria) -> None:
+        """Remove the counts of results about to be deleted; call before deleting them."""
+        self.subtract(self.result_counts(*criteria))
+
+    def _apply(self, counts: Dict[RollupKey, int], sign: int) -> None:
+        if not counts:
+            return
+        days = sorted({key[0] for key in counts})
+        existing: Dict[RollupKey, DailyRollup] = {}
+        for start in range(0, len(days), _DAY_CHUNK):
+            rows = self.db.query(DailyRollup).filter(
+                DailyRollup.account_id == self.account_id,
+                DailyRollup.day.in_(days[start:start + _DAY_CHUNK])
+            ).all()
+            for row in rows:
+                existing[(row.day, row.category, row.domain)] = row
+
+        for key, count in counts.items():
+            row = existing.get(key)
+            if row is None:
+                if sign > 0:
+                    day, category, domain = key
+                    self.db.add(DailyRollup(
+                        account_id=self.account_id,
+                        day=day,
+                        category=category,
+                        domain=domain,
+                        email_count=count
+                    ))
+                continue
+            row.email_count += sign * count
+            if row.email_count <= 0:
+                self.db.delete(row)
+
+    def has_rows(self) -> bool:
+        return self.db.query(DailyRollup.id).filter(DailyRollup.account_id == self.account_id).first() is not None
+
+    def has_results(self) -> bool:
+        return self.db.query(AnalysisResult.id).join(
+            EmailMetadata, AnalysisResult.email_id == EmailMetadata.id
+        ).filter(EmailMetadata.account_id == self.account_id).first() is not None
+
+    def rebuild(self) -> int:
+        """Recompute the account's rows from its analysis results; returns the row count."""
+        counts = self.result_counts()
+        self.db.query(DailyRollup).filter(
+            DailyRollup.account_id == self.account_id
+        ).delete(synchronize_session=False)
+        self.db.bulk_insert_mappings(DailyRollup, [
+            {
+                "account_id": self.account_id,
+                "day": day,
+                "category": category,
+                "domain": domain,
+                "email_count": count,
+            }
+            for (day, category, domain), count in counts.items()
+        ])
+        return len(counts)
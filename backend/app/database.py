@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, JSON, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Date, DateTime, Text, JSON, Boolean, LargeBinary, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -55,7 +55,7 @@ class EmailAccount(Base):
     __tablename__ = "email_accounts"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     provider = Column(String, nullable=False)  # 'gmail' or 'yahoo'
     email = Column(String, nullable=False)
     encrypted_credentials = Column(Text, nullable=False)  # Encrypted OAuth tokens/credentials
@@ -64,6 +64,16 @@ class EmailAccount(Base):
     
     user = relationship("User", back_populates="email_accounts")
     emails = relationship("EmailMetadata", back_populates="account", cascade="all, delete-orphan")
+    checkpoints = relationship("AnalysisCheckpoint", cascade="all, delete-orphan")
+    analysis_summaries = relationship("AnalysisSummary", cascade="all, delete-orphan")
+    aggregate = relationship("AccountAggregate", cascade="all, delete-orphan", uselist=False)
+    aggregate_entries = relationship("AccountAggregateEntry", cascade="all, delete-orphan")
+    subject_clusters = relationship("SubjectCluster", cascade="all, delete-orphan")
+    subject_cluster_bands = relationship("SubjectClusterBand", cascade="all, delete-orphan")
+    daily_rollups = relationship("DailyRollup", cascade="all, delete-orphan")
+    stats = relationship("AccountStats", cascade="all, delete-orphan", uselist=False)
+    sender_stats = relationship("SenderStat", cascade="all, delete-orphan")
+    sender_sketches = relationship("SenderSketch", cascade="all, delete-orphan")
 
 class EmailMetadata(Base):
     __tablename__ = "email_metadata"
@@ -73,6 +83,10 @@ class EmailMetadata(Base):
     message_id = Column(String, nullable=False, index=True)
     sender_email = Column(String, index=True, nullable=False)
     sender_name = Column(String)
+    # Computed once at ingest from sender_email (app.sender_identity)
+    sender_normalized = Column(String)
+    sender_domain = Column(String)
+    sender_registrable_domain = Column(String)
     subject = Column(String, index=True)
     date_received = Column(DateTime, index=True, nullable=False)
     date_analyzed = Column(DateTime, default=datetime.utcnow)
@@ -81,6 +95,16 @@ class EmailMetadata(Base):
     # Composite unique constraint: message_id must be unique per account
     __table_args__ = (
         UniqueConstraint('account_id', 'message_id', name='uq_email_account_message'),
+        # Date windows of one account (range deletes, min/max, date-ordered rebuilds)
+        Index("ix_email_metadata_account_date", "account_id", "date_received"),
+        # Covers per-sender counts with their display name (sender_stats rebuilds, new-sender checks)
+        Index("ix_email_metadata_account_sender_name", "account_id", "sender_normalized", "sender_name"),
+        # Covers the per-domain display-name grouping of /insights/senders
+        Index(
+            "ix_email_metadata_account_domain_name",
+            "account_id", "sender_domain", "sender_name", "sender_registrable_domain"
+        ),
+        Index("ix_email_metadata_account_registrable_domain", "account_id", "sender_registrable_domain"),
     )
     
     account = relationship("EmailAccount", back_populates="emails")
@@ -103,6 +127,12 @@ class AnalysisRun(Base):
     completed_at = Column(DateTime)
     error_message = Column(Text, nullable=True)  # Store error details for failed runs
     
+    __table_args__ = (
+        # Keyset pagination of /analysis/runs by (created_at desc, id desc), per user or per account
+        Index("ix_analysis_runs_user_created", "user_id", "created_at", "id"),
+        Index("ix_analysis_runs_account_created", "account_id", "created_at", "id"),
+    )
+    
     user = relationship("User", back_populates="analysis_runs")
 
 class AnalysisResult(Base):
@@ -112,18 +142,43 @@ class AnalysisResult(Base):
     email_id = Column(Integer, ForeignKey("email_metadata.id"), nullable=False)
     analysis_run_id = Column(Integer, ForeignKey("analysis_runs.id"), nullable=False)
     
-    # Analysis data (encrypted JSON)
+    # Per-email analysis data (encrypted JSON); batch-level analysis lives in AnalysisSummary
     encrypted_analysis = Column(Text, nullable=False)
+    summary_id = Column(Integer, ForeignKey("analysis_summaries.id"), nullable=True, index=True)
     
     # Indexed fields for quick queries (non-sensitive)
     sender_cluster = Column(String, index=True)
     subject_cluster = Column(String, index=True)
-    category = Column(String, index=True)
+    category = Column(String)
+    # User's custom category resolved at ingestion (app.custom_rules); null when no rule matches
+    custom_category_id = Column(Integer, ForeignKey("custom_categories.id"), nullable=True, index=True)
     
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Results of an email, covering its category for joins from email_metadata
+        Index("ix_analysis_results_email_category", "email_id", "category"),
+        # Results of one category, with the email to join back to email_metadata
+        Index("ix_analysis_results_category_email", "category", "email_id"),
+        # Revert / stop of one run
+        Index("ix_analysis_results_run", "analysis_run_id"),
+    )
+    
     email = relationship("EmailMetadata", back_populates="analysis_results")
 
+class AnalysisSummary(Base):
+    """Batch analysis (top senders, clusters, categories) for one analyzed range, stored once and referenced by its results."""
+    __tablename__ = "analysis_summaries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False, index=True)
+    analysis_run_id = Column(Integer, ForeignKey("analysis_runs.id"), nullable=True, index=True)  # Null for /recalculate
+    range_start = Column(DateTime, nullable=True)
+    range_end = Column(DateTime, nullable=True)
+    encrypted_summary = Column(Text, nullable=False)  # Encrypted analyze_batch output
+    email_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class ProcessedDateRange(Base):
     """Coverage is half-open: [start_date, end_date); end_date is exclusive. See app.range_semantics."""
     __tablename__ = "processed_date_ranges"
@@ -137,10 +192,175 @@ class ProcessedDateRange(Base):
     
     # Ensure no overlapping ranges for same account
     __table_args__ = (
+        # An account's ranges in start order (gap computation, merges, range counts)
+        Index("ix_processed_date_ranges_account_start", "account_id", "start_date"),
         {"sqlite_autoincrement": True},
     )
 
 
+class AnalysisCheckpoint(Base):
+    """
+    Durable fetch progress inside one half-open [range_start, range_end) window.
+    cursor is the provider resume point (Gmail page token / Yahoo last UID); day_counts and
+    frontier_day record which received days are covered (see app.checkpoints).
+    """
+    __tablename__ = "analysis_checkpoints"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False, index=True)
+    run_id = Column(Integer, ForeignKey("analysis_runs.id"), nullable=True)  # Last run that advanced it
+    range_start = Column(DateTime, nullable=False)
+    range_end = Column(DateTime, nullable=False)
+    cursor = Column(Text, nullable=True)  # Next page token / last UID; null before the first page
+    fetch_complete = Column(Boolean, default=False)  # All pages stored; only analysis remains
+    emails_stored = Column(Integer, default=0)
+    day_counts = Column(JSON, default=dict)  # {"YYYY-MM-DD": stored emails} coverage per received day (UTC)
+    frontier_day = Column(Date, nullable=True)  # Received day (UTC) of the last stored email, in fetch order
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('account_id', 'range_start', 'range_end', name='uq_checkpoint_account_range'),
+    )
+
+
+class AccountAggregate(Base):
+    """
+    Mergeable account-wide analysis state (app.aggregates.BatchAggregates), kept current by
+    merging each analyzed range's delta. encrypted_state holds the bounded part (totals,
+    sketches, histograms); per-sender, per-day and per-cluster counters are
+    AccountAggregateEntry rows. encrypted_state is null when invalidated by a destructive
+    change; it is rebuilt from the stored emails on next read (app.account_aggregates).
+    """
+    __tablename__ = "account_aggregates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False, unique=True, index=True)
+    encrypted_state = Column(Text, nullable=True)  # Encrypted bounded BatchAggregates state; null = invalid
+    email_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AccountAggregateEntry(Base):
+    """
+    One keyed counter of an account's aggregates (app.account_aggregates): a normalized
+    sender (detail: {"name", "received"}, the display name and the timestamp of its email),
+    a received day ("YYYY-MM-DD") or a subject cluster id (detail: sample subjects). A
+    delta merge updates only the keys it contains.
+    """
+    __tablename__ = "account_aggregate_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False)
+    kind = Column(String, nullable=False)  # "sender" | "day" | "cluster"
+    key = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    detail = Column(JSON, nullable=True)
+    
+    __table_args__ = (
+        UniqueConstraint("account_id", "kind", "key", name="uq_account_aggregate_entries_key"),
+    )
+
+
+class AccountStats(Base):
+    """
+    Account-level counters for /summary (app.account_stats): updated with each stored email
+    chunk and recomputed after deletions, so the summary never scans email_metadata.
+    data_version keys the insights response cache.
+    """
+    __tablename__ = "account_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False, unique=True, index=True)
+    email_count = Column(Integer, nullable=False, default=0)
+    sender_count = Column(Integer, nullable=False, default=0)  # Distinct sender_normalized
+    earliest_date = Column(DateTime, nullable=True)
+    latest_date = Column(DateTime, nullable=True)
+    range_count = Column(Integer, nullable=False, default=0)  # ProcessedDateRange rows
+    data_version = Column(Integer, nullable=False, default=0)  # Bumped by every insights-visible write (app.response_cache)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SenderStat(Base):
+    """Email count per (account, normalized sender), kept with the stored emails (app.sender_stats)."""
+    __tablename__ = "sender_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False)
+    sender = Column(String, nullable=False)  # sender_normalized ("" for emails without one)
+    name = Column(String, nullable=True)  # Greatest sender_name seen
+    email_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint("account_id", "sender", name="uq_sender_stats_account_sender"),
+        # Pages of senders by (count desc, sender) are range reads on this index
+        Index("ix_sender_stats_account_count_sender", "account_id", email_count.desc(), "sender"),
+    )
+
+
+class SenderSketch(Base):
+    """
+    HyperLogLog registers of the distinct normalized senders per (account, received month),
+    kept with the stored emails (app.sender_sketches). month is "YYYY-MM".
+    """
+    __tablename__ = "sender_sketches"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False)
+    month = Column(String(7), nullable=False)
+    registers = Column(LargeBinary, nullable=False)  # HyperLogLog.to_bytes()
+    
+    __table_args__ = (
+        UniqueConstraint("account_id", "month", name="uq_sender_sketch_account_month"),
+    )
+
+
+class DailyRollup(Base):
+    """
+    Analysis result counts per (account, received day, category, sender domain), updated in the
+    same transaction as the results they count (app.daily_rollups). domain is "" for senders
+    without one.
+    """
+    __tablename__ = "daily_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    category = Column(String, nullable=False)
+    domain = Column(String, nullable=False, default="")
+    email_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint("account_id", "day", "category", "domain", name="uq_daily_rollup_key"),
+    )
+
+
+class SubjectCluster(Base):
+    """
+    Stable near-duplicate subject cluster of an account (app.subject_clusters). The leader's
+    MinHash signature is kept so new subjects can be verified against it incrementally.
+    """
+    __tablename__ = "subject_clusters"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False, index=True)
+    representative = Column(String)  # First subject that founded the cluster
+    signature = Column(JSON, nullable=False)  # MinHash signature of the leader (list of ints)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SubjectClusterBand(Base):
+    """LSH band bucket of a cluster leader: (account, band key) -> cluster."""
+    __tablename__ = "subject_cluster_bands"
+    __table_args__ = (
+        Index("ix_subject_cluster_bands_account_key", "account_id", "band_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id"), nullable=False)
+    band_key = Column(BigInteger, nullable=False)
+    cluster_id = Column(Integer, ForeignKey("subject_clusters.id", ondelete="CASCADE"), nullable=False, index=True)
+
+
 class CustomCategory(Base):
     """User-defined category (e.g. Finance, Urgent)."""
     __tablename__ = "custom_categories"
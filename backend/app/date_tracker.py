@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 from typing import List, Tuple, Optional
 import logging
 from app.database import ProcessedDateRange
+from app.account_stats import AccountStatsStore
 from app.range_semantics import (
     half_open_row_overlaps_window,
     merge_touching_or_overlapping_sorted,
@@ -164,6 +165,7 @@ class DateTracker:
                 emails_count=emails_count
             )
             self.db.add(new_range)
+        AccountStatsStore(self.db, self.account_id).refresh_range_count()
         
         try:
             self.db.commit()
@@ -202,6 +204,7 @@ class DateTracker:
                 logger.info(f"Deleting {len(overlapping)} rows overlapping [{range_start}, {range_end})")
                 for r in overlapping:
                     self.db.delete(r)
+        AccountStatsStore(self.db, self.account_id).refresh_range_count()
         
         try:
             self.db.commit()
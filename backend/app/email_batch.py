@@ -0,0 +1,106 @@
+"""
+Columnar (struct-of-arrays) representation of an email batch for the analysis engine.
+
+``EmailBatch`` interns senders and subjects into string tables and keeps one
+compact ``array`` per field instead of a dict per email:
+
+  sender_ids / subject_ids   index into ``senders`` / ``subjects`` (first-appearance order)
+  timestamps                 epoch microseconds of the received wall clock (tzinfo dropped,
+                             as email_metadata stores it)
+  day_ordinals               ``date_received.date().toordinal()``, 0 when missing
+  hours                      ``date_received.hour``, -1 when missing (same clock as day_ordinals)
+  categories                 category assigned while parsing (app.email_connectors.parsing), else None
+
+Aggregation then works on the small tables and C-level passes over the arrays
+(``Counter`` over ids, ``min``/``max`` over timestamps), and per-sender or
+per-subject work (categorization, clustering, labels) runs once per unique value.
+Microseconds rather than seconds are kept so min/max reproduce the exact dates.
+"""
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+# timestamps value for emails without a date
+MISSING_TIMESTAMP = -(1 << 63)
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_timestamp(value: datetime) -> int:
+    """Epoch microseconds of value's wall clock; tzinfo is dropped, as the DateTime column does."""
+    return (value.replace(tzinfo=None) - _EPOCH) // _MICROSECOND
+
+
+def from_timestamp(value: int) -> datetime:
+    """Naive datetime of a to_timestamp value."""
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def name_key(received: int, name: Optional[str]) -> tuple:
+    """
+    Order of the names seen for one sender: the latest-received email's name wins and
+    equal dates keep the greater name, so the kept name does not depend on email order.
+    """
+    return received, name or ""
+
+
+class EmailBatch:
+    """Emails of one batch as interned string tables plus parallel id/time arrays."""
+
+    def __init__(self):
+        self.senders: List[Optional[str]] = []
+        self.sender_names: List[Optional[str]] = []  # Name per sender id, chosen by name_key
+        self.sender_name_received = array("q")  # Timestamp of the email each name came from
+        self.subjects: List[Optional[str]] = []
+        self.sender_ids = array("I")
+        self.subject_ids = array("I")
+        self.timestamps = array("q")
+        self.day_ordinals = array("i")
+        self.hours = array("b")
+        self.categories: List[Optional[str]] = []
+        self._sender_index: Dict[Optional[str], int] = {}
+        self._subject_index: Dict[Optional[str], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.sender_ids)
+
+    def append(self, email: Dict) -> None:
+        received = email.get("date_received")
+        timestamp = MISSING_TIMESTAMP if received is None else to_timestamp(received)
+
+        sender = email.get("sender_email", "")
+        name = email.get("sender_name")
+        sender_id = self._sender_index.get(sender)
+        if sender_id is None:
+            sender_id = self._sender_index[sender] = len(self.senders)
+            self.senders.append(sender)
+            self.sender_names.append(name)
+            self.sender_name_received.append(timestamp)
+        elif name_key(timestamp, name) > name_key(self.sender_name_received[sender_id], self.sender_names[sender_id]):
+            self.sender_names[sender_id] = name
+            self.sender_name_received[sender_id] = timestamp
+        self.sender_ids.append(sender_id)
+
+        subject = email.get("subject", "")
+        subject_id = self._subject_index.get(subject)
+        if subject_id is None:
+            subject_id = self._subject_index[subject] = len(self.subjects)
+            self.subjects.append(subject)
+        self.subject_ids.append(subject_id)
+
+        self.timestamps.append(timestamp)
+        if received is None:
+            self.day_ordinals.append(0)
+            self.hours.append(-1)
+        else:
+            self.day_ordinals.append(received.date().toordinal())
+            self.hours.append(received.hour)
+        self.categories.append(email.get("category"))
+
+    @classmethod
+    def from_records(cls, emails: Iterable[Dict]) -> "EmailBatch":
+        """Batch of ``emails`` in order; a single pass, so any iterable (or spill buffer) works."""
+        batch = cls()
+        for email in emails:
+            batch.append(email)
+        return batch
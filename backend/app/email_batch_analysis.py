@@ -1,200 +1,96 @@
 """
 Heuristic email batch analysis (no spaCy / sklearn).
-Same dict shape as historical NLPAnalyzer.analyze_batch for stored insights.
+``aggregate_batch(...)[0].to_analysis()`` has the same dict shape as historical
+NLPAnalyzer.analyze_batch for stored insights.
 """
 
-from collections import Counter
-from typing import Dict, List
-
-from dateutil import tz
-
-
-def analyze_batch(emails: List[Dict]) -> Dict:
-    if not emails:
-        return {
-            "sender_patterns": {},
-            "subject_clusters": [],
-            "frequency_analysis": {},
-            "categories": {},
-            "total_emails": 0,
-            "unique_senders": 0,
-            "date_range": {"start": None, "end": None},
-        }
-
-    subjects = [e.get("subject", "") for e in emails]
-    senders = [e.get("sender_email", "") for e in emails]
-    dates = [e.get("date_received") for e in emails]
-
-    sender_patterns = _analyze_sender_patterns(emails)
-    subject_clusters = _subject_clusters_simple(subjects)
-    frequency_analysis = _analyze_frequency(emails, dates)
-    categories = _categorize_emails(emails)
-
-    return {
-        "sender_patterns": sender_patterns,
-        "subject_clusters": subject_clusters,
-        "frequency_analysis": frequency_analysis,
-        "categories": categories,
-        "total_emails": len(emails),
-        "unique_senders": len(set(senders)),
-        "date_range": _get_date_range(dates),
-    }
-
-
-def _analyze_sender_patterns(emails: List[Dict]) -> Dict:
-    sender_counts = Counter(e.get("sender_email", "") for e in emails)
-    sender_names = {e.get("sender_email", ""): e.get("sender_name") for e in emails}
-
-    domain_counts = Counter()
-    for sender in sender_counts.keys():
-        if "@" in sender:
-            domain = sender.split("@")[1]
-            domain_counts[domain] += sender_counts[sender]
-
-    top_senders = [
-        {
-            "email": email,
-            "name": sender_names.get(email),
-            "count": count,
-            "percentage": round(count / len(emails) * 100, 2),
-        }
-        for email, count in sender_counts.most_common(20)
-    ]
-
-    return {
-        "top_senders": top_senders,
-        "top_domains": [
-            {"domain": domain, "count": count}
-            for domain, count in domain_counts.most_common(10)
-        ],
-        "total_unique_senders": len(sender_counts),
-    }
-
-
-def _representative_subject(subjects: List[str]) -> str:
-    non_empty = [s for s in subjects if s and str(s).strip()]
-    if non_empty:
-        return min(non_empty, key=len)
-    return subjects[0] if subjects else ""
-
-
-def _subject_clusters_simple(subjects: List[str]) -> List[Dict]:
-    if not subjects:
-        return []
-    unique_subjects = list(dict.fromkeys(subjects))
-    sample = unique_subjects[:500]
-    return [
-        {
-            "cluster_id": 0,
-            "subjects": sample,
-            "count": len(subjects),
-            "representative": _representative_subject(unique_subjects),
-        }
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from app.aggregates import BatchAggregates
+from app.categorization import categorize
+from app.email_batch import EmailBatch
+from app.sender_identity import normalize_sender
+from app.subject_clustering import cluster_subjects, normalize_subject
+
+Emails = Union[EmailBatch, Iterable[Dict]]
+
+
+def _as_batch(emails: Emails) -> EmailBatch:
+    return emails if isinstance(emails, EmailBatch) else EmailBatch.from_records(emails)
+
+
+def _categorize_batch(batch: EmailBatch) -> List[str]:
+    """
+    Category per email: the one assigned while parsing when present, otherwise
+    classifying each distinct (subject, sender) pair once.
+    """
+    senders, subjects = batch.senders, batch.subjects
+    pair_categories: Dict[Tuple[int, int], str] = {}
+    email_categories = []
+    for category, pair in zip(batch.categories, zip(batch.subject_ids, batch.sender_ids)):
+        if category is None:
+            category = pair_categories.get(pair)
+            if category is None:
+                category = pair_categories[pair] = categorize(subjects[pair[0]], senders[pair[1]])
+        email_categories.append(category)
+    return email_categories
+
+
+def aggregate_batch(
+    emails: Emails, subject_clusters: Optional[Dict[str, int]] = None
+) -> Tuple[BatchAggregates, List[str]]:
+    """
+    Mergeable aggregates for the batch plus each email's category.
+
+    ``emails`` is an EmailBatch, or records read once into one (a list or a
+    disk-backed buffer, see app.spill_buffer). ``subject_clusters`` maps normalized
+    subjects to stored cluster ids (see app.subject_clusters); without it the
+    batch's own subjects are clustered.
+    """
+    batch = _as_batch(emails)
+    if subject_clusters is None:
+        subject_clusters = cluster_subjects(batch.subjects)
+    subject_cluster_ids = [subject_clusters.get(normalize_subject(subject)) for subject in batch.subjects]
+    email_categories = _categorize_batch(batch)
+    return BatchAggregates.from_batch(batch, email_categories, subject_cluster_ids), email_categories
+
+
+def classify_batch(
+    emails: Emails,
+    analysis: Dict,
+    email_categories: List[str],
+    subject_clusters: Optional[Dict[str, int]] = None
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    (sender_cluster, subject_cluster, category) for every email, lazily.
+
+    Labels are computed once per entry of the batch's sender and subject tables and
+    then looked up by id. Subjects are labelled from ``subject_clusters`` (the mapping
+    given to ``aggregate_batch``), or from the analysis' listed clusters without one.
+    Categories come from ``aggregate_batch`` instead of being recomputed.
+    """
+    batch = _as_batch(emails)
+    sender_index: Dict[str, str] = {}
+    top_senders = (analysis.get("sender_patterns") or {}).get("top_senders", [])
+    for idx, sender_info in enumerate(top_senders[:10]):
+        sender_index.setdefault(sender_info["email"], f"sender_top_{idx + 1}")
+
+    if subject_clusters is None:
+        subject_clusters = {}
+        for cluster in analysis.get("subject_clusters") or []:
+            for subject in cluster.get("subjects", []):
+                subject_clusters.setdefault(normalize_subject(subject), cluster["cluster_id"])
+
+    sender_labels = [
+        sender_index.get(normalize_sender(sender).address, "sender_other") for sender in batch.senders
     ]
+    subject_labels = []
+    for subject in batch.subjects:
+        cluster_id = subject_clusters.get(normalize_subject(subject))
+        subject_labels.append("subject_unclustered" if cluster_id is None else f"subject_cluster_{cluster_id}")
 
+    return (
+        (sender_labels[sender_id], subject_labels[subject_id], category)
+        for sender_id, subject_id, category in zip(batch.sender_ids, batch.subject_ids, email_categories)
+    )
 
-def _analyze_frequency(emails: List[Dict], dates: List) -> Dict:
-    if not dates:
-        return {}
-    daily_counts = Counter(d.date() for d in dates if d)
-    return {
-        "daily_average": round(len(emails) / max(len(daily_counts), 1), 2),
-    }
-
-
-def _categorize_emails(emails: List[Dict]) -> Dict:
-    categories = {
-        "notifications": 0,
-        "newsletters": 0,
-        "social": 0,
-        "shopping": 0,
-        "work": 0,
-        "personal": 0,
-        "other": 0,
-    }
-
-    notification_keywords = [
-        "notification",
-        "alert",
-        "reminder",
-        "confirm",
-        "receipt",
-    ]
-    newsletter_keywords = [
-        "newsletter",
-        "digest",
-        "weekly",
-        "monthly",
-        "unsubscribe",
-    ]
-    social_keywords = [
-        "facebook",
-        "twitter",
-        "linkedin",
-        "instagram",
-        "social",
-    ]
-    shopping_keywords = [
-        "order",
-        "purchase",
-        "shipping",
-        "delivery",
-        "amazon",
-        "ebay",
-    ]
-    work_keywords = ["meeting", "calendar", "team", "project", "deadline"]
-
-    for email in emails:
-        subject = (email.get("subject", "") or "").lower()
-        sender = (email.get("sender_email", "") or "").lower()
-
-        categorized = False
-
-        if any(kw in subject for kw in notification_keywords):
-            categories["notifications"] += 1
-            categorized = True
-        elif any(kw in subject or kw in sender for kw in newsletter_keywords):
-            categories["newsletters"] += 1
-            categorized = True
-        elif any(kw in sender for kw in social_keywords):
-            categories["social"] += 1
-            categorized = True
-        elif any(kw in subject or kw in sender for kw in shopping_keywords):
-            categories["shopping"] += 1
-            categorized = True
-        elif any(kw in subject for kw in work_keywords):
-            categories["work"] += 1
-            categorized = True
-        elif "@" in sender and not any(
-            kw in sender for kw in ["noreply", "no-reply", "donotreply"]
-        ):
-            categories["personal"] += 1
-            categorized = True
-
-        if not categorized:
-            categories["other"] += 1
-
-    return categories
-
-
-def _get_date_range(dates: List) -> Dict:
-    if not dates:
-        return {"start": None, "end": None}
-
-    normalized_dates = []
-    for date in dates:
-        if date is None:
-            continue
-        if date.tzinfo is not None:
-            normalized = date.astimezone(tz.UTC).replace(tzinfo=None)
-        else:
-            normalized = date
-        normalized_dates.append(normalized)
-
-    if not normalized_dates:
-        return {"start": None, "end": None}
-
-    return {
-        "start": min(normalized_dates).isoformat(),
-        "end": max(normalized_dates).isoformat(),
-    }
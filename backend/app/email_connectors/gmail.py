@@ -7,11 +7,11 @@ import base64
 import json
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
-from email.utils import parsedate_to_datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+from app.email_connectors.parsing import parse_gmail_metadata
 from app.range_semantics import half_open_contains_instant
 
 # Per date-range fetch cap (analysis passes the default). Gmail queries can match far more than this.
@@ -121,7 +121,11 @@ class GmailConnector:
         end_date: datetime,
         max_results: int = DEFAULT_MAX_RESULTS_PER_RANGE,
         progress_callback: callable = None,
-        exclude_sent: bool = True
+        exclude_sent: bool = True,
+        resume_cursor: Optional[str] = None,
+        page_callback: callable = None,
+        known_ids=None,
+        cancel_token=None
     ) -> List[Dict]:
         """
         Fetch emails within date range
@@ -131,32 +135,59 @@ class GmailConnector:
             max_results: Safety cap per fetch; if the query matches more, remaining messages are skipped
                 (insights then reflect only what was ingested). Default is very large for full-mailbox runs.
             exclude_sent: If True, excludes sent emails (only fetches received emails)
+            resume_cursor: messages.list page token saved by an earlier attempt; fetching starts there.
+            page_callback: Called as page_callback(page_emails, next_cursor) after each list page.
+                Pages handed to the callback are not accumulated (the returned list is empty);
+                next_cursor is None once the last page has been delivered.
+            known_ids: Container of message IDs already stored (e.g. KnownMessageIndex); those
+                messages are skipped without a messages.get call.
+            cancel_token: CancellationToken checked before every list and get call; raises
+                AnalysisCancelled once the run is stopped.
         """
         query = _gmail_query_half_open(start_date, end_date, exclude_sent)
         
         emails = []
-        page_token = None
+        fetched = 0
+        skipped_known = 0
+        page_token = resume_cursor
         truncated = False
         
         try:
-            while len(emails) < max_results:
+            while fetched < max_results:
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
                 request = self.service.users().messages().list(
                     userId='me',
                     q=query,
-                    maxResults=min(500, max_results - len(emails)),
+                    maxResults=min(500, max_results - fetched),
                     pageToken=page_token
                 )
-                response = request.execute()
+                try:
+                    response = request.execute()
+                except Exception as e:
+                    if not (resume_cursor and page_token == resume_cursor):
+                        raise
+                    # Page tokens can expire; restart the window (stored messages are de-duplicated by the caller)
+                    logger.warning(f"Resume page token rejected ({e}); restarting range from the first page")
+                    resume_cursor = None
+                    page_token = None
+                    continue
                 
                 next_page = response.get('nextPageToken')
                 messages = response.get('messages', [])
                 if not messages:
                     break
                 
+                page_emails = []
                 # Batch fetch message details
                 for msg in messages:
-                    if len(emails) >= max_results:
+                    if fetched >= max_results:
                         break
+                    if known_ids is not None and msg['id'] in known_ids:
+                        skipped_known += 1
+                        continue
+                    if cancel_token:
+                        cancel_token.raise_if_cancelled()
                     
                     try:
                         msg_detail = self.service.users().messages().get(
@@ -166,40 +197,17 @@ class GmailConnector:
                             metadataHeaders=['From', 'Subject', 'Date']
                         ).execute()
                         
-                        headers = {h['name']: h['value'] for h in msg_detail.get('payload', {}).get('headers', [])}
-                        
-                        # Parse date (prefer internalDate for consistency with search window)
-                        date_str = headers.get('Date', '')
-                        try:
-                            date_received = parsedate_to_datetime(date_str)
-                        except Exception:
-                            date_received = datetime.fromtimestamp(
-                                int(msg_detail['internalDate']) / 1000.0,
-                                tz=timezone.utc,
-                            )
-                        
-                        if not half_open_contains_instant(date_received, start_date, end_date):
+                        # Parsed inline: each message already costs an API round trip
+                        email_data = parse_gmail_metadata(msg['id'], msg_detail, start_date, end_date)
+                        if email_data is None:
                             continue
-                        
-                        # Parse sender
-                        from_header = headers.get('From', '')
-                        sender_email = self._extract_email(from_header)
-                        sender_name = self._extract_name(from_header)
-                        
-                        emails.append({
-                            'message_id': msg['id'],
-                            'sender_email': sender_email,
-                            'sender_name': sender_name,
-                            'subject': headers.get('Subject', ''),
-                            'date_received': date_received,
-                            'thread_id': msg_detail.get('threadId'),
-                            'snippet': msg_detail.get('snippet', '')
-                        })
+                        page_emails.append(email_data)
+                        fetched += 1
                         
                         # Call progress callback every 25 emails
-                        if progress_callback and len(emails) % 25 == 0:
+                        if progress_callback and fetched % 25 == 0:
                             try:
-                                progress_callback(len(emails), max_results)
+                                progress_callback(fetched, max_results)
                             except Exception as e:
                                 print(f"Progress callback failed: {e}")
                                 
@@ -207,9 +215,16 @@ class GmailConnector:
                         print(f"Error fetching message {msg['id']}: {e}")
                         continue
                 
-                if len(emails) >= max_results:
-                    if next_page:
-                        truncated = True
+                if fetched >= max_results and next_page:
+                    truncated = True
+                
+                if page_callback:
+                    # Cursor only advances once the caller has stored this page
+                    page_callback(page_emails, None if truncated else next_page)
+                else:
+                    emails.extend(page_emails)
+                
+                if fetched >= max_results:
                     break
                 page_token = next_page
                 if not page_token:
@@ -219,6 +234,9 @@ class GmailConnector:
             print(f"Error fetching emails: {e}")
             raise
         
+        if skipped_known:
+            logger.info(f"Skipped {skipped_known} already stored messages for range {start_date} to {end_date}")
+        
         if truncated:
             logger.warning(
                 "Gmail fetch for range %s–%s hit max_results=%s with more pages available. "
@@ -230,22 +248,6 @@ class GmailConnector:
         
         return emails
     
-    def _extract_email(self, from_header: str) -> str:
-        """Extract email address from From header"""
-        import re
-        match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', from_header)
-        return match.group(0) if match else from_header
-    
-    def _extract_name(self, from_header: str) -> Optional[str]:
-        """Extract sender name from From header"""
-        import re
-        # Try to extract name from "Name <email@domain.com>" format
-        match = re.match(r'^(.+?)\s*<[\w\.-]+@[\w\.-]+\.\w+>', from_header)
-        if match:
-            name = match.group(1).strip().strip('"\'')
-            return name if name else None
-        return None
-    
     @staticmethod
     def get_authorization_url(redirect_uri: str, client_id: str, client_secret: str) -> tuple[str, str]:
         """Get OAuth authorization URL and state"""
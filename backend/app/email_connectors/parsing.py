@@ -0,0 +1,153 @@
+"""
+Pure header parsing shared by the connectors and the parse pool (app.parse_pool).
+
+Everything here is module-level and depends only on its arguments, so a page of
+raw headers can be parsed in a worker process and the records sent back. Parsed
+records carry the default-rules ``category`` too, so classification happens in the
+same pass (app.email_batch_analysis reuses it instead of classifying again).
+"""
+import email
+import email.utils
+import logging
+import re
+from datetime import datetime, timezone
+from email.header import decode_header
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.categorization import categorize
+from app.range_semantics import half_open_contains_instant
+
+logger = logging.getLogger(__name__)
+
+_EMAIL_ADDRESS = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')
+_NAME_AND_ADDRESS = re.compile(r'^(.+?)\s*<[\w\.-]+@[\w\.-]+\.\w+>')
+
+
+def decode_header_value(header: str) -> str:
+    """Decode an RFC 2047 encoded header"""
+    if not header:
+        return ""
+    decoded_parts = decode_header(header)
+    decoded_str = ""
+    for part, encoding in decoded_parts:
+        if isinstance(part, bytes):
+            decoded_str += part.decode(encoding or 'utf-8', errors='ignore')
+        else:
+            decoded_str += part
+    return decoded_str
+
+
+def extract_email(from_header: str) -> str:
+    """Extract email address from From header"""
+    match = _EMAIL_ADDRESS.search(from_header)
+    return match.group(0) if match else from_header
+
+
+def extract_name(from_header: str) -> Optional[str]:
+    """Extract sender name from a "Name <email@domain.com>" From header"""
+    match = _NAME_AND_ADDRESS.match(from_header)
+    if match:
+        name = match.group(1).strip().strip('"\'')
+        return name if name else None
+    return None
+
+
+def parse_gmail_metadata(
+    message_id: str, msg_detail: Dict, start_date: datetime, end_date: datetime
+) -> Optional[Dict]:
+    """Record for a messages.get(format='metadata') response, or None if outside [start, end)."""
+    headers = {h['name']: h['value'] for h in msg_detail.get('payload', {}).get('headers', [])}
+
+    # Parse date (prefer internalDate for consistency with search window)
+    date_str = headers.get('Date', '')
+    try:
+        date_received = parsedate_to_datetime(date_str)
+    except Exception:
+        date_received = datetime.fromtimestamp(
+            int(msg_detail['internalDate']) / 1000.0,
+            tz=timezone.utc,
+        )
+
+    if not half_open_contains_instant(date_received, start_date, end_date):
+        return None
+
+    from_header = headers.get('From', '')
+    sender_email = extract_email(from_header)
+    subject = headers.get('Subject', '')
+    return {
+        'message_id': message_id,
+        'sender_email': sender_email,
+        'sender_name': extract_name(from_header),
+        'subject': subject,
+        'date_received': date_received,
+        'thread_id': msg_detail.get('threadId'),
+        'snippet': msg_detail.get('snippet', ''),
+        'category': categorize(subject, sender_email)
+    }
+
+
+def parse_imap_headers(
+    uid: str, raw_headers, start_date: datetime, end_date: datetime
+) -> Optional[Dict]:
+    """Record for one BODY.PEEK[HEADER] payload, or None if outside [start, end)."""
+    if isinstance(raw_headers, bytes):
+        msg = email.message_from_bytes(raw_headers)
+    elif isinstance(raw_headers, str):
+        msg = email.message_from_string(raw_headers)
+    else:
+        msg = email.message_from_bytes(bytes(str(raw_headers), 'utf-8'))
+
+    subject = decode_header_value(msg.get('Subject', ''))
+    from_header = msg.get('From', '')
+    date_str = msg.get('Date', '')
+    # Message-ID header as additional identifier (more stable)
+    message_id_header = msg.get('Message-ID', '')
+
+    try:
+        date_tuple = email.utils.parsedate_tz(date_str)
+        if date_tuple:
+            date_received = datetime.fromtimestamp(email.utils.mktime_tz(date_tuple))
+        else:
+            date_received = datetime.now()
+    except Exception:
+        date_received = datetime.now()
+
+    if not half_open_contains_instant(date_received, start_date, end_date):
+        return None
+
+    if message_id_header:
+        # Format: yahoo_uid_<uid>_msgid_<message_id> (unique even if Message-ID lacks angle brackets)
+        message_id = f"yahoo_uid_{uid}_msgid_{message_id_header.strip('<>')}"
+    else:
+        # Fallback to UID with prefix to distinguish from old sequence numbers
+        message_id = f"yahoo_uid_{uid}"
+
+    sender_email = extract_email(from_header)
+    return {
+        'message_id': message_id,
+        'sender_email': sender_email,
+        'sender_name': extract_name(from_header),
+        'subject': subject,
+        'date_received': date_received,
+        'thread_id': None,  # IMAP doesn't provide thread ID easily
+        # Only headers are fetched, so the decoded subject stands in for the body snippet
+        'snippet': subject[:200],
+        'category': categorize(subject, sender_email)
+    }
+
+
+def parse_imap_header_page(
+    items: List[Tuple[str, object]], start_date: datetime, end_date: datetime
+) -> List[Dict]:
+    """Records for a page of (uid, raw headers) pairs; unparseable messages are skipped."""
+    records = []
+    for uid, raw_headers in items:
+        try:
+            record = parse_imap_headers(uid, raw_headers, start_date, end_date)
+        except Exception as e:
+            logger.warning(f"Error parsing headers for UID {uid}: {e}, skipping")
+            continue
+        if record is not None:
+            records.append(record)
+    return records
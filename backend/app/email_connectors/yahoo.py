@@ -1,15 +1,13 @@
 import imaplib
-import email
-from email.header import decode_header
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
-import re
 import socket
 import logging
 
 logger = logging.getLogger(__name__)
 
-from app.range_semantics import half_open_contains_instant
+from app.email_connectors.parsing import parse_imap_header_page
+from app.parse_pool import PagePipeline
 
 # Per date-range cap (Yahoo IMAP); larger mailboxes may need smaller ranges instead of one huge pull.
 MAILMIND_YAHOO_MAX_PER_RANGE = 250_000
@@ -99,7 +97,11 @@ class YahooConnector:
         start_date: datetime, 
         end_date: datetime,
         max_results: int = MAILMIND_YAHOO_MAX_PER_RANGE,
-        progress_callback: callable = None
+        progress_callback: callable = None,
+        resume_cursor: Optional[str] = None,
+        page_callback: callable = None,
+        known_ids=None,
+        cancel_token=None
     ) -> List[Dict]:
         """
         Fetch emails within date range using IMAP UID (stable identifier)
@@ -108,8 +110,20 @@ class YahooConnector:
         Uses UID instead of sequence numbers because:
         - UIDs are stable and don't change when emails are deleted
         - Prevents duplicate email issues when re-analyzing date ranges
+        
+        resume_cursor is the last UID stored by an earlier attempt; only higher UIDs are fetched.
+        page_callback(page_emails, next_cursor) is called after each UID batch; pages handed to it
+        are not accumulated (the returned list is empty) and next_cursor is None after the last batch.
+        known_ids is a container of stored message IDs (e.g. KnownMessageIndex); UIDs whose
+        yahoo_uid_<uid> ID is in it are dropped before any UID FETCH.
+        cancel_token (CancellationToken) is checked before every batch and UID FETCH and
+        raises AnalysisCancelled once the run is stopped.
+        Header pages are parsed and classified by app.parse_pool: in worker processes while
+        later batches are fetched when MAILMIND_PARSE_WORKERS is set, inline otherwise. Either
+        way page_callback receives the pages in UID order.
         """
         self._connect()
+        parser = None
         
         try:
             logger.info(f"Selecting INBOX for {self.email_address}")
@@ -138,8 +152,20 @@ class YahooConnector:
             
             email_uids = message_uids[0].split()
             total_found = len(email_uids)
+            # Ascending UIDs make the checkpoint a simple high-water mark
+            email_uids = sorted(email_uids, key=int)
+            if resume_cursor:
+                email_uids = [uid for uid in email_uids if int(uid) > int(resume_cursor)]
+                logger.info(f"Resuming after UID {resume_cursor}: {len(email_uids)} of {total_found} UIDs left")
+            if known_ids is not None:
+                unknown_uids = [
+                    uid for uid in email_uids
+                    if f"yahoo_uid_{uid.decode() if isinstance(uid, bytes) else uid}" not in known_ids
+                ]
+                if len(unknown_uids) < len(email_uids):
+                    logger.info(f"Skipping {len(email_uids) - len(unknown_uids)} already stored UIDs")
+                email_uids = unknown_uids
             logger.info(f"Found {total_found} emails in date range, limiting to {max_results}")
-            print(f"[PRINT] Found {total_found} emails, processing...")
             
             emails = []
             
@@ -157,18 +183,26 @@ class YahooConnector:
             
             # Process emails with progress logging
             logger.info(f"Starting to process {len(email_uids)} emails...")
-            print(f"[PRINT] Processing {len(email_uids)} emails...")
             
             # Process in smaller batches to avoid timeouts
             # Use smaller batches (50) for better progress tracking and timeout recovery
             batch_size = 50
+            parser = PagePipeline(parse_imap_header_page)
+            
+            def deliver(page_emails, cursor):
+                if page_callback:
+                    page_callback(page_emails, cursor)
+                else:
+                    emails.extend(page_emails)
             
             for batch_start in range(0, len(email_uids), batch_size):
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
                 batch_end = min(batch_start + batch_size, len(email_uids))
                 batch_uids = email_uids[batch_start:batch_end]
+                raw_pages = []
                 
                 logger.info(f"Processing batch {batch_start//batch_size + 1}: emails {batch_start+1}-{batch_end} of {len(email_uids)}")
-                print(f"[PRINT] Processing batch {batch_start//batch_size + 1}: {batch_start+1}-{batch_end}/{len(email_uids)}")
                 
                 # Refresh connection every few batches to avoid stale connections
                 if batch_start > 0 and batch_start % (batch_size * 3) == 0:
@@ -181,10 +215,11 @@ class YahooConnector:
                         logger.warning(f"Error refreshing connection: {e}, continuing with existing connection")
                 
                 for idx, email_uid in enumerate(batch_uids):
+                    if cancel_token:
+                        cancel_token.raise_if_cancelled()
                     global_idx = batch_start + idx
                     if global_idx > 0 and global_idx % 25 == 0:
                         logger.info(f"Processed {global_idx}/{len(email_uids)} emails...")
-                        print(f"[PRINT] Processed {global_idx}/{len(email_uids)} emails...")
                         # Call progress callback to update database
                         if progress_callback:
                             try:
@@ -192,6 +227,7 @@ class YahooConnector:
                             except Exception as e:
                                 logger.warning(f"Progress callback failed: {e}")
                     
+                    uid_str = email_uid.decode() if isinstance(email_uid, bytes) else str(email_uid)
                     try:
                         # Use UID fetch to get only headers (much faster than full RFC822)
                         # Set a shorter timeout per email (10 seconds) to avoid hanging
@@ -202,11 +238,9 @@ class YahooConnector:
                             status, msg_data = self.imap.uid('FETCH', email_uid, '(BODY.PEEK[HEADER])')
                         except socket.timeout:
                             logger.warning(f"Timeout fetching email UID {email_uid} (email {global_idx+1}), skipping")
-                            print(f"[PRINT] Timeout on email {global_idx+1}, skipping")
                             continue
                         except Exception as e:
                             logger.warning(f"Error fetching email UID {email_uid} (email {global_idx+1}): {e}, skipping")
-                            print(f"[PRINT] Error on email {global_idx+1}: {e}, skipping")
                             continue
                         finally:
                             # Restore original timeout
@@ -215,85 +249,29 @@ class YahooConnector:
                         if status != 'OK' or not msg_data or not msg_data[0]:
                             continue
                         
-                        # Parse headers only (no body needed for metadata)
                         # IMAP response structure: [(b'1 (BODY[HEADER] {1234}', b'headers...'), b')']
-                        try:
-                            header_data = msg_data[0]
-                            if isinstance(header_data, tuple):
-                                # Tuple format: (response_string, headers_bytes)
-                                raw_headers = header_data[1] if len(header_data) > 1 else header_data[0]
-                            elif isinstance(header_data, list):
-                                # List format: [response_string, headers_bytes, ...]
-                                raw_headers = header_data[1] if len(header_data) > 1 else header_data[0]
-                            else:
-                                raw_headers = header_data
-                            
-                            if isinstance(raw_headers, bytes):
-                                msg = email.message_from_bytes(raw_headers)
-                            elif isinstance(raw_headers, str):
-                                msg = email.message_from_string(raw_headers)
-                            else:
-                                # Try to convert to bytes
-                                raw_headers = bytes(str(raw_headers), 'utf-8')
-                                msg = email.message_from_bytes(raw_headers)
-                        except Exception as e:
-                            logger.warning(f"Error parsing headers for UID {email_uid} (email {global_idx+1}): {e}, skipping")
-                            print(f"[PRINT] Parse error on email {global_idx+1}: {e}, skipping")
-                            continue
-                        
-                        # Extract headers
-                        subject = self._decode_header(msg.get('Subject', ''))
-                        from_header = msg.get('From', '')
-                        date_str = msg.get('Date', '')
-                        
-                        # Try to get Message-ID header as additional identifier (more stable)
-                        message_id_header = msg.get('Message-ID', '')
-                        
-                        # Parse date
-                        try:
-                            date_tuple = email.utils.parsedate_tz(date_str)
-                            if date_tuple:
-                                date_received = datetime.fromtimestamp(email.utils.mktime_tz(date_tuple))
-                            else:
-                                date_received = datetime.now()
-                        except Exception:
-                            date_received = datetime.now()
-                        
-                        if not half_open_contains_instant(date_received, start_date, end_date):
-                            continue
-                        
-                        # Extract sender
-                        sender_email = self._extract_email(from_header)
-                        sender_name = self._extract_name(from_header)
-                        
-                        # Use UID as message_id (stable identifier)
-                        # Prefer Message-ID header if available, otherwise use UID
-                        uid_str = email_uid.decode() if isinstance(email_uid, bytes) else str(email_uid)
-                        if message_id_header:
-                            # Use Message-ID header if available (most stable)
-                            # Format: yahoo_uid_<uid>_msgid_<message_id>
-                            # This ensures uniqueness even if Message-ID is missing angle brackets
-                            msg_id_clean = message_id_header.strip('<>')
-                            message_id = f"yahoo_uid_{uid_str}_msgid_{msg_id_clean}"
+                        header_data = msg_data[0]
+                        if isinstance(header_data, (tuple, list)):
+                            # (response_string, headers_bytes, ...)
+                            raw_headers = header_data[1] if len(header_data) > 1 else header_data[0]
                         else:
-                            # Fallback to UID with prefix to distinguish from old sequence numbers
-                            message_id = f"yahoo_uid_{uid_str}"
-                        
-                        emails.append({
-                            'message_id': message_id,
-                            'sender_email': sender_email,
-                            'sender_name': sender_name,
-                            'subject': subject,
-                            'date_received': date_received,
-                            'thread_id': None,  # IMAP doesn't provide thread ID easily
-                            'snippet': self._get_snippet(msg)
-                        })
+                            raw_headers = header_data
+                        raw_pages.append((uid_str, raw_headers))
                         
                     except Exception as e:
-                        uid_str = email_uid.decode() if isinstance(email_uid, bytes) else str(email_uid)
                         logger.warning(f"Error processing email UID {uid_str} (email {global_idx+1}): {e}, skipping")
-                        print(f"[PRINT] Error processing email {global_idx+1}: {e}, skipping")
                         continue
+                
+                # Headers are parsed and classified by the parse stage (inline, or in worker
+                # processes while the next batch is fetched); pages come back in order
+                last_uid = batch_uids[-1]
+                last_uid = last_uid.decode() if isinstance(last_uid, bytes) else str(last_uid)
+                next_cursor = last_uid if batch_end < len(email_uids) else None
+                for page_emails, cursor in parser.submit((raw_pages, start_date, end_date), next_cursor):
+                    deliver(page_emails, cursor)
+            
+            for page_emails, cursor in parser.drain():
+                deliver(page_emails, cursor)
             
             logger.info(f"Successfully fetched {len(emails)} emails from date range {start_str} to {end_str}")
             return emails
@@ -305,44 +283,6 @@ class YahooConnector:
             logger.error(f"Error fetching emails: {e}")
             raise
         finally:
+            if parser is not None:
+                parser.close()
             self._disconnect()
-    
-    def _decode_header(self, header: str) -> str:
-        """Decode email header"""
-        if not header:
-            return ""
-        decoded_parts = decode_header(header)
-        decoded_str = ""
-        for part, encoding in decoded_parts:
-            if isinstance(part, bytes):
-                decoded_str += part.decode(encoding or 'utf-8', errors='ignore')
-            else:
-                decoded_str += part
-        return decoded_str
-    
-    def _extract_email(self, from_header: str) -> str:
-        """Extract email address from From header"""
-        match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', from_header)
-        return match.group(0) if match else from_header
-    
-    def _extract_name(self, from_header: str) -> Optional[str]:
-        """Extract sender name from From header"""
-        match = re.match(r'^(.+?)\s*<[\w\.-]+@[\w\.-]+\.\w+>', from_header)
-        if match:
-            name = match.group(1).strip().strip('"\'')
-            return name if name else None
-        return None
-    
-    def _get_snippet(self, msg: email.message.Message) -> str:
-        """Extract text snippet from email"""
-        # Since we're only fetching headers, we can't get the body snippet
-        # Return empty string or use subject as snippet
-        try:
-            subject = msg.get('Subject', '')
-            if subject:
-                decoded_subject = self._decode_header(subject)
-                return decoded_subject[:200] if decoded_subject else ""
-        except:
-            pass
-        return ""
-
@@ -0,0 +1,83 @@
+"""
+Aho-Corasick keyword matching shared by the built-in categories
+(app.categorization) and users' subject rules (app.custom_rules).
+
+``KeywordAutomaton`` compiles (pattern, priority) pairs once; ``match`` walks a
+text's characters a single time and returns the lowest priority of any pattern
+occurring in it (case-insensitive substring matching), or None. Failure links
+are folded into a full transition table at build time, so each character costs
+one dict lookup, and the walk stops once the lowest priority compiled is found.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over lowercased patterns; ``match`` returns the best (lowest) priority."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        # Lowest priority ending at each state, including via failure links; None if none
+        self._best: List[Optional[int]] = [None]
+        for pattern, priority in patterns:
+            pattern = pattern.lower()
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._best.append(None)
+                state = next_state
+            if self._best[state] is None or priority < self._best[state]:
+                self._best[state] = priority
+        self._fail = self._build_failure_links()
+        self._delta = self._build_transitions()
+        priorities = [priority for priority in self._best if priority is not None]
+        self._lowest = min(priorities) if priorities else None
+
+    def __bool__(self) -> bool:
+        return len(self._goto) > 1
+
+    def _build_failure_links(self) -> List[int]:
+        fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                link = fail[state]
+                while link and char not in self._goto[link]:
+                    link = fail[link]
+                # state is never the root here, so this cannot link child to itself
+                fail[child] = self._goto[link].get(char, 0)
+                inherited = self._best[fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+        return fail
+
+    def _build_transitions(self) -> List[Dict[str, int]]:
+        """Next state per (state, char), failure links resolved; chars missing from a state's dict lead to the root."""
+        delta: List[Dict[str, int]] = [dict(self._goto[0])] + [{} for _ in self._goto[1:]]
+        queue = list(self._goto[0].values())
+        for state in queue:
+            queue.extend(self._goto[state].values())
+            # The failure state is shallower, so its row is complete already
+            delta[state] = {**delta[self._fail[state]], **self._goto[state]}
+        return delta
+
+    def match(self, text: Optional[str]) -> Optional[int]:
+        if not text or len(self._goto) == 1:
+            return None
+        delta, best, lowest = self._delta, self._best, self._lowest
+        state = 0
+        found = None
+        for char in text.lower():
+            state = delta[state].get(char, 0)
+            priority = best[state]
+            if priority is not None and (found is None or priority < found):
+                if priority == lowest:
+                    return priority
+                found = priority
+        return found
@@ -0,0 +1,29 @@
+"""
+Opaque cursors for keyset-paginated endpoints.
+
+A cursor carries the sort key of the last row a page returned (plus any value
+the endpoint wants to keep across pages, such as the total from the first page)
+as URL-safe base64 JSON. The next page filters on that key instead of using
+OFFSET, so its cost does not grow with the page number.
+"""
+import base64
+import binascii
+import json
+from typing import Any, Dict
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    raw = json.dumps(state, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """State of an encode_cursor value; raises ValueError for anything else."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if not isinstance(state, dict):
+        raise ValueError("Invalid cursor")
+    return state
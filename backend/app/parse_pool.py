@@ -0,0 +1,96 @@
+"""
+Optional process pool for the CPU-bound parse and classify step of fetching.
+
+Header decoding, date parsing, sender extraction and keyword classification are
+pure Python and hold the GIL, so on large IMAP backfills they pin the analysis
+thread to one core. With MAILMIND_PARSE_WORKERS > 0, connectors hand each page
+of raw headers to a shared ``ProcessPoolExecutor`` and keep fetching while the
+workers parse; ``PagePipeline`` hands the parsed pages back in submission order,
+so page callbacks and resume cursors behave exactly as with inline parsing.
+With 0 workers (the default) pages are parsed inline on the calling thread.
+
+Workers are started with the spawn method (the server is multi-threaded) and only
+import app.email_connectors.parsing and its pure dependencies.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PARSE_WORKERS = int(os.getenv("MAILMIND_PARSE_WORKERS", "0"))
+# Pages submitted ahead of the one being delivered, per worker
+PENDING_PAGES_PER_WORKER = 2
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """The shared worker pool, started on first use; None when parsing inline."""
+    global _executor
+    if PARSE_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Started parse pool with {PARSE_WORKERS} worker processes")
+        return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+atexit.register(shutdown)
+
+
+class PagePipeline:
+    """
+    Ordered parse stage: ``submit(args, context)`` queues ``fn(*args)`` and returns the
+    (result, context) pairs now ready, oldest first; ``drain()`` waits for the rest.
+
+    At most PENDING_PAGES_PER_WORKER pages per worker are in flight; submitting beyond
+    that blocks on the oldest page, which bounds memory when parsing falls behind.
+    """
+
+    def __init__(self, fn: Callable, executor: Optional[ProcessPoolExecutor] = None):
+        self.fn = fn
+        self.executor = executor if executor is not None else get_executor()
+        self.max_pending = max(PARSE_WORKERS, 1) * PENDING_PAGES_PER_WORKER
+        self._pending: Deque[Tuple[Future, Any]] = deque()
+
+    def submit(self, args: Tuple, context: Any = None) -> List[Tuple[Any, Any]]:
+        if self.executor is None:
+            return [(self.fn(*args), context)]
+        self._pending.append((self.executor.submit(self.fn, *args), context))
+        ready = []
+        while self._pending and (len(self._pending) > self.max_pending or self._pending[0][0].done()):
+            future, page_context = self._pending.popleft()
+            ready.append((future.result(), page_context))
+        return ready
+
+    def drain(self) -> List[Tuple[Any, Any]]:
+        ready = []
+        while self._pending:
+            future, page_context = self._pending.popleft()
+            ready.append((future.result(), page_context))
+        return ready
+
+    def close(self) -> None:
+        """Cancel pages not yet delivered (after an error or cancellation)."""
+        while self._pending:
+            future, _ = self._pending.popleft()
+            future.cancel()
@@ -0,0 +1,155 @@
+"""
+In-process progress registry for live analysis runs.
+
+The background analysis thread updates counters here on every progress callback.
+The registry writes them through to ``analysis_runs`` at most once per flush
+interval over the shared engine, instead of opening a sqlite3 connection and
+committing every 25 emails. ``GET /runs/{id}`` reads the registry first and only
+falls back to the row for runs that are not live in this process.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between write-throughs of one run's counters
+FLUSH_INTERVAL_SECONDS = float(os.getenv("MAILMIND_PROGRESS_FLUSH_SECONDS", "2"))
+
+_UNSET = object()
+
+
+class RunProgress:
+    """Mutable counters for one live run; only touched under the registry lock."""
+
+    __slots__ = (
+        "run_id",
+        "emails_processed",
+        "total_emails",
+        "stage",
+        "current_chunk",
+        "total_chunks",
+        "updated_at",
+        "flushed_at",
+        "dirty",
+    )
+
+    def __init__(self, run_id: int, stage: str):
+        self.run_id = run_id
+        self.emails_processed = 0
+        self.total_emails = None
+        self.stage = stage
+        self.current_chunk = None
+        self.total_chunks = None
+        self.updated_at = time.time()
+        self.flushed_at = 0.0
+        self.dirty = False
+
+    def snapshot(self) -> Dict:
+        return {
+            "emails_processed": self.emails_processed,
+            "total_emails": self.total_emails,
+            "stage": self.stage,
+            "current_chunk": self.current_chunk,
+            "total_chunks": self.total_chunks,
+            "updated_at": self.updated_at,
+        }
+
+
+class ProgressRegistry:
+    """Thread-safe run_id -> RunProgress map with throttled write-through to analysis_runs."""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL_SECONDS, engine=None):
+        self.flush_interval = flush_interval
+        self._engine = engine
+        self._runs: Dict[int, RunProgress] = {}
+        self._lock = threading.Lock()
+
+    def _get_engine(self):
+        if self._engine is None:
+            from app.database import engine
+            self._engine = engine
+        return self._engine
+
+    def start(self, run_id: int, stage: str = "starting") -> None:
+        """Register a run as live (resets counters left by an earlier attempt in this process)."""
+        with self._lock:
+            self._runs[run_id] = RunProgress(run_id, stage)
+
+    def update(
+        self,
+        run_id: int,
+        emails_processed=_UNSET,
+        total_emails=_UNSET,
+        stage=_UNSET,
+        current_chunk=_UNSET,
+        total_chunks=_UNSET,
+    ) -> None:
+        """Set any subset of counters; writes through if the flush interval has elapsed."""
+        with self._lock:
+            progress = self._runs.get(run_id)
+            if progress is None:
+                progress = self._runs[run_id] = RunProgress(run_id, "processing")
+            if emails_processed is not _UNSET:
+                progress.emails_processed = emails_processed
+            if total_emails is not _UNSET:
+                progress.total_emails = total_emails
+            if stage is not _UNSET:
+                progress.stage = stage
+            if current_chunk is not _UNSET:
+                progress.current_chunk = current_chunk
+            if total_chunks is not _UNSET:
+                progress.total_chunks = total_chunks
+            progress.updated_at = time.time()
+            progress.dirty = True
+        self.flush(run_id)
+
+    def get(self, run_id: int) -> Optional[Dict]:
+        """Snapshot of a live run's counters, or None if the run is not live in this process."""
+        with self._lock:
+            progress = self._runs.get(run_id)
+            return progress.snapshot() if progress else None
+
+    def flush(self, run_id: int, force: bool = False) -> None:
+        """Write a run's counters to analysis_runs if dirty and the interval has elapsed (or force)."""
+        with self._lock:
+            progress = self._runs.get(run_id)
+            if progress is None or not progress.dirty:
+                return
+            now = time.time()
+            if not force and now - progress.flushed_at < self.flush_interval:
+                return
+            snapshot = progress.snapshot()
+            progress.flushed_at = now
+            progress.dirty = False
+
+        try:
+            with self._get_engine().begin() as conn:
+                conn.execute(
+                    text(
+                        "UPDATE analysis_runs SET emails_processed = :emails_processed, "
+                        "total_emails = COALESCE(:total_emails, total_emails), "
+                        "current_chunk = :current_chunk, total_chunks = :total_chunks "
+                        "WHERE id = :run_id"
+                    ),
+                    {**snapshot, "run_id": run_id},
+                )
+        except Exception as e:
+            # Progress is best-effort; the next update retries the write
+            logger.warning(f"Failed to write progress for run {run_id}: {e}")
+            with self._lock:
+                if run_id in self._runs:
+                    self._runs[run_id].dirty = True
+
+    def finish(self, run_id: int) -> None:
+        """Final write-through, then forget the run."""
+        self.flush(run_id, force=True)
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+
+progress_registry = ProgressRegistry()
@@ -28,6 +28,7 @@ from typing import List, Tuple
 
 __all__ = [
     "naive_utc_instant",
+    "stored_wall_clock",
     "truncate_to_midnight",
     "normalize_analysis_window",
     "is_valid_half_open",
@@ -53,6 +54,13 @@ def naive_utc_instant(dt: datetime | None) -> datetime | None:
     return dt
 
 
+def stored_wall_clock(dt: datetime | None) -> datetime | None:
+    """Naive value a DateTime column keeps for dt: tzinfo dropped, wall clock as received."""
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=None)
+
+
 def truncate_to_midnight(dt: datetime) -> datetime:
     d = naive_utc_instant(dt)
     return d.replace(hour=0, minute=0, second=0, microsecond=0)
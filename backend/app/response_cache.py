@@ -0,0 +1,159 @@
+"""
+Versioned cache of insights responses with ETag / If-None-Match support.
+
+Every account has a ``data_version`` (account_stats.data_version) that each write
+affecting its insights increments in the same transaction: stored email chunks,
+stored analysis results, recalculation, deletes and reverts, and custom-category,
+sender-mapping and subject-rule changes. A cached response is keyed by (endpoint,
+query parameters, versions of the accounts it reads), so a write makes older
+entries unreachable instead of having to find and drop them, and the ETag is
+derived from the same key:
+
+  If-None-Match matches   304 without computing or serializing anything
+  key cached              the stored JSON bytes
+  otherwise               computed, serialized once, stored
+
+Versions live in the database, so every worker process agrees on them; only the
+response bodies are per process. Unreachable entries age out of the LRU.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.account_stats import AccountStatsStore
+
+RESPONSE_CACHE_SIZE = int(os.getenv("MAILMIND_RESPONSE_CACHE_SIZE", "2000"))
+
+# Clients revalidate every time; a matching ETag then costs one version lookup
+CACHE_CONTROL = "private, no-cache"
+
+
+def account_versions(db: Session, account_ids: Iterable[int]) -> Tuple[Tuple[int, int], ...]:
+    """(account_id, data_version) pairs for a cache key, creating missing stats rows."""
+    versions = []
+    created = False
+    for account_id in sorted(account_ids):
+        store = AccountStatsStore(db, account_id)
+        stats = store.get()
+        if stats is None:
+            stats = store.refresh()
+            created = True
+        versions.append((account_id, stats.data_version or 0))
+    if created:
+        db.commit()
+    return tuple(versions)
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110): W/ prefixes are ignored
+    candidates = (value.strip() for value in header.split(","))
+    return any(value.removeprefix("W/") == etag for value in candidates)
+
+
+class CachedResponse:
+    """One cache lookup: ``response`` is set on a hit (304 or stored body), else call ``store``."""
+
+    def __init__(self, cache: "ResponseCache", key: Tuple, etag: str, response: Optional[Response]):
+        self._cache = cache
+        self._key = key
+        self.etag = etag
+        self.response = response
+
+    def store(self, body: Any) -> Response:
+        content = json.dumps(jsonable_encoder(body), separators=(",", ":")).encode("utf-8")
+        self._cache.put(self._key, content)
+        return self._cache.build_response(content, self.etag)
+
+
+class ResponseCache:
+    """Thread-safe LRU of serialized responses keyed by endpoint, parameters and account versions."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(
+        self,
+        request: Request,
+        endpoint: str,
+        versions: Sequence[Tuple[int, int]],
+        params: Optional[Dict[str, Any]] = None,
+    ) -> CachedResponse:
+        key = (endpoint, tuple(versions), tuple(sorted((params or {}).items())))
+        etag = '"%s"' % hashlib.blake2b(repr(key).encode("utf-8"), digest_size=12).hexdigest()
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            with self._lock:
+                self.not_modified += 1
+            return CachedResponse(self, key, etag, Response(
+                status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+            ))
+        with self._lock:
+            content = self._entries.get(key)
+            if content is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        response = self.build_response(content, etag) if content is not None else None
+        return CachedResponse(self, key, etag, response)
+
+    def put(self, key: Tuple, content: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def build_response(content: bytes, etag: str) -> Response:
+        return Response(
+            content=content,
+            media_type="application/json",
+            headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+        )
+
+    def invalidate_account(self, account_id: int) -> int:
+        """Drop entries that read ``account_id`` (its id may be reused after the account is deleted)."""
+        with self._lock:
+            stale = [key for key in self._entries if any(cached_id == account_id for cached_id, _ in key[1])]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+insights_cache = ResponseCache()
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional
@@ -11,7 +12,17 @@ from app.database import get_db, User, EmailAccount, AnalysisRun, EmailMetadata,
 from app.encryption import EncryptionManager
 from app.email_connectors import GmailConnector, YahooConnector
 from app.date_tracker import DateTracker
-from app.services.analysis_service import AnalysisService
+from app.checkpoints import CheckpointStore
+from app.account_aggregates import AccountAggregateStore
+from app.daily_rollups import DailyRollupStore
+from app.account_stats import AccountStatsStore
+from app.sender_stats import SenderStatsStore
+from app.sender_sketches import SenderSketchStore
+from app.pagination import decode_cursor, encode_cursor
+from app.services.analysis_service import AnalysisService, prune_orphan_summaries
+from app.progress import progress_registry
+from app.cancellation import cancellation_registry
+from app.classification_cache import classification_cache
 from app.range_semantics import (
     normalize_analysis_window,
     is_valid_half_open,
@@ -165,6 +176,7 @@ def process_batch_analysis(
     logger.info(f"Starting batch analysis: run_id={run_id}, account_id={account_id}, start={start_date}, end={end_date}")
     print(f"[PRINT] Starting batch analysis: run_id={run_id}, account_id={account_id}")
     db = SessionLocal()
+    service = None  # Reused to revert the run: it holds the date ranges this run marked
     try:
         # Update status
         analysis_run = db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
@@ -179,6 +191,8 @@ def process_batch_analysis(
         
         analysis_run.status = "processing"
         db.commit()
+        progress_registry.start(run_id)
+        cancel_token = cancellation_registry.register(run_id)
         
         # Half-open window: see app.range_semantics
         start_date, end_date = normalize_analysis_window(start_date, end_date)
@@ -218,7 +232,12 @@ def process_batch_analysis(
                 logger.info(f"Found {len(email_ids)} emails to delete for re-analysis (only in requested range)")
                 print(f"[PRINT] Found {len(email_ids)} emails to delete for re-analysis")
                 
-                # 2. Delete associated AnalysisResult records first (foreign key constraint)
+                # 2. Delete associated AnalysisResult records first (foreign key constraint),
+                #    after taking their counts out of the daily rollups
+                DailyRollupStore(db, account_id).subtract_results(
+                    EmailMetadata.date_received >= norm_start,
+                    EmailMetadata.date_received < norm_end
+                )
                 deleted_results = db.query(AnalysisResult).filter(
                     AnalysisResult.email_id.in_(email_ids)
                 ).delete(synchronize_session=False)
@@ -232,6 +251,9 @@ def process_batch_analysis(
                 logger.info(f"Deleted {deleted_emails} email metadata records")
                 print(f"[PRINT] Deleted {deleted_emails} email metadata records")
                 
+                prune_orphan_summaries(db, account_id)
+                AccountAggregateStore(db, user_id, account_id).invalidate()
+                
                 db.commit()
             else:
                 # Do not delete emails outside the range. Only the requested window is re-analyzed.
@@ -276,6 +298,13 @@ def process_batch_analysis(
                 logger.info(f"No processed date ranges overlap the re-analysis window")
                 print(f"[PRINT] No overlapping ranges to split")
             
+            # Emails and ranges were removed above; committed with the checkpoint cleanup below
+            AccountStatsStore(db, account_id).refresh()
+            SenderStatsStore(db, account_id).rebuild()
+            SenderSketchStore(db, account_id).rebuild()
+            # In-range checkpoints would skip pages whose emails were just deleted
+            CheckpointStore(db, account_id).clear_overlapping(norm_start, norm_end)
+            
             logger.info(f"Force reanalysis cleanup complete - will re-fetch and re-analyze fresh data")
             print(f"[PRINT] Force reanalysis cleanup complete - will re-fetch and re-analyze fresh data")
         
@@ -325,7 +354,7 @@ def process_batch_analysis(
             raise
         
         # Use analysis service
-        service = AnalysisService(db, user_id, account_id, run_id)
+        service = AnalysisService(db, user_id, account_id, run_id, cancel_token=cancel_token)
         logger.info(f"Calling analyze_date_range for run_id={analysis_run.id}")
         result = service.analyze_date_range(
             connector,
@@ -345,6 +374,9 @@ def process_batch_analysis(
         
         logger.info(f"Analysis completed: {result}")
         
+        # Final counters come from the result below; stop live write-through first
+        progress_registry.finish(run_id)
+        
         # Update analysis run - refresh to get latest state
         db.refresh(analysis_run)
         if analysis_run.status != "cancelled":  # Only update if not cancelled
@@ -362,10 +394,9 @@ def process_batch_analysis(
                 logger.info(f"Analysis run {run_id} was cancelled, reverting changes")
                 print(f"[PRINT] Analysis run {run_id} was cancelled, reverting changes")
                 try:
-                    service = AnalysisService(db, user_id, account_id, run_id)
-                    service.revert_run_changes()
+                    (service or AnalysisService(db, user_id, account_id, run_id)).revert_run_changes()
                 except:
-                    pass  # Ignore revert errors if service wasn't created
+                    pass  # Ignore revert errors
                 return
         except:
             pass
@@ -416,10 +447,9 @@ def process_batch_analysis(
                 logger.info(f"Analysis run {run_id} was cancelled, reverting changes")
                 print(f"[PRINT] Analysis run {run_id} was cancelled, reverting changes")
                 try:
-                    service = AnalysisService(db, user_id, account_id, run_id)
-                    service.revert_run_changes()
+                    (service or AnalysisService(db, user_id, account_id, run_id)).revert_run_changes()
                 except:
-                    pass  # Ignore revert errors if service wasn't created
+                    pass  # Ignore revert errors
                 return
         except:
             pass
@@ -479,6 +509,8 @@ def process_batch_analysis(
             print(f"[PRINT] Failed to update analysis run status: {update_error}")
             db.rollback()
     finally:
+        progress_registry.finish(run_id)
+        cancellation_registry.discard(run_id)
         try:
             db.close()
         except:
@@ -503,58 +535,29 @@ async def get_analysis_run(
     if not analysis_run:
         raise HTTPException(status_code=404, detail="Analysis run not found")
     
-    # Use raw SQLite to read the latest value, completely bypassing SQLAlchemy caching
-    import logging
-    import sqlite3
-    import os
-    logger = logging.getLogger(__name__)
-    
-    # Get database path
-    db_url = os.getenv("DATABASE_URL", "sqlite:///./data/mailmind.db")
-    db_path = db_url.replace("sqlite:///", "")
-    if not os.path.isabs(db_path):
-        db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), db_path)
-    
-    try:
-        # Use raw SQLite connection to get absolute latest data
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, status, emails_processed, total_emails, start_date, end_date, created_at, completed_at, error_message FROM analysis_runs WHERE id = ?",
-            (run_id,)
-        )
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            emails_processed = row[2] or 0
-            total_emails = row[3]
-            status = row[1]
-            
-            logger.info(f"API returning run {run_id}: emails_processed={emails_processed}, total_emails={total_emails}, status={status}")
-            print(f"[PRINT] API returning run {run_id}: emails_processed={emails_processed}, total_emails={total_emails}, status={status}")
-            
-            return {
-                "id": row[0],
-                "status": status,
-                "emails_processed": emails_processed,
-                "total_emails": total_emails,
-                "start_date": row[4],
-                "end_date": row[5],
-                "created_at": row[6],
-                "completed_at": row[7],
-                "error_message": row[8]
-            }
-    except Exception as e:
-        logger.error(f"Error reading from raw SQLite: {e}")
-        print(f"[PRINT] Error reading from raw SQLite: {e}")
+    # Live runs in this process report from the in-memory registry; others from the row
+    live = progress_registry.get(run_id)
+    if live and analysis_run.status in ("pending", "processing"):
+        emails_processed = live["emails_processed"]
+        total_emails = live["total_emails"] if live["total_emails"] is not None else analysis_run.total_emails
+        current_chunk = live["current_chunk"]
+        total_chunks = live["total_chunks"]
+        stage = live["stage"]
+    else:
+        emails_processed = analysis_run.emails_processed or 0
+        total_emails = analysis_run.total_emails
+        current_chunk = analysis_run.current_chunk
+        total_chunks = analysis_run.total_chunks
+        stage = None
     
-    # Fallback to SQLAlchemy
     return {
         "id": analysis_run.id,
         "status": analysis_run.status,
-        "emails_processed": analysis_run.emails_processed,
-        "total_emails": analysis_run.total_emails,
+        "stage": stage,
+        "emails_processed": emails_processed,
+        "total_emails": total_emails,
+        "current_chunk": current_chunk,
+        "total_chunks": total_chunks,
         "start_date": analysis_run.start_date.isoformat(),
         "end_date": analysis_run.end_date.isoformat(),
         "created_at": analysis_run.created_at.isoformat(),
@@ -562,15 +565,26 @@ async def get_analysis_run(
         "error_message": getattr(analysis_run, 'error_message', None)
     }
 
+@router.get("/classification-cache")
+async def get_classification_cache_stats():
+    """Hit/miss counters of the shared classification cache (since process start)"""
+    return classification_cache.stats()
+
 @router.get("/runs")
 async def list_analysis_runs(
     username: str,
     account_id: Optional[int] = None,
     limit: Optional[int] = 50,
     offset: Optional[int] = 0,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """List analysis runs for a user with pagination"""
+    """List analysis runs for a user, newest first, with keyset pagination
+    
+    Pass the previous page's next_cursor as cursor; each page is a range read on
+    (created_at, id), and the total counted for the first page travels in the cursor.
+    offset is still accepted for older clients when no cursor is given.
+    """
     import logging
     logger = logging.getLogger(__name__)
     
@@ -580,9 +594,11 @@ async def list_analysis_runs(
         return {
             "runs": [],
             "total": 0,
-            "has_more": False
+            "has_more": False,
+            "next_cursor": None
         }
     
+    limit = max(limit or 50, 1)
     query = db.query(AnalysisRun).filter(AnalysisRun.user_id == user.id)
     if account_id:
         query = query.filter(AnalysisRun.account_id == account_id)
@@ -590,12 +606,33 @@ async def list_analysis_runs(
     else:
         logger.info(f"Listing all analysis runs for user {username} (no account filter)")
     
-    # Get total count
-    total_count = query.count()
-    
-    # Apply pagination
-    runs = query.order_by(AnalysisRun.created_at.desc()).offset(offset).limit(limit).all()
-    logger.info(f"Found {len(runs)} analysis runs for user {username} (offset={offset}, limit={limit}, total={total_count})")
+    if cursor:
+        try:
+            state = decode_cursor(cursor)
+            after_created, after_id = datetime.fromisoformat(state["created_at"]), int(state["id"])
+            total_count = int(state["total"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(or_(
+            AnalysisRun.created_at < after_created,
+            and_(AnalysisRun.created_at == after_created, AnalysisRun.id < after_id)
+        ))
+    else:
+        # Counted once, for the first page (ix_analysis_runs_*_created covers it)
+        total_count = query.count()
+    
+    query = query.order_by(AnalysisRun.created_at.desc(), AnalysisRun.id.desc())
+    if not cursor and offset:
+        query = query.offset(offset)
+    # One extra row tells whether another page exists
+    rows = query.limit(limit + 1).all()
+    runs = rows[:limit]
+    has_more = len(rows) > limit
+    next_cursor = None
+    if has_more:
+        last = runs[-1]
+        next_cursor = encode_cursor({"created_at": last.created_at.isoformat(), "id": last.id, "total": total_count})
+    logger.info(f"Found {len(runs)} analysis runs for user {username} (limit={limit}, total={total_count})")
     
     return {
         "runs": [
@@ -614,7 +651,8 @@ async def list_analysis_runs(
             for run in runs
         ],
         "total": total_count,
-        "has_more": offset + len(runs) < total_count
+        "has_more": has_more,
+        "next_cursor": next_cursor
     }
 
 @router.post("/runs/{run_id}/retry", response_model=AnalysisResponse)
@@ -668,6 +706,14 @@ async def retry_analysis_run(
     logger.info(f"Retrying analysis run {run_id} for user {username}")
     print(f"[PRINT] Retrying analysis run {run_id} for user {username}")
     
+    # Ranges the failed run left checkpoints for resume instead of starting over
+    from app.database import AnalysisCheckpoint
+    has_checkpoint = db.query(AnalysisCheckpoint).filter(
+        AnalysisCheckpoint.account_id == original_run.account_id,
+        AnalysisCheckpoint.range_start < original_run.end_date,
+        AnalysisCheckpoint.range_end > original_run.start_date
+    ).first() is not None
+    
     # Create new analysis run with same parameters
     new_run = AnalysisRun(
         user_id=user.id,
@@ -695,7 +741,7 @@ async def retry_analysis_run(
     return AnalysisResponse(
         run_id=new_run.id,
         status="pending",
-        message="Analysis retry started in background"
+        message="Analysis retry resuming from last checkpoint" if has_checkpoint else "Analysis retry started in background"
     )
 
 @router.post("/runs/{run_id}/stop")
@@ -735,62 +781,12 @@ async def stop_analysis_run(
     # Mark as cancelled - the background task will check this and revert
     analysis_run.status = "cancelled"
     db.commit()
+    # Stop an in-flight fetch loop in this process right away
+    cancellation_registry.cancel(run_id)
     
-    # Revert changes made by this run
+    # Revert changes made by this run (ranges come from the run's own summaries)
     try:
-        # Delete analysis results created by this run
-        analysis_results = db.query(AnalysisResult).filter(
-            AnalysisResult.analysis_run_id == run_id
-        ).all()
-        
-        # Get email IDs that were only analyzed by this run
-        email_ids_to_check = [ar.email_id for ar in analysis_results]
-        
-        # Delete analysis results
-        for ar in analysis_results:
-            db.delete(ar)
-        
-        # Delete emails that were created during this run
-        # We'll identify them by checking if they have no other analysis results
-        if email_ids_to_check:
-            emails_to_delete = db.query(EmailMetadata).filter(
-                EmailMetadata.id.in_(email_ids_to_check),
-                EmailMetadata.account_id == analysis_run.account_id
-            ).all()
-            
-            for email in emails_to_delete:
-                # Check if this email has any other analysis results
-                other_results = db.query(AnalysisResult).filter(
-                    AnalysisResult.email_id == email.id,
-                    AnalysisResult.analysis_run_id != run_id
-                ).count()
-                
-                if other_results == 0:
-                    # This email was only analyzed by this run, delete it
-                    db.delete(email)
-        
-        # Revert processed date ranges that were created during this run
-        # We need to track which ranges were processed by this run
-        # For now, we'll remove ranges that were processed after the run was created
-        # and overlap with the run's date range
-        from app.database import ProcessedDateRange
-        from datetime import timedelta
-        
-        # Remove ranges that were processed during this run's timeframe
-        # We'll be conservative and only remove ranges created very recently
-        # (within the last hour) that overlap with this run's date range
-        recent_cutoff = datetime.utcnow() - timedelta(hours=1)
-        overlapping_ranges = db.query(ProcessedDateRange).filter(
-            ProcessedDateRange.account_id == analysis_run.account_id,
-            ProcessedDateRange.start_date < analysis_run.end_date,
-            ProcessedDateRange.end_date > analysis_run.start_date,
-            ProcessedDateRange.processed_at >= analysis_run.created_at
-        ).all()
-        
-        for range_obj in overlapping_ranges:
-            db.delete(range_obj)
-        
-        db.commit()
+        AnalysisService(db, user.id, analysis_run.account_id, run_id).revert_run_changes()
         logger.info(f"Successfully reverted changes for cancelled run {run_id}")
         print(f"[PRINT] Successfully reverted changes for cancelled run {run_id}")
         
@@ -9,6 +9,7 @@ from app.database import get_db, User, EmailAccount
 from app.encryption import EncryptionManager
 from app.email_connectors.gmail import GmailConnector
 from app.email_connectors.yahoo import YahooConnector
+from app.response_cache import insights_cache
 
 router = APIRouter()
 
@@ -121,6 +122,8 @@ async def delete_email_account(
     
     db.delete(account)
     db.commit()
+    # SQLite may hand the id to a later account, whose versions would restart
+    insights_cache.invalidate_account(account_id)
     
     return {"message": "Account deleted"}
 
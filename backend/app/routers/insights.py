@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, extract, text
 from typing import Optional, List
 from datetime import datetime, timedelta
 from collections import Counter
+import re
 from pydantic import BaseModel
 
 from app.database import (
@@ -12,11 +13,33 @@ from app.database import (
     EmailAccount,
     EmailMetadata,
     AnalysisResult,
+    AnalysisSummary,
     ProcessedDateRange,
     CustomCategory,
     SenderCategoryMapping,
+    SubjectRule,
+    DailyRollup,
+    AccountStats,
 )
 from app.encryption import EncryptionManager
+from app.services.analysis_service import prune_orphan_summaries
+from app.account_aggregates import AccountAggregateStore
+from app.daily_rollups import DailyRollupStore
+from app.account_stats import AccountStatsStore, bump_versions
+from app.sender_stats import SenderStatsStore
+from app.sender_sketches import (
+    SenderSketchStore,
+    accounts_with_sketches,
+    estimate_distinct_senders,
+    exact_distinct_senders,
+)
+from app.pagination import decode_cursor, encode_cursor
+from app.response_cache import account_versions, insights_cache
+from app.custom_rules import CustomRuleEngine
+from app.classification_cache import CachedClassifier, classification_cache
+from app.email_batch import EmailBatch
+from app.sender_identity import normalize_sender
+from app.subject_clusters import SubjectClusterStore
 from app.range_semantics import (
     half_open_sorted_mergeable,
     reconstruct_bounds_from_email_min_max,
@@ -24,52 +47,93 @@ from app.range_semantics import (
 
 router = APIRouter()
 
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
 
 def _top_domains_with_common_display_name(db: Session, account_id: int, limit: int = 50) -> list:
-    """Aggregate email counts by domain (whole account) and pick the most frequent non-empty sender_name per domain."""
+    """Email counts by domain (whole account) with the most frequent non-empty sender_name per domain."""
+    # Per (domain, raw name) counts are read in order from the covering
+    # ix_email_metadata_account_domain_name index; names are trimmed on that small result,
+    # and ROW_NUMBER picks each top domain's most common name (ties: alphabetical)
     stmt = text(
         """
-        SELECT
-            LOWER(SUBSTR(sender_email, INSTR(sender_email, '@') + 1)) AS domain,
-            TRIM(COALESCE(sender_name, '')) AS disp,
-            COUNT(*) AS cnt
-        FROM email_metadata
-        WHERE account_id = :aid AND INSTR(sender_email, '@') > 0
-        GROUP BY domain, disp
+        WITH raw_names AS (
+            SELECT sender_domain AS domain,
+                   sender_name AS name,
+                   MAX(sender_registrable_domain) AS registrable,
+                   COUNT(*) AS cnt
+            FROM email_metadata
+            WHERE account_id = :aid AND sender_domain IS NOT NULL AND sender_domain != ''
+            GROUP BY sender_domain, sender_name
+        ),
+        top_domains AS (
+            SELECT domain, MAX(registrable) AS registrable, SUM(cnt) AS total
+            FROM raw_names
+            GROUP BY domain
+            ORDER BY total DESC, domain
+            LIMIT :limit
+        ),
+        ranked_names AS (
+            SELECT domain, disp,
+                   ROW_NUMBER() OVER (PARTITION BY domain ORDER BY SUM(cnt) DESC, disp) AS rank
+            FROM (
+                SELECT domain, TRIM(COALESCE(name, '')) AS disp, cnt
+                FROM raw_names
+                WHERE domain IN (SELECT domain FROM top_domains)
+            )
+            WHERE disp != ''
+            GROUP BY domain, disp
+        )
+        SELECT t.domain, t.registrable, t.total, r.disp
+        FROM top_domains t
+        LEFT JOIN ranked_names r ON r.domain = t.domain AND r.rank = 1
+        ORDER BY t.total DESC, t.domain
         """
     )
-    rows = db.execute(stmt, {"aid": account_id}).fetchall()
-    domain_total: Counter = Counter()
-    domain_disp_counts: dict = {}
-    for row in rows:
-        domain = (row[0] or "").strip()
-        disp = (row[1] or "").strip()
-        cnt = int(row[2] or 0)
-        if not domain:
-            continue
-        domain_total[domain] += cnt
-        if disp:
-            if domain not in domain_disp_counts:
-                domain_disp_counts[domain] = Counter()
-            domain_disp_counts[domain][disp] += cnt
-    result = []
-    for domain, count in domain_total.most_common(limit):
-        common = None
-        if domain in domain_disp_counts and domain_disp_counts[domain]:
-            common = domain_disp_counts[domain].most_common(1)[0][0]
-        result.append(
-            {"domain": domain, "count": count, "common_display_name": common}
-        )
-    return result
+    rows = db.execute(stmt, {"aid": account_id, "limit": limit}).fetchall()
+    return [
+        {
+            "domain": domain,
+            "registrable_domain": registrable,
+            "count": int(total),
+            "common_display_name": common,
+        }
+        for domain, registrable, total, common in rows
+    ]
+
+
+def _ensure_sender_sketches(db: Session, rows) -> None:
+    """Build sender sketches of (account, stats) rows stored before sender_sketches existed."""
+    candidates = [account.id for account, stats in rows if stats.email_count]
+    missing = set(candidates) - accounts_with_sketches(db, candidates)
+    for account_id in missing:
+        SenderSketchStore(db, account_id).rebuild()
+    if missing:
+        db.commit()
+
+
+def _ensure_daily_rollups(db: Session, account_id: int) -> None:
+    """Build the daily rollups of an account whose analysis results predate daily_rollups."""
+    store = DailyRollupStore(db, account_id)
+    if not store.has_rows() and store.has_results():
+        store.rebuild()
+        db.commit()
 
 
 @router.get("/summary")
 async def get_summary(
+    request: Request,
     username: str,
     account_id: Optional[int] = None,
+    exact: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Get summary insights for user"""
+    """Get summary insights for user
+    
+    With several accounts, total_senders is a HyperLogLog estimate merged from the
+    accounts' monthly sender sketches (about 1.6% standard error) unless exact=true;
+    total_senders_exact tells which one was returned.
+    """
     user = db.query(User).filter(User.username == username).first()
     if not user:
         # Return empty summary instead of 404 - user-friendly for new users
@@ -77,82 +141,119 @@ async def get_summary(
             'total_accounts': 0,
             'total_emails': 0,
             'total_senders': 0,
+            'total_senders_exact': True,
             'accounts': []
         }
     
-    query = db.query(EmailAccount).filter(EmailAccount.user_id == user.id)
+    # One row per account: counters come from account_stats (app.account_stats)
+    query = db.query(EmailAccount, AccountStats).outerjoin(
+        AccountStats, AccountStats.account_id == EmailAccount.id
+    ).filter(EmailAccount.user_id == user.id)
     if account_id:
         query = query.filter(EmailAccount.id == account_id)
     
-    accounts = query.all()
+    rows = query.all()
+    
+    # Accounts without a stats row yet (created before the table) are computed once and stored
+    if any(stats is None for _, stats in rows):
+        rows = [
+            (account, stats if stats is not None else AccountStatsStore(db, account.id).refresh())
+            for account, stats in rows
+        ]
+        db.commit()
+    
+    cached = insights_cache.lookup(
+        request, "summary", tuple((account.id, stats.data_version or 0) for account, stats in rows), {'exact': exact}
+    )
+    if cached.response is not None:
+        return cached.response
     
     summary = {
-        'total_accounts': len(accounts),
+        'total_accounts': len(rows),
         'total_emails': 0,
         'total_senders': 0,
+        'total_senders_exact': True,
         'accounts': []
     }
     
-    for account in accounts:
-        email_count = db.query(EmailMetadata).filter(
-            EmailMetadata.account_id == account.id
-        ).count()
-        
-        sender_count = db.query(EmailMetadata.sender_email).filter(
-            EmailMetadata.account_id == account.id
-        ).distinct().count()
-        
-        # Get processed date ranges
-        processed_ranges = db.query(ProcessedDateRange).filter(
-            ProcessedDateRange.account_id == account.id
-        ).all()
-        
-        # Get earliest email date
-        earliest_email = db.query(func.min(EmailMetadata.date_received)).filter(
-            EmailMetadata.account_id == account.id
-        ).scalar()
-        
+    for account, stats in rows:
         account_summary = {
             'id': account.id,
             'email': account.email,
             'provider': account.provider,
-            'email_count': email_count,
-            'sender_count': sender_count,
-            'processed_ranges': len(processed_ranges),
-            'earliest_email_date': earliest_email.isoformat() if earliest_email else None
+            'email_count': stats.email_count,
+            'sender_count': stats.sender_count,
+            'processed_ranges': stats.range_count,
+            'earliest_email_date': stats.earliest_date.isoformat() if stats.earliest_date else None
         }
         
         summary['accounts'].append(account_summary)
-        summary['total_emails'] += email_count
+        summary['total_emails'] += stats.email_count
+    
+    # Unique senders across accounts: a single account's count is exact from its row; senders
+    # shared between accounts are only counted once by merging the accounts' sender sketches
+    account_ids = [account.id for account, _ in rows]
+    if len(rows) == 1:
+        summary['total_senders'] = rows[0][1].sender_count
+    elif exact:
+        summary['total_senders'] = exact_distinct_senders(db, account_ids)
+    elif rows:
+        _ensure_sender_sketches(db, rows)
+        sketch, _ = estimate_distinct_senders(db, account_ids)
+        summary['total_senders'] = sketch.estimate()
+        summary['total_senders_exact'] = False
+    
+    return cached.store(summary)
+
+@router.get("/response-cache")
+async def get_response_cache_stats():
+    """Hit/miss/304 counters of the insights response cache (since process start)"""
+    return insights_cache.stats()
+
+@router.get("/account-summary")
+async def get_account_summary(
+    request: Request,
+    username: str,
+    account_id: int,
+    db: Session = Depends(get_db)
+):
+    """Account-wide batch analysis (top senders, domains, categories, date range) from the merged aggregate state"""
+    user = db.query(User).filter(User.username == username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    # Get unique senders across all accounts
-    if account_id:
-        summary['total_senders'] = db.query(EmailMetadata.sender_email).filter(
-            EmailMetadata.account_id == account_id
-        ).distinct().count()
-    else:
-        account_ids = [a.id for a in accounts]
-        if account_ids:
-            summary['total_senders'] = db.query(EmailMetadata.sender_email).filter(
-                EmailMetadata.account_id.in_(account_ids)
-            ).distinct().count()
+    account = db.query(EmailAccount).filter(
+        EmailAccount.id == account_id,
+        EmailAccount.user_id == user.id
+    ).first()
+    
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
     
-    return summary
+    cached = insights_cache.lookup(request, "account-summary", account_versions(db, [account_id]))
+    if cached.response is not None:
+        return cached.response
+    
+    aggregates = AccountAggregateStore(db, user.id, account_id).get_or_rebuild()
+    return cached.store(aggregates.to_analysis())
 
-@router.get("/senders")
-async def get_sender_insights(
+@router.get("/top-senders")
+async def get_top_senders(
+    request: Request,
     username: str,
     account_id: int,
+    by: str = "sender",
     limit: Optional[int] = 20,
-    offset: Optional[int] = 0,
     db: Session = Depends(get_db)
 ):
-    """Get top senders and patterns with pagination
+    """Approximate top senders (by=sender) or domains (by=domain) from the account's Space-Saving sketch
     
-    Args:
-        limit: Maximum number of senders to return (default 20, max 100)
-        offset: Number of senders to skip for pagination (default 0)
+    Each count is an upper bound; count - error is a lower bound. Read from the stored
+    account state, so the cost does not grow with the mailbox.
     """
+    if by not in ("sender", "domain"):
+        raise HTTPException(status_code=400, detail="by must be 'sender' or 'domain'")
+    
     user = db.query(User).filter(User.username == username).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -165,78 +266,177 @@ async def get_sender_insights(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
+    cached = insights_cache.lookup(request, "top-senders", account_versions(db, [account_id]), {'by': by, 'limit': limit})
+    if cached.response is not None:
+        return cached.response
+    
     # Cap limit at 100
-    if limit and limit > 100:
-        limit = 100
+    limit = min(limit or 20, 100)
+    
+    aggregates = AccountAggregateStore(db, user.id, account_id).get_or_rebuild()
+    sketch = aggregates.sender_sketch if by == "sender" else aggregates.domain_sketch
+    report = sketch.report(limit)
+    if by == "sender":
+        for entry in report['items']:
+            entry['name'] = aggregates.sender_names.get(entry['value'])
+    report['by'] = by
+    return cached.store(report)
+
+@router.get("/distinct-senders")
+async def get_distinct_senders(
+    request: Request,
+    username: str,
+    account_id: Optional[int] = None,
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    exact: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Distinct senders of one account (or all of the user's accounts) over received months
     
-    # Get total email count for this account
-    total_emails = db.query(EmailMetadata).filter(
-        EmailMetadata.account_id == account_id
-    ).count()
+    start_month / end_month are inclusive "YYYY-MM" bounds. The default answer is a
+    HyperLogLog estimate merged from the monthly sender sketches (app.sender_sketches);
+    exact=true counts distinct senders in email_metadata instead.
+    """
+    for month in (start_month, end_month):
+        if month is not None and not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", month):
+            raise HTTPException(status_code=400, detail="Months must be formatted YYYY-MM")
     
-    # Get total unique sender count (for pagination info)
-    total_senders = db.query(
-        EmailMetadata.sender_email,
-        EmailMetadata.sender_name
-    ).filter(
-        EmailMetadata.account_id == account_id
-    ).group_by(
-        EmailMetadata.sender_email,
-        EmailMetadata.sender_name
-    ).count()
+    user = db.query(User).filter(User.username == username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    # Get sender counts with pagination
-    query = db.query(
-        EmailMetadata.sender_email,
-        EmailMetadata.sender_name,
-        func.count(EmailMetadata.id).label('count')
-    ).filter(
-        EmailMetadata.account_id == account_id
-    ).group_by(
-        EmailMetadata.sender_email,
-        EmailMetadata.sender_name
-    ).order_by(
-        func.count(EmailMetadata.id).desc()
+    account_query = db.query(EmailAccount, AccountStats).outerjoin(
+        AccountStats, AccountStats.account_id == EmailAccount.id
+    ).filter(EmailAccount.user_id == user.id)
+    if account_id is not None:
+        account_query = account_query.filter(EmailAccount.id == account_id)
+    rows = account_query.all()
+    if account_id is not None and not rows:
+        raise HTTPException(status_code=404, detail="Account not found")
+    account_ids = [account.id for account, _ in rows]
+    
+    cached = insights_cache.lookup(
+        request, "distinct-senders", account_versions(db, account_ids),
+        {'start_month': start_month, 'end_month': end_month, 'exact': exact, 'user': user.id}
     )
+    if cached.response is not None:
+        return cached.response
+    
+    result = {
+        'account_ids': account_ids,
+        'start_month': start_month,
+        'end_month': end_month,
+        'exact': exact,
+    }
+    if exact:
+        result['distinct_senders'] = exact_distinct_senders(db, account_ids, start_month, end_month)
+    else:
+        _ensure_sender_sketches(db, [
+            (account, stats or AccountStatsStore(db, account.id).get_or_refresh()) for account, stats in rows
+        ])
+        sketch, months = estimate_distinct_senders(db, account_ids, start_month, end_month)
+        result['distinct_senders'] = sketch.estimate()
+        result['standard_error'] = round(sketch.standard_error, 4)
+        result['sketches_merged'] = months
+    return cached.store(result)
+
+@router.get("/senders")
+async def get_sender_insights(
+    request: Request,
+    username: str,
+    account_id: int,
+    limit: Optional[int] = 20,
+    offset: Optional[int] = 0,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Get top senders and patterns with keyset pagination
     
-    # Apply offset
-    if offset and offset > 0:
-        query = query.offset(offset)
+    Senders are ordered by (count desc, sender) from the per-sender count table
+    (app.sender_stats); totals come from the account's stats row.
     
-    # Apply limit
-    if limit and limit > 0:
-        query = query.limit(limit)
+    Args:
+        limit: Maximum number of senders to return (default 20, max 100)
+        offset: Number of senders to skip, for clients without cursors (default 0)
+        cursor: next_cursor of the previous page; later pages leave top_domains empty
+    """
+    user = db.query(User).filter(User.username == username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    sender_counts = query.all()
+    account = db.query(EmailAccount).filter(
+        EmailAccount.id == account_id,
+        EmailAccount.user_id == user.id
+    ).first()
+    
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    after = None
+    if cursor:
+        try:
+            state = decode_cursor(cursor)
+            after = (int(state["count"]), str(state["sender"]))
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    cached = insights_cache.lookup(
+        request, "senders", account_versions(db, [account_id]),
+        {'limit': limit, 'offset': offset, 'cursor': cursor}
+    )
+    if cached.response is not None:
+        return cached.response
+    
+    # Cap limit at 100
+    limit = min(limit or 20, 100)
+    
+    # Totals are maintained with the stored emails; case and plus-address
+    # variants of one address are a single sender
+    stats = AccountStatsStore(db, account_id).get_or_refresh()
+    total_emails = stats.email_count
+    total_senders = stats.sender_count
+    
+    sender_stats = SenderStatsStore(db, account_id)
+    # One extra row tells whether another page exists
+    rows = sender_stats.page(limit + 1, after=after, offset=offset or 0)
+    if not rows and total_senders and not sender_stats.has_rows():
+        # Account stored before sender_stats existed
+        sender_stats.rebuild()
+        db.commit()
+        rows = sender_stats.page(limit + 1, after=after, offset=offset or 0)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     
     senders = [
         {
-            'email': sender,
-            'name': name,
-            'count': count,
-            'percentage': round(count / total_emails * 100, 2) if total_emails > 0 else 0
+            'email': row.sender,
+            'name': row.name,
+            'count': row.email_count,
+            'percentage': round(row.email_count / total_emails * 100, 2) if total_emails > 0 else 0
         }
-        for sender, name, count in sender_counts
+        for row in rows
     ]
     
     # Top domains across the entire account (not just paginated senders), with most common From display name
-    top_domains = _top_domains_with_common_display_name(db, account_id, limit=50)
-
-    # Calculate pagination info
-    has_more = (offset or 0) + len(sender_counts) < total_senders
+    top_domains = [] if after else _top_domains_with_common_display_name(db, account_id, limit=50)
     
-    return {
+    next_cursor = encode_cursor({"count": rows[-1].email_count, "sender": rows[-1].sender}) if has_more else None
+    
+    return cached.store({
         'top_senders': senders,
         'top_domains': top_domains,
         'total_emails': total_emails,
         'total_senders': total_senders,
         'offset': offset or 0,
-        'limit': limit or 20,
-        'has_more': has_more
-    }
+        'limit': limit,
+        'has_more': has_more,
+        'next_cursor': next_cursor
+    })
 
 @router.get("/categories")
 async def get_category_insights(
+    request: Request,
     username: str,
     account_id: int,
     db: Session = Depends(get_db)
@@ -254,30 +454,35 @@ async def get_category_insights(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
+    cached = insights_cache.lookup(request, "categories", account_versions(db, [account_id]))
+    if cached.response is not None:
+        return cached.response
+    
+    # Summed from the daily rollups instead of the account's analysis results
+    _ensure_daily_rollups(db, account_id)
     category_counts = db.query(
-        AnalysisResult.category,
-        func.count(AnalysisResult.id).label('count')
-    ).join(
-        EmailMetadata
+        DailyRollup.category,
+        func.sum(DailyRollup.email_count).label('count')
     ).filter(
-        EmailMetadata.account_id == account_id
+        DailyRollup.account_id == account_id
     ).group_by(
-        AnalysisResult.category
+        DailyRollup.category
     ).all()
     
     total = sum(count for _, count in category_counts)
     
-    return {
+    return cached.store({
         'categories': [
             {'category': cat, 'count': count, 'percentage': round(count / total * 100, 2) if total > 0 else 0}
             for cat, count in category_counts
         ],
         'total': total
-    }
+    })
 
 
 @router.get("/category-domains")
 async def get_category_domains(
+    request: Request,
     username: str,
     account_id: int,
     category: str,
@@ -296,42 +501,49 @@ async def get_category_domains(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    # Get emails in this category with their domains
-    emails = (
-        db.query(EmailMetadata.sender_email)
-        .join(AnalysisResult, AnalysisResult.email_id == EmailMetadata.id)
+    cached = insights_cache.lookup(request, "category-domains", account_versions(db, [account_id]), {'category': category})
+    if cached.response is not None:
+        return cached.response
+    
+    # Count this category's emails by sender domain from the daily rollups
+    _ensure_daily_rollups(db, account_id)
+    total_count = func.sum(DailyRollup.email_count)
+    domain_counts = (
+        db.query(DailyRollup.domain, total_count.label('count'))
         .filter(
-            EmailMetadata.account_id == account_id,
-            AnalysisResult.category == category
+            DailyRollup.account_id == account_id,
+            DailyRollup.category == category,
+            DailyRollup.domain != ""
         )
+        .group_by(DailyRollup.domain)
+        .order_by(total_count.desc(), DailyRollup.domain)
+        .limit(10)
         .all()
     )
     
-    # Count by domain
-    domain_counts = Counter()
-    for (email,) in emails:
-        if email and '@' in email:
-            domain = email.split('@')[1].lower()
-            domain_counts[domain] += 1
-    
-    return {
+    return cached.store({
         'category': category,
         'domains': [
             {'domain': domain, 'count': count}
-            for domain, count in domain_counts.most_common(10)
+            for domain, count in domain_counts
         ]
-    }
+    })
 
 
 # --- Frequency insights ---
 
 @router.get("/frequency")
 async def get_frequency_insights(
+    request: Request,
     username: str,
     account_id: int,
     db: Session = Depends(get_db)
 ):
-    """Get email frequency patterns"""
+    """Get email frequency patterns
+
+    Counts stored emails (email_metadata), grouped by received date in SQL over the
+    (account_id, date_received) index rather than loaded into Python.
+    """
     user = db.query(User).filter(User.username == username).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -344,44 +556,45 @@ async def get_frequency_insights(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    # Get emails with dates
-    emails = db.query(EmailMetadata.date_received).filter(
+    cached = insights_cache.lookup(request, "frequency", account_versions(db, [account_id]))
+    if cached.response is not None:
+        return cached.response
+    
+    # Totals and distinct days in one pass over ix_email_metadata_account_date
+    total_emails, unique_days = db.query(
+        func.count(EmailMetadata.id),
+        func.count(func.distinct(func.date(EmailMetadata.date_received)))
+    ).filter(
         EmailMetadata.account_id == account_id
-    ).all()
+    ).one()
     
-    if not emails:
-        return {
+    if not total_emails:
+        return cached.store({
             'total_emails': 0,
             'unique_days': 0,
             'daily_average': 0.0
-        }
-    
-    dates = [e[0] for e in emails if e[0]]
-    
-    if not dates:
-        return {
-            'total_emails': len(emails),
-            'unique_days': 0,
-            'daily_average': 0.0
-        }
+        })
     
     # Daily average
-    unique_days = len(set(d.date() for d in dates))
-    daily_avg = len(dates) / max(unique_days, 1)
+    daily_avg = total_emails / max(unique_days, 1)
     
-    return {
-        'total_emails': len(dates),
+    return cached.store({
+        'total_emails': total_emails,
         'unique_days': unique_days,
         'daily_average': round(daily_avg, 2)
-    }
+    })
 
 @router.get("/frequency/yearly")
 async def get_yearly_frequency_insights(
+    request: Request,
     username: str,
     account_id: int,
     db: Session = Depends(get_db)
 ):
-    """Get yearly frequency patterns and year-over-year comparison"""
+    """Get yearly frequency patterns and year-over-year comparison
+
+    Counts stored emails (email_metadata) like /frequency, grouped by year and month in SQL.
+    """
     user = db.query(User).filter(User.username == username).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -394,39 +607,54 @@ async def get_yearly_frequency_insights(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    # Get emails with dates
-    emails = db.query(EmailMetadata.date_received).filter(
+    cached = insights_cache.lookup(request, "frequency/yearly", account_versions(db, [account_id]))
+    if cached.response is not None:
+        return cached.response
+    
+    # Emails and active days per month, grouped in SQL over ix_email_metadata_account_date
+    # (at most 12 rows per year)
+    year_col = extract('year', EmailMetadata.date_received)
+    month_col = extract('month', EmailMetadata.date_received)
+    month_rows = db.query(
+        year_col,
+        month_col,
+        func.count(EmailMetadata.id),
+        func.count(func.distinct(func.date(EmailMetadata.date_received)))
+    ).filter(
         EmailMetadata.account_id == account_id
+    ).group_by(
+        year_col, month_col
+    ).order_by(
+        year_col, month_col
     ).all()
     
-    if not emails:
-        return {
+    if not month_rows:
+        return cached.store({
             'years': [],
             'yearly_totals': {},
             'yearly_averages': {},
             'year_over_year': []
-        }
-    
-    dates = [e[0] for e in emails if e[0]]
+        })
     
     # Group by year
-    yearly_counts = Counter(d.year for d in dates)
-    yearly_dates = {}
-    for d in dates:
-        year = d.year
-        if year not in yearly_dates:
-            yearly_dates[year] = []
-        yearly_dates[year].append(d)
+    yearly_counts = Counter()
+    yearly_unique_days = Counter()
+    yearly_months = {}
+    for year, month, count, days in month_rows:
+        year, month = int(year), int(month)
+        yearly_counts[year] += count
+        # Days of different months are distinct, so monthly day counts add up
+        yearly_unique_days[year] += days
+        yearly_months.setdefault(year, {})[month] = count
     
     # Calculate yearly statistics
     yearly_stats = {}
-    for year, year_dates in yearly_dates.items():
-        unique_days = len(set(d.date() for d in year_dates))
-        total_emails = len(year_dates)
+    for year, monthly_counts in yearly_months.items():
+        unique_days = yearly_unique_days[year]
+        total_emails = yearly_counts[year]
         daily_avg = total_emails / max(unique_days, 1)
         
         # Monthly distribution
-        monthly_counts = Counter(d.month for d in year_dates)
         monthly_dist = {month: monthly_counts.get(month, 0) for month in range(1, 13)}
         
         # Peak month
@@ -462,13 +690,129 @@ async def get_yearly_frequency_insights(
             'change_percent': change_percent
         })
     
-    return {
+    return cached.store({
         'years': years,
         'yearly_totals': {year: stats['total_emails'] for year, stats in yearly_stats.items()},
         'yearly_averages': {year: stats['daily_average'] for year, stats in yearly_stats.items()},
         'yearly_stats': yearly_stats,
         'year_over_year': year_over_year
+    })
+
+@router.get("/frequency/heatmap")
+async def get_frequency_heatmap(
+    request: Request,
+    username: str,
+    account_id: int,
+    db: Session = Depends(get_db)
+):
+    """Hour-of-day × weekday email counts from the account's stored histograms
+    
+    Served from the account aggregate state kept during analysis, without scanning emails.
+    """
+    user = db.query(User).filter(User.username == username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    account = db.query(EmailAccount).filter(
+        EmailAccount.id == account_id,
+        EmailAccount.user_id == user.id
+    ).first()
+    
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    cached = insights_cache.lookup(request, "frequency/heatmap", account_versions(db, [account_id]))
+    if cached.response is not None:
+        return cached.response
+    
+    aggregates = AccountAggregateStore(db, user.id, account_id).get_or_rebuild()
+    matrix = aggregates.hour_weekday_matrix()
+    total = sum(aggregates.hour_weekday_counts.values())
+    
+    peak = None
+    if total:
+        (weekday, hour), count = max(
+            aggregates.hour_weekday_counts.items(), key=lambda x: (x[1], -x[0][0], -x[0][1])
+        )
+        peak = {'weekday': WEEKDAY_NAMES[weekday], 'hour': hour, 'count': count}
+    
+    return cached.store({
+        'weekdays': WEEKDAY_NAMES,
+        'matrix': matrix,
+        'hour_totals': [sum(row[hour] for row in matrix) for hour in range(24)],
+        'weekday_totals': {WEEKDAY_NAMES[weekday]: sum(row) for weekday, row in enumerate(matrix)},
+        'total_emails': total,
+        'peak': peak
+    })
+
+@router.get("/frequency/seasonality")
+async def get_frequency_seasonality(
+    request: Request,
+    username: str,
+    account_id: int,
+    db: Session = Depends(get_db)
+):
+    """Monthly email volume and month-of-year seasonality from the account's stored histograms"""
+    user = db.query(User).filter(User.username == username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    account = db.query(EmailAccount).filter(
+        EmailAccount.id == account_id,
+        EmailAccount.user_id == user.id
+    ).first()
+    
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    cached = insights_cache.lookup(request, "frequency/seasonality", account_versions(db, [account_id]))
+    if cached.response is not None:
+        return cached.response
+    
+    aggregates = AccountAggregateStore(db, user.id, account_id).get_or_rebuild()
+    month_counts = aggregates.month_counts()
+    active_days = Counter(f"{day.year:04d}-{day.month:02d}" for day in aggregates.day_counts)
+    
+    monthly = [
+        {
+            'month': month,
+            'total_emails': count,
+            'active_days': active_days[month],
+            'daily_average': round(count / max(active_days[month], 1), 2)
+        }
+        for month, count in month_counts.items()
+    ]
+    
+    # Average per calendar month over the years that have data for it
+    month_of_year_totals = Counter()
+    month_of_year_years = Counter()
+    for month, count in month_counts.items():
+        month_number = int(month[5:])
+        month_of_year_totals[month_number] += count
+        month_of_year_years[month_number] += 1
+    month_of_year = {
+        month_number: {
+            'total_emails': month_of_year_totals.get(month_number, 0),
+            'years': month_of_year_years.get(month_number, 0),
+            'average': round(
+                month_of_year_totals.get(month_number, 0) / max(month_of_year_years.get(month_number, 0), 1), 2
+            )
+        }
+        for month_number in range(1, 13)
     }
+    
+    overall_average = sum(month_counts.values()) / max(len(month_counts), 1)
+    seasonal_index = {
+        month_number: round(stats['average'] / overall_average, 3) if overall_average and stats['years'] else None
+        for month_number, stats in month_of_year.items()
+    }
+    
+    return cached.store({
+        'monthly': monthly,
+        'month_of_year': month_of_year,
+        'seasonal_index': seasonal_index,
+        'peak_month': max(monthly, key=lambda x: x['total_emails'])['month'] if monthly else None
+    })
 
 @router.get("/processed-ranges")
 async def get_processed_ranges(
@@ -578,6 +922,7 @@ async def get_processed_ranges(
                         processed_at=datetime.utcnow()
                     )
                     db.add(new_range)
+                    AccountStatsStore(db, account_id).refresh_range_count()
                     try:
                         db.commit()
                         logger.info(f"Successfully created reconstructed processed date range")
@@ -680,8 +1025,7 @@ async def recalculate_insights(
     db: Session = Depends(get_db)
 ):
     """Recalculate analysis results for all emails (re-categorize without re-fetching)"""
-    from app.email_batch_analysis import analyze_batch
-    from app.encryption import EncryptionManager
+    from app.email_batch_analysis import aggregate_batch, classify_batch
     
     user = db.query(User).filter(User.username == username).first()
     if not user:
@@ -724,51 +1068,55 @@ async def recalculate_insights(
         for e in emails
     ]
     
-    analysis_data = analyze_batch(email_data_list)
-    
-    # Helper functions for categorization
-    def get_category(email_data):
-        subject = (email_data.get('subject', '') or '').lower()
-        sender = (email_data.get('sender_email', '') or '').lower()
-        
-        if any(kw in subject for kw in ['notification', 'alert', 'reminder']):
-            return 'notifications'
-        elif any(kw in subject or kw in sender for kw in ['newsletter', 'digest', 'unsubscribe']):
-            return 'newsletters'
-        elif any(kw in sender for kw in ['facebook', 'twitter', 'linkedin', 'instagram']):
-            return 'social'
-        elif any(kw in sender for kw in ['amazon', 'ebay', 'order', 'shipping', 'delivery']):
-            return 'shopping'
-        elif any(kw in subject or kw in sender for kw in ['invoice', 'meeting', 'project', 'deadline']):
-            return 'work'
-        elif any(kw in subject for kw in ['hi ', 'hello', 'hey ', 're:', 'fwd:']):
-            return 'personal'
-        return 'other'
+    # Categories come from the shared engine (app.categorization), same as analysis runs
+    batch = EmailBatch.from_records(email_data_list)
+    classifier = CachedClassifier(user.id, CustomRuleEngine.load(db, user.id))
+    batch.categories, custom_categories = classifier.classify_batch(batch)
+    subject_clusters = SubjectClusterStore(db, account_id).assign(batch.subjects)
+    aggregates, email_categories = aggregate_batch(batch, subject_clusters)
+    analysis_data = aggregates.to_analysis()
+    classifications = classify_batch(batch, analysis_data, email_categories, subject_clusters)
     
     # Create new analysis results
     enc_manager = EncryptionManager(user.id)
     
-    for email_meta, email_data in zip(emails, email_data_list):
-        category = get_category(email_data)
-        
+    # Old summaries lost their results above; store the account-wide analysis once
+    prune_orphan_summaries(db, account_id)
+    summary = AnalysisSummary(
+        account_id=account_id,
+        analysis_run_id=None,  # Not tied to a specific run
+        encrypted_summary=enc_manager.encrypt(analysis_data),
+        email_count=len(emails)
+    )
+    db.add(summary)
+    db.flush()
+    
+    for email_meta, email_data, (sender_cluster, subject_cluster, category), custom_category_id in zip(
+        emails, email_data_list, classifications, custom_categories
+    ):
         encrypted_analysis = enc_manager.encrypt({
             'sender_email': email_data['sender_email'],
             'sender_name': email_data.get('sender_name'),
             'subject': email_data.get('subject', ''),
-            'date_received': email_data['date_received'].isoformat() if email_data['date_received'] else None,
-            'analysis': analysis_data
+            'date_received': email_data['date_received'].isoformat() if email_data['date_received'] else None
         })
         
         analysis_result = AnalysisResult(
             email_id=email_meta.id,
             analysis_run_id=None,  # Not tied to a specific run
             encrypted_analysis=encrypted_analysis,
-            sender_cluster=None,
-            subject_cluster=None,
-            category=category
+            summary_id=summary.id,
+            sender_cluster=sender_cluster,
+            subject_cluster=subject_cluster,
+            category=category,
+            custom_category_id=custom_category_id
         )
         db.add(analysis_result)
     
+    # Every email now has exactly one result: this batch is the account-wide state
+    AccountAggregateStore(db, user.id, account_id).replace(aggregates)
+    DailyRollupStore(db, account_id).rebuild()
+    AccountStatsStore(db, account_id).bump_version()
     db.commit()
     
     return {
@@ -834,6 +1182,10 @@ async def cleanup_duplicate_analysis_results(
             db.delete(result)
             total_removed += 1
     
+    # Emails analyzed twice were merged twice into the account state and the rollups
+    AccountAggregateStore(db, user.id, account_id).invalidate()
+    DailyRollupStore(db, account_id).rebuild()
+    AccountStatsStore(db, account_id).bump_version()
     db.commit()
     
     return {
@@ -938,6 +1290,74 @@ class SendersAssignRequest(BaseModel):
     sender_emails: List[str]
 
 
+class SubjectRuleCreate(BaseModel):
+    subject_contains: str
+
+
+def _user_account_ids(db: Session, user_id: int) -> List[int]:
+    return [account_id for (account_id,) in db.query(EmailAccount.id).filter(EmailAccount.user_id == user_id)]
+
+
+def _reapply_custom_rules(db: Session, user_id: int, **filters) -> int:
+    """Re-resolve custom categories of the user's stored results after a rule change (caller commits)."""
+    db.flush()
+    classification_cache.invalidate(user_id)
+    account_ids = _user_account_ids(db, user_id)
+    # Cached breakdowns of every account may name or count the changed categories
+    bump_versions(db, account_ids)
+    return CustomRuleEngine.load(db, user_id).reapply(db, account_ids, **filters)
+
+
+@router.get("/custom-categories/breakdown")
+async def get_custom_category_breakdown(
+    request: Request,
+    username: str,
+    account_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Email counts per custom category, for one account or all of the user's accounts."""
+    user = db.query(User).filter(User.username == username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    account_query = db.query(EmailAccount.id).filter(EmailAccount.user_id == user.id)
+    if account_id is not None:
+        account_query = account_query.filter(EmailAccount.id == account_id)
+    account_ids = [aid for (aid,) in account_query]
+    if account_id is not None and not account_ids:
+        raise HTTPException(status_code=404, detail="Account not found")
+    cached = insights_cache.lookup(request, "custom-categories/breakdown", account_versions(db, account_ids))
+    if cached.response is not None:
+        return cached.response
+
+    counts = (
+        db.query(AnalysisResult.custom_category_id, func.count(AnalysisResult.id))
+        .join(EmailMetadata, AnalysisResult.email_id == EmailMetadata.id)
+        .filter(EmailMetadata.account_id.in_(account_ids))
+        .group_by(AnalysisResult.custom_category_id)
+        .all()
+    )
+    names = dict(
+        db.query(CustomCategory.id, CustomCategory.name).filter(CustomCategory.user_id == user.id).all()
+    )
+    total = sum(count for _, count in counts)
+    uncategorized = sum(count for category_id, count in counts if category_id not in names)
+    categories = sorted(
+        (
+            {
+                "id": category_id,
+                "name": names[category_id],
+                "count": count,
+                "percentage": round(count / total * 100, 2) if total > 0 else 0,
+            }
+            for category_id, count in counts
+            if category_id in names
+        ),
+        key=lambda x: (-x["count"], x["name"]),
+    )
+    return cached.store({"categories": categories, "uncategorized": uncategorized, "total": total})
+
+
 @router.get("/custom-categories")
 async def list_custom_categories(
     username: str,
@@ -989,6 +1409,7 @@ async def create_custom_category(
 
     cat = CustomCategory(user_id=user.id, name=name)
     db.add(cat)
+    bump_versions(db, _user_account_ids(db, user.id))
     db.commit()
     db.refresh(cat)
     return {
@@ -1035,6 +1456,7 @@ async def update_custom_category(
         raise HTTPException(status_code=400, detail="A category with this name already exists")
 
     cat.name = name
+    bump_versions(db, _user_account_ids(db, user.id))
     db.commit()
     db.refresh(cat)
     return {
@@ -1050,7 +1472,7 @@ async def delete_custom_category(
     category_id: int,
     db: Session = Depends(get_db),
 ):
-    """Delete a custom category and all sender mappings."""
+    """Delete a custom category with its sender mappings and subject rules."""
     user = db.query(User).filter(User.username == username).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -1063,6 +1485,13 @@ async def delete_custom_category(
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
 
+    # Drop its rules first so its emails fall back to whatever other rule matches them
+    # before the category row (which their custom_category_id references) goes
+    db.query(SenderCategoryMapping).filter(
+        SenderCategoryMapping.custom_category_id == category_id
+    ).delete(synchronize_session=False)
+    db.query(SubjectRule).filter(SubjectRule.custom_category_id == category_id).delete(synchronize_session=False)
+    _reapply_custom_rules(db, user.id, custom_category_id=category_id)
     db.delete(cat)
     db.commit()
     return {"message": "Category deleted"}
@@ -1089,10 +1518,14 @@ async def assign_senders_to_category(
         raise HTTPException(status_code=404, detail="Category not found")
 
     assigned = 0
+    senders = set()
     for email in body.sender_emails or []:
-        email = (email or "").strip().lower()
-        if not email or "@" not in email:
+        # Stored in the same normalized form as /senders reports
+        identity = normalize_sender(email)
+        if identity.domain is None:
             continue
+        email = identity.address
+        senders.add(email)
         # Remove from any other custom category for this user
         db.query(SenderCategoryMapping).filter(
             SenderCategoryMapping.user_id == user.id,
@@ -1117,8 +1550,13 @@ async def assign_senders_to_category(
             db.add(mapping)
             assigned += 1
 
+    updated = _reapply_custom_rules(db, user.id, senders=senders) if senders else 0
     db.commit()
-    return {"message": f"Assigned {assigned} sender(s) to category", "assigned": assigned}
+    return {
+        "message": f"Assigned {assigned} sender(s) to category",
+        "assigned": assigned,
+        "results_updated": updated,
+    }
 
 
 @router.delete("/custom-categories/{category_id}/senders/{sender_email:path}")
@@ -1146,9 +1584,117 @@ async def remove_sender_from_category(
         .filter(
             SenderCategoryMapping.user_id == user.id,
             SenderCategoryMapping.custom_category_id == category_id,
-            SenderCategoryMapping.sender_email == sender_email,
+            # Mappings made before normalization hold the lowercased raw address
+            SenderCategoryMapping.sender_email.in_(
+                {sender_email, sender_email.strip().lower(), normalize_sender(sender_email).address}
+            ),
         )
         .delete(synchronize_session=False)
     )
+    if deleted:
+        _reapply_custom_rules(db, user.id, senders=[normalize_sender(sender_email).address])
+    db.commit()
+    return {"message": "Sender removed from category", "deleted": deleted > 0}
+
+
+@router.get("/custom-categories/{category_id}/subject-rules")
+async def list_subject_rules(
+    username: str,
+    category_id: int,
+    db: Session = Depends(get_db),
+):
+    """List the subject rules of a custom category, oldest (highest precedence) first."""
+    user = db.query(User).filter(User.username == username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    cat = (
+        db.query(CustomCategory)
+        .filter(CustomCategory.id == category_id, CustomCategory.user_id == user.id)
+        .first()
+    )
+    if not cat:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    rules = (
+        db.query(SubjectRule)
+        .filter(SubjectRule.custom_category_id == category_id, SubjectRule.user_id == user.id)
+        .order_by(SubjectRule.id)
+        .all()
+    )
+    return [
+        {
+            "id": r.id,
+            "subject_contains": r.subject_contains,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+        }
+        for r in rules
+    ]
+
+
+@router.post("/custom-categories/{category_id}/subject-rules")
+async def create_subject_rule(
+    username: str,
+    category_id: int,
+    body: SubjectRuleCreate,
+    db: Session = Depends(get_db),
+):
+    """Add a rule: emails whose subject contains the text (case-insensitive) join the category."""
+    user = db.query(User).filter(User.username == username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    cat = (
+        db.query(CustomCategory)
+        .filter(CustomCategory.id == category_id, CustomCategory.user_id == user.id)
+        .first()
+    )
+    if not cat:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    pattern = (body.subject_contains or "").strip()
+    if not pattern:
+        raise HTTPException(status_code=400, detail="subject_contains is required")
+
+    rule = SubjectRule(user_id=user.id, custom_category_id=category_id, subject_contains=pattern)
+    db.add(rule)
+    updated = _reapply_custom_rules(db, user.id)
+    db.commit()
+    db.refresh(rule)
+    return {
+        "id": rule.id,
+        "subject_contains": rule.subject_contains,
+        "created_at": rule.created_at.isoformat() if rule.created_at else None,
+        "results_updated": updated,
+    }
+
+
+@router.delete("/custom-categories/{category_id}/subject-rules/{rule_id}")
+async def delete_subject_rule(
+    username: str,
+    category_id: int,
+    rule_id: int,
+    db: Session = Depends(get_db),
+):
+    """Remove a subject rule from a custom category."""
+    user = db.query(User).filter(User.username == username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    rule = (
+        db.query(SubjectRule)
+        .filter(
+            SubjectRule.id == rule_id,
+            SubjectRule.custom_category_id == category_id,
+            SubjectRule.user_id == user.id,
+        )
+        .first()
+    )
+    if not rule:
+        raise HTTPException(status_code=404, detail="Rule not found")
+
+    db.delete(rule)
+    # Only emails resolved to this category can change
+    _reapply_custom_rules(db, user.id, custom_category_id=category_id)
     db.commit()
-    return {"message": "Sender removed from category", "deleted": deleted > 0}
\ No newline at end of file
+    return {"message": "Rule deleted"}
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+Normalized sender identity: address, domain and registrable domain (eTLD+1).
+
+Computed once per message at ingest and stored on EmailMetadata
+(sender_normalized, sender_domain, sender_registrable_domain), so insight queries
+group on indexed columns instead of re-deriving domains with string functions.
+``normalize_sender`` is LRU-cached; a run sees the same few thousand senders
+over and over.
+
+Normalization: trim and lowercase, drop "+tag" plus-addressing from the local
+part, and for Gmail also drop dots and map googlemail.com to gmail.com (Gmail
+ignores both). Registrable domains follow the Public Suffix List algorithm over
+the bundled subset in app/data/public_suffix_list.dat, or the file named by
+MAILMIND_PUBLIC_SUFFIX_FILE.
+"""
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+
+_DEFAULT_SUFFIX_FILE = Path(__file__).resolve().parent / "data" / "public_suffix_list.dat"
+PUBLIC_SUFFIX_FILE = os.getenv("MAILMIND_PUBLIC_SUFFIX_FILE") or str(_DEFAULT_SUFFIX_FILE)
+
+# Domains whose mailboxes ignore dots in the local part
+_DOTLESS_DOMAINS = frozenset({"gmail.com", "googlemail.com"})
+_DOMAIN_ALIASES = {"googlemail.com": "gmail.com"}
+
+
+class SenderIdentity(NamedTuple):
+    address: str  # Normalized address ("" when unknown)
+    domain: Optional[str]  # Lowercased domain, None without "@"
+    registrable_domain: Optional[str]  # eTLD+1 of domain
+
+
+class SuffixRules(NamedTuple):
+    rules: FrozenSet[str]
+    wildcards: FrozenSet[str]  # Parents of "*." rules
+    exceptions: FrozenSet[str]  # "!" rules, without the "!"
+
+
+def load_suffix_rules(path: str = PUBLIC_SUFFIX_FILE) -> SuffixRules:
+    rules, wildcards, exceptions = set(), set(), set()
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            rule = line.split("//", 1)[0].strip().lower()
+            if not rule:
+                continue
+            if rule.startswith("!"):
+                exceptions.add(rule[1:])
+            elif rule.startswith("*."):
+                wildcards.add(rule[2:])
+            else:
+                rules.add(rule)
+    return SuffixRules(frozenset(rules), frozenset(wildcards), frozenset(exceptions))
+
+
+_suffix_rules: Optional[SuffixRules] = None
+
+
+def _rules() -> SuffixRules:
+    global _suffix_rules
+    if _suffix_rules is None:
+        _suffix_rules = load_suffix_rules()
+    return _suffix_rules
+
+
+def public_suffix_length(labels: Tuple[str, ...]) -> int:
+    """Number of trailing labels forming the public suffix (at least 1, the implicit "*" rule)."""
+    rules = _rules()
+    for start in range(len(labels)):
+        candidate = ".".join(labels[start:])
+        # Longest rule wins: an exception ends one label short of the candidate, a wildcard
+        # covers one label more than a plain rule at the same position
+        if candidate in rules.exceptions:
+            return len(labels) - start - 1
+        if start > 0 and candidate in rules.wildcards:
+            return len(labels) - start + 1
+        if candidate in rules.rules:
+            return len(labels) - start
+    return 1
+
+
+@lru_cache(maxsize=65536)
+def registrable_domain(domain: Optional[str]) -> Optional[str]:
+    """eTLD+1 of a lowercased domain; the domain itself when it is a public suffix."""
+    if not domain:
+        return None
+    labels = tuple(label for label in domain.strip(".").split(".") if label)
+    if not labels:
+        return None
+    suffix_length = public_suffix_length(labels)
+    if suffix_length >= len(labels):
+        return ".".join(labels)
+    return ".".join(labels[-(suffix_length + 1):])
+
+
+@lru_cache(maxsize=65536)
+def normalize_sender(sender_email: Optional[str]) -> SenderIdentity:
+    """SenderIdentity of a raw sender address (as extracted from the From header)."""
+    address = (sender_email or "").strip().lower()
+    if "@" not in address:
+        return SenderIdentity(address, None, None)
+
+    local, domain = address.rsplit("@", 1)
+    domain = domain.strip(".")
+    local = local.split("+", 1)[0] or local
+    if domain in _DOTLESS_DOMAINS:
+        local = local.replace(".", "")
+        domain = _DOMAIN_ALIASES.get(domain, domain)
+    if not domain:
+        return SenderIdentity(address, None, None)
+    return SenderIdentity(f"{local}@{domain}", domain, registrable_domain(domain))
@@ -0,0 +1,136 @@
+"""
+Per-account, per-month HyperLogLog sketches of distinct senders.
+
+``sender_sketches`` holds one app.hyperloglog register array per (account,
+received month) over the normalized senders of that month's emails. Any set of
+accounts and range of months is estimated by merging its rows (register-wise
+max) instead of a COUNT(DISTINCT) over email_metadata. Ingestion adds each
+stored chunk's senders in the chunk's transaction. Sketches cannot remove
+items, so paths that delete emails call ``rebuild``, as with the other
+per-account stores. ``exact_distinct_senders`` answers the same question exactly.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import EmailMetadata, SenderSketch
+from app.hyperloglog import HyperLogLog
+
+# Email rows streamed per fetch by rebuild()
+_STREAM_PAGE = 5000
+
+
+def month_key(value: datetime) -> str:
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def _month_start(month: str) -> datetime:
+    return datetime(int(month[:4]), int(month[5:7]), 1)
+
+
+def _next_month_start(month: str) -> datetime:
+    year, month_number = int(month[:4]), int(month[5:7])
+    return datetime(year + month_number // 12, month_number % 12 + 1, 1)
+
+
+class SenderSketchStore:
+    """Monthly sender sketches of one account; the caller commits."""
+
+    def __init__(self, db: Session, account_id: int):
+        self.db = db
+        self.account_id = account_id
+
+    def add(self, emails: Iterable[Tuple[Optional[str], Optional[datetime]]]) -> None:
+        """Add newly stored emails given as (normalized sender, received date) pairs."""
+        senders: Dict[str, Set[str]] = defaultdict(set)
+        for sender, received in emails:
+            if received is not None:
+                senders[month_key(received)].add(sender or "")
+        if not senders:
+            return
+        existing = {
+            row.month: row
+            for row in self.db.query(SenderSketch).filter(
+                SenderSketch.account_id == self.account_id,
+                SenderSketch.month.in_(list(senders))
+            )
+        }
+        for month, month_senders in senders.items():
+            row = existing.get(month)
+            sketch = HyperLogLog.from_bytes(row.registers) if row is not None else HyperLogLog()
+            sketch.update(month_senders)
+            if row is None:
+                self.db.add(SenderSketch(account_id=self.account_id, month=month, registers=sketch.to_bytes()))
+            else:
+                row.registers = sketch.to_bytes()
+
+    def rebuild(self) -> int:
+        """Recompute the account's sketches from email_metadata; returns the number of months."""
+        self.db.flush()
+        rows = self.db.query(
+            EmailMetadata.sender_normalized, EmailMetadata.date_received
+        ).filter(
+            EmailMetadata.account_id == self.account_id
+        ).yield_per(_STREAM_PAGE)
+        sketches: Dict[str, HyperLogLog] = defaultdict(HyperLogLog)
+        for sender, received in rows:
+            if received is not None:
+                sketches[month_key(received)].add(sender or "")
+        self.db.query(SenderSketch).filter(
+            SenderSketch.account_id == self.account_id
+        ).delete(synchronize_session=False)
+        self.db.bulk_insert_mappings(SenderSketch, [
+            {"account_id": self.account_id, "month": month, "registers": sketch.to_bytes()}
+            for month, sketch in sketches.items()
+        ])
+        return len(sketches)
+
+
+def accounts_with_sketches(db: Session, account_ids: Sequence[int]) -> Set[int]:
+    """The accounts among account_ids that have sketch rows, in one grouped query."""
+    if not account_ids:
+        return set()
+    rows = db.query(SenderSketch.account_id).filter(
+        SenderSketch.account_id.in_(list(account_ids))
+    ).group_by(SenderSketch.account_id)
+    return {account_id for account_id, in rows}
+
+
+def estimate_distinct_senders(
+    db: Session,
+    account_ids: Sequence[int],
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+) -> Tuple[HyperLogLog, int]:
+    """Merged sketch of the accounts over months [start_month, end_month] (inclusive), and its row count."""
+    if not account_ids:
+        return HyperLogLog(), 0
+    query = db.query(SenderSketch.registers).filter(SenderSketch.account_id.in_(list(account_ids)))
+    if start_month:
+        query = query.filter(SenderSketch.month >= start_month)
+    if end_month:
+        query = query.filter(SenderSketch.month <= end_month)
+    sketches = [HyperLogLog.from_bytes(registers) for (registers,) in query]
+    return HyperLogLog.union(sketches), len(sketches)
+
+
+def exact_distinct_senders(
+    db: Session,
+    account_ids: Sequence[int],
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+) -> int:
+    """COUNT(DISTINCT sender_normalized) over the same accounts and months."""
+    if not account_ids:
+        return 0
+    query = db.query(func.count(func.distinct(func.coalesce(EmailMetadata.sender_normalized, "")))).filter(
+        EmailMetadata.account_id.in_(list(account_ids))
+    )
+    if start_month:
+        query = query.filter(EmailMetadata.date_received >= _month_start(start_month))
+    if end_month:
+        query = query.filter(EmailMetadata.date_received < _next_month_start(end_month))
+    return query.scalar() or 0
@@ -0,0 +1,129 @@
+"""
+Per-sender email counts behind /insights/senders.
+
+``sender_stats`` holds one row per (account, normalized sender) with its email
+count and display name (the greatest sender_name seen, as the former GROUP BY
+reported). The (account_id, email_count, sender) index makes a page of senders
+ordered by (count desc, sender) an index range read after the previous page's
+last key, so any page costs O(page size) instead of a GROUP BY plus OFFSET.
+
+Ingestion adds each stored chunk's counts in the chunk's transaction; paths that
+delete emails call ``rebuild`` (as with app.account_stats.AccountStatsStore.refresh).
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import EmailMetadata, SenderStat
+
+# Senders per IN (...) when loading rows to update
+_SENDER_CHUNK = 500
+
+# (email_count, sender) of the last row of a page; the next page starts after it
+SenderKey = Tuple[int, str]
+
+
+def _max_name(current: Optional[str], name: Optional[str]) -> Optional[str]:
+    if name is None:
+        return current
+    return name if current is None or name > current else current
+
+
+class SenderStatsStore:
+    """Sender count rows of one account; the caller commits."""
+
+    def __init__(self, db: Session, account_id: int):
+        self.db = db
+        self.account_id = account_id
+
+    def add(self, emails: Iterable[Tuple[Optional[str], Optional[str]]]) -> None:
+        """Count newly stored emails given as (normalized sender, display name) pairs."""
+        counts: Counter = Counter()
+        names: Dict[str, Optional[str]] = {}
+        for sender, name in emails:
+            sender = sender or ""
+            counts[sender] += 1
+            names[sender] = _max_name(names.get(sender), name)
+        if not counts:
+            return
+
+        senders = sorted(counts)
+        existing: Dict[str, SenderStat] = {}
+        for start in range(0, len(senders), _SENDER_CHUNK):
+            rows = self.db.query(SenderStat).filter(
+                SenderStat.account_id == self.account_id,
+                SenderStat.sender.in_(senders[start:start + _SENDER_CHUNK])
+            ).all()
+            existing.update((row.sender, row) for row in rows)
+
+        for sender, count in counts.items():
+            row = existing.get(sender)
+            if row is None:
+                self.db.add(SenderStat(
+                    account_id=self.account_id,
+                    sender=sender,
+                    name=names[sender],
+                    email_count=count
+                ))
+            else:
+                row.email_count += count
+                row.name = _max_name(row.name, names[sender])
+
+    def rebuild(self) -> int:
+        """Recompute the account's rows from email_metadata; returns the row count."""
+        self.db.flush()
+        rows = self.db.query(
+            EmailMetadata.sender_normalized,
+            func.max(EmailMetadata.sender_name),
+            func.count(EmailMetadata.id)
+        ).filter(
+            EmailMetadata.account_id == self.account_id
+        ).group_by(
+            EmailMetadata.sender_normalized
+        ).all()
+        counts: Dict[str, List] = {}
+        for sender, name, count in rows:
+            # Legacy rows without sender_normalized share the "" sender
+            entry = counts.setdefault(sender or "", [0, None])
+            entry[0] += count
+            entry[1] = _max_name(entry[1], name)
+        self.db.query(SenderStat).filter(
+            SenderStat.account_id == self.account_id
+        ).delete(synchronize_session=False)
+        self.db.bulk_insert_mappings(SenderStat, [
+            {
+                "account_id": self.account_id,
+                "sender": sender,
+                "name": name,
+                "email_count": count,
+            }
+            for sender, (count, name) in counts.items()
+        ])
+        return len(counts)
+
+    def page(self, limit: int, after: Optional[SenderKey] = None, offset: int = 0) -> List[SenderStat]:
+        """Up to ``limit`` rows by (count desc, sender), after the key ``after`` (or skipping ``offset`` rows)."""
+        query = self.db.query(SenderStat).filter(SenderStat.account_id == self.account_id)
+        if after is None:
+            query = query.order_by(SenderStat.email_count.desc(), SenderStat.sender)
+            if offset > 0:
+                query = query.offset(offset)
+            return query.limit(limit).all()
+
+        # Two index range reads instead of one OR, which SQLite would answer by scanning
+        # every row tied with the last count (long tails of single-email senders)
+        count, sender = after
+        rows = query.filter(
+            SenderStat.email_count == count,
+            SenderStat.sender > sender
+        ).order_by(SenderStat.sender).limit(limit).all()
+        if len(rows) < limit:
+            rows += query.filter(
+                SenderStat.email_count < count
+            ).order_by(SenderStat.email_count.desc(), SenderStat.sender).limit(limit - len(rows)).all()
+        return rows
+
+    def has_rows(self) -> bool:
+        return self.db.query(SenderStat.id).filter(SenderStat.account_id == self.account_id).first() is not None
@@ -1,19 +1,36 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import text
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 import json
 import logging
 
-from app.database import EmailMetadata, AnalysisResult, AnalysisRun
+from app.database import EmailMetadata, AnalysisResult, AnalysisRun, AnalysisSummary
 from app.encryption import EncryptionManager
-from app.email_batch_analysis import analyze_batch
+from app.email_batch import EmailBatch
+from app.email_batch_analysis import aggregate_batch, classify_batch
 from app.date_tracker import DateTracker
+from app.checkpoints import CheckpointStore
+from app.account_aggregates import AccountAggregateStore
+from app.sender_identity import normalize_sender
+from app.subject_clusters import SubjectClusterStore
+from app.custom_rules import CustomRuleEngine
+from app.classification_cache import CachedClassifier, classification_cache
+from app.daily_rollups import DailyRollupStore, batch_counts
+from app.account_stats import AccountStatsStore
+from app.sender_stats import SenderStatsStore
+from app.sender_sketches import SenderSketchStore
+from app.progress import progress_registry
+from app.spill_buffer import ColumnarSpillBuffer, DEFAULT_MEMORY_BUDGET_MB
+from app.known_messages import KnownMessageIndex
+from app.cancellation import CancellationToken
 from app.range_semantics import normalize_analysis_window, is_valid_half_open
 
 logger = logging.getLogger(__name__)
 
+# Analysis results flushed (then detached from the session) per page
+RESULT_PAGE_SIZE = 500
+
 def chunk_date_range(start_date: datetime, end_date: datetime, chunk_size_days: int = 365) -> List[Tuple[datetime, datetime]]:
     """
     Split half-open [start_date, end_date) into chunks of at most chunk_size_days.
@@ -28,18 +45,49 @@ def chunk_date_range(start_date: datetime, end_date: datetime, chunk_size_days:
     logger.info(f"Split half-open range [{start_date}, {end_date}) into {len(chunks)} chunks")
     return chunks
 
+def prune_orphan_summaries(db: Session, account_id: int) -> int:
+    """Delete AnalysisSummary rows of the account no longer referenced by any AnalysisResult (caller commits)."""
+    referenced = db.query(AnalysisResult.summary_id).filter(AnalysisResult.summary_id != None)
+    deleted = db.query(AnalysisSummary).filter(
+        AnalysisSummary.account_id == account_id,
+        ~AnalysisSummary.id.in_(referenced)
+    ).delete(synchronize_session=False)
+    if deleted:
+        logger.info(f"Pruned {deleted} unreferenced analysis summaries for account {account_id}")
+    return deleted
+
 class AnalysisService:
     """Service for batch email analysis"""
     
-    def __init__(self, db: Session, user_id: int, account_id: int, run_id: int = None):
+    def __init__(
+        self,
+        db: Session,
+        user_id: int,
+        account_id: int,
+        run_id: int = None,
+        memory_budget_mb: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ):
         self.db = db
         self.user_id = user_id
         self.account_id = account_id
         self.run_id = run_id
         self.enc_manager = EncryptionManager(user_id)
         self.date_tracker = DateTracker(db, account_id)
+        self.checkpoints = CheckpointStore(db, account_id)
+        self.account_aggregates = AccountAggregateStore(db, user_id, account_id)
+        self.rollups = DailyRollupStore(db, account_id)
+        self.stats = AccountStatsStore(db, account_id)
+        self.sender_stats = SenderStatsStore(db, account_id)
+        self.sender_sketches = SenderSketchStore(db, account_id)
+        # User's custom-category rules, compiled once per run, behind the shared classification cache
+        self.classifier = CachedClassifier(user_id, CustomRuleEngine.load(db, user_id))
         self.processed_ranges = []  # Track ranges processed in this run for revert
-        self.processed_email_ids = []  # Track email IDs processed in this run
+        # In-flight records of a range beyond this budget spill to a temporary on-disk buffer
+        self.memory_budget_bytes = (memory_budget_mb or DEFAULT_MEMORY_BUDGET_MB) * 1024 * 1024
+        self._known_ids = None  # KnownMessageIndex, built on first fetch of the run
+        # Checked inside connector fetch loops and per stored page; raises AnalysisCancelled
+        self.cancel_token = cancel_token
     
     def analyze_date_range(
         self,
@@ -74,20 +122,16 @@ class AnalysisService:
             total_emails = 0
             
             # Set total chunks for progress tracking
-            analysis_run = self.db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
-            if analysis_run:
-                analysis_run.total_chunks = len(chunks)
-                self.db.commit()
+            progress_registry.update(run_id, total_chunks=len(chunks))
+            progress_registry.flush(run_id, force=True)
             
             for chunk_idx, (chunk_start, chunk_end) in enumerate(chunks, 1):
                 logger.info(f"Processing chunk {chunk_idx}/{len(chunks)}: {chunk_start} to {chunk_end}")
                 print(f"[PRINT] Processing chunk {chunk_idx}/{len(chunks)}")
                 
                 # Update analysis run with current chunk info
-                analysis_run = self.db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
-                if analysis_run:
-                    analysis_run.current_chunk = chunk_idx
-                    self.db.commit()
+                progress_registry.update(run_id, current_chunk=chunk_idx)
+                progress_registry.flush(run_id, force=True)
                 
                 # Process this chunk
                 result = self._process_single_range(connector, chunk_start, chunk_end, run_id)
@@ -103,11 +147,8 @@ class AnalysisService:
                     }
             
             # Clear chunk info on success
-            analysis_run = self.db.query(AnalysisRun).filter(AnalysisRun.id == run_id).first()
-            if analysis_run:
-                analysis_run.current_chunk = None
-                analysis_run.total_chunks = None
-                self.db.commit()
+            progress_registry.update(run_id, current_chunk=None, total_chunks=None)
+            progress_registry.flush(run_id, force=True)
             
             return {
                 'emails_processed': total_emails,
@@ -148,6 +189,7 @@ class AnalysisService:
         total_emails_expected = None
         if analysis_run and hasattr(connector, 'get_email_count_by_date_range'):
             try:
+                progress_registry.update(run_id, stage="counting")
                 logger.info("Calculating total email count for progress tracking...")
                 print("[PRINT] Calculating total email count...")
                 total_count = 0
@@ -164,8 +206,8 @@ class AnalysisService:
                 
                 if total_count is not None:
                     total_emails_expected = total_count
-                    analysis_run.total_emails = total_emails_expected
-                    self.db.commit()
+                    progress_registry.update(run_id, total_emails=total_emails_expected)
+                    progress_registry.flush(run_id, force=True)
                     logger.info(f"Total emails to process: {total_emails_expected}")
                     print(f"[PRINT] Total emails to process: {total_emails_expected}")
             except Exception as e:
@@ -176,6 +218,7 @@ class AnalysisService:
         # Track ranges that have been marked as processed in this analysis
         # If analysis fails, we'll need to remove these to prevent premature marking
         processed_ranges_in_this_run = []
+        buffer = None
         
         try:
             # Process each unprocessed range
@@ -191,178 +234,187 @@ class AnalysisService:
                 logger.info(f"Processing range: {range_start} to {range_end}")
                 print(f"[PRINT] Processing range: {range_start} to {range_end}")
                 
-                # Create progress callback to update database during fetching
+                # Resume from a checkpoint left by an earlier failed/interrupted attempt
+                checkpoint = self.checkpoints.get(range_start, range_end)
+                resume_cursor = checkpoint.cursor if checkpoint else None
+                fetch_start, fetch_end = range_start, range_end
+                if checkpoint:
+                    window = None if checkpoint.fetch_complete else self.checkpoints.uncovered_window(checkpoint)
+                    if window is not None:
+                        # Days already covered are not listed again; provider cursors belong to the
+                        # full window's query, so the trimmed one starts from its first page
+                        fetch_start, fetch_end = window
+                        resume_cursor = None
+                    logger.info(
+                        f"Resuming range from checkpoint: {checkpoint.emails_stored} emails already stored, "
+                        f"fetch_complete={checkpoint.fetch_complete}, cursor={resume_cursor}, "
+                        f"fetching [{fetch_start}, {fetch_end})"
+                    )
+                    print(f"[PRINT] Resuming range from checkpoint ({checkpoint.emails_stored} emails already stored)")
+                
+                range_base = total_emails
+                # Emails ingested for this range (with their email_id), kept until analysis
+                buffer = ColumnarSpillBuffer(self.memory_budget_bytes)
+                
+                # Progress callback: in-memory registry, written through to the run row at a throttled interval
                 def update_fetch_progress(fetched_count, total_count):
                     if run_id:
-                        try:
-                            import sqlite3
-                            import os
-                            db_url = os.getenv("DATABASE_URL", "sqlite:///./data/mailmind.db")
-                            db_path = db_url.replace("sqlite:///", "")
-                            if not os.path.isabs(db_path):
-                                db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), db_path)
-                            
-                            conn = sqlite3.connect(db_path)
-                            cursor = conn.cursor()
-                            # Update emails_processed to show fetching progress
-                            cursor.execute(
-                                "UPDATE analysis_runs SET emails_processed = ? WHERE id = ?",
-                                (total_emails + fetched_count, run_id)
-                            )
-                            conn.commit()
-                            conn.close()
-                            logger.info(f"Fetch progress: {fetched_count}/{total_count} emails fetched (run_id={run_id})")
-                            print(f"[PRINT] Fetch progress: {fetched_count}/{total_count} emails fetched (run_id={run_id})")
-                        except Exception as e:
-                            logger.warning(f"Failed to update fetch progress: {e}")
+                        progress_registry.update(run_id, emails_processed=range_base + fetched_count, stage="fetching")
+                        logger.info(f"Fetch progress: {fetched_count}/{total_count} emails fetched (run_id={run_id})")
+                
+                # Store each fetched page, then advance the checkpoint past it
+                def store_page(page_emails, next_cursor):
+                    nonlocal total_emails
+                    if self.cancel_token:
+                        self.cancel_token.raise_if_cancelled()
+                    # Process emails in chunks to update progress incrementally
+                    chunk_size = 50  # Process 50 emails at a time
+                    for chunk_start in range(0, len(page_emails), chunk_size):
+                        email_chunk = page_emails[chunk_start:chunk_start + chunk_size]
+                        for email_data, email_id in self._store_email_chunk(email_chunk):
+                            buffer.append({**email_data, 'email_id': email_id})
+                        
+                        # Track total emails processed (don't update DB here - chunk storage is fast,
+                        # and updating would reset the fetch progress which confuses the UI)
+                        total_emails += len(email_chunk)
+                        logger.info(f"Stored chunk: {total_emails} emails (run_id={run_id})")
+                        print(f"[PRINT] Stored chunk: {total_emails} emails (run_id={run_id})")
+                    self.checkpoints.save(range_start, range_end, next_cursor, page_emails, run_id)
+                
+                progress_registry.update(run_id, stage="fetching")
+                if checkpoint and checkpoint.fetch_complete:
+                    logger.info("Checkpoint shows all pages stored; skipping fetch")
+                    print("[PRINT] Checkpoint shows all pages stored; skipping fetch")
+                else:
+                    # Fetch emails with progress callback; pages are stored as they arrive
+                    connector.fetch_emails_by_date_range(
+                        fetch_start,
+                        fetch_end,
+                        progress_callback=update_fetch_progress,
+                        resume_cursor=resume_cursor,
+                        page_callback=store_page,
+                        known_ids=self._known_message_index(),
+                        cancel_token=self.cancel_token
+                    )
+                logger.info(f"Fetched {len(buffer)} emails for this range")
+                print(f"[PRINT] Fetched {len(buffer)} emails for this range")
+                
+                # Stored messages are skipped by the connector; any of them without results
+                # (left by an earlier failed attempt) are analyzed from email_metadata instead
+                fetched_count = len(buffer)
+                buffer.extend(self._load_unanalyzed_emails(
+                    range_start,
+                    range_end,
+                    exclude_ids={record['email_id'] for record in buffer}
+                ))
+                if len(buffer) > fetched_count:
+                    total_emails += len(buffer) - fetched_count
+                    logger.info(f"Loaded {len(buffer) - fetched_count} previously stored, unanalyzed emails")
                 
-                # Fetch emails with progress callback
-                emails = connector.fetch_emails_by_date_range(range_start, range_end, progress_callback=update_fetch_progress)
-                logger.info(f"Fetched {len(emails)} emails for this range")
-                print(f"[PRINT] Fetched {len(emails)} emails for this range")
+                email_count = len(buffer)
+                if buffer.spilled:
+                    logger.info(f"Range holds {email_count} emails, {buffer.spilled} spilled to disk")
+                    print(f"[PRINT] Range holds {email_count} emails, {buffer.spilled} spilled to disk")
                 
-                if not emails:
+                if not email_count:
                     logger.info(f"No emails in range {range_start} to {range_end}, marking as processed anyway")
                     print(f"[PRINT] No emails in range, marking as processed anyway")
                     # Mark range as processed even if no emails (to prevent gaps from getting stuck)
                     self.date_tracker.mark_range_processed(range_start, range_end, 0)
                     processed_ranges_in_this_run.append((range_start, range_end))
-                    # Still update progress (total_emails stays the same, but ensure DB is synced)
+                    self.processed_ranges.append((range_start, range_end))
+                    self.checkpoints.clear(range_start, range_end)
+                    buffer.close()
+                    # Still update progress (total_emails stays the same)
                     if run_id:
-                        try:
-                            result = self.db.execute(
-                                text("UPDATE analysis_runs SET emails_processed = :count WHERE id = :run_id"),
-                                {"count": total_emails, "run_id": run_id}
-                            )
-                            self.db.commit()
-                            logger.info(f"Updated progress after empty range: {total_emails} emails (run_id={run_id})")
-                        except Exception as e:
-                            logger.warning(f"Failed to update progress after empty range: {e}")
+                        progress_registry.update(run_id, emails_processed=total_emails)
                     continue
                 
-                # Process emails in chunks to update progress incrementally
-                # This allows the frontend to see progress updates during processing
-                chunk_size = 50  # Process 50 emails at a time
-                all_stored_emails = []
+                # Analyze all emails together (analysis is more efficient on larger batches)
+                progress_registry.update(run_id, emails_processed=total_emails, stage="analyzing")
+                # Columnar view of the range (ids, timestamps and unique senders/subjects only;
+                # snippets stay in the buffer) shared by clustering, aggregation and labelling
+                batch = EmailBatch.from_records(buffer)
+                # Category and custom category per email; repeated (sender, subject template)
+                # pairs are answered from the cache across batches and runs
+                batch.categories, custom_categories = self.classifier.classify_batch(batch)
+                cache_stats = classification_cache.stats()
+                logger.info(
+                    f"Classification cache: {cache_stats['entries']} entries, hit rate {cache_stats['hit_rate']:.2%}"
+                )
+                # Stable per-account subject clusters: near-duplicates of earlier subjects
+                # join their stored clusters, the rest found new ones
+                subject_clusters = SubjectClusterStore(self.db, self.account_id).assign(batch.subjects)
+                aggregates, email_categories = aggregate_batch(batch, subject_clusters)
+                analysis_data = aggregates.to_analysis()
                 
-                for chunk_start in range(0, len(emails), chunk_size):
-                    chunk_end = min(chunk_start + chunk_size, len(emails))
-                    email_chunk = emails[chunk_start:chunk_end]
-                    
-                    # Store email metadata for this chunk
-                    stored_emails = []
-                    for email_data in email_chunk:
-                        # Check if email already exists
-                        existing = self.db.query(EmailMetadata).filter(
-                            EmailMetadata.message_id == email_data['message_id'],
-                            EmailMetadata.account_id == self.account_id
-                        ).first()
-                        
-                        if existing:
-                            stored_emails.append(existing)
-                            continue
-                        
-                        # Create new metadata
-                        email_meta = EmailMetadata(
-                            account_id=self.account_id,
-                            message_id=email_data['message_id'],
-                            sender_email=email_data['sender_email'],
-                            sender_name=email_data.get('sender_name'),
-                            subject=email_data.get('subject', ''),
-                            date_received=email_data['date_received']
-                        )
-                        self.db.add(email_meta)
-                        stored_emails.append(email_meta)
-                    
-                    # Commit this chunk with error handling for race conditions
-                    try:
-                        self.db.commit()
-                        logger.info(f"Committed chunk {chunk_start//chunk_size + 1}: {len(stored_emails)} email metadata records")
-                        print(f"[PRINT] Committed chunk {chunk_start//chunk_size + 1}: {len(stored_emails)} emails")
-                    except IntegrityError as e:
-                        # Handle race condition: another process may have inserted the same email
-                        logger.warning(f"IntegrityError during email commit (likely race condition): {e}")
-                        print(f"[PRINT] IntegrityError during email commit (likely race condition): {e}")
-                        self.db.rollback()
-                        
-                        # Re-fetch existing emails that may have been inserted by another process
-                        stored_emails = []
-                        for email_data in email_chunk:
-                            existing = self.db.query(EmailMetadata).filter(
-                                EmailMetadata.message_id == email_data['message_id'],
-                                EmailMetadata.account_id == self.account_id
-                            ).first()
-                            
-                            if existing:
-                                stored_emails.append(existing)
-                            else:
-                                # Try to insert again (shouldn't happen, but handle gracefully)
-                                logger.warning(f"Email {email_data['message_id']} not found after rollback, skipping")
-                                print(f"[PRINT] Email {email_data['message_id']} not found after rollback, skipping")
-                    
-                    # Refresh to get IDs
-                    for email_meta in stored_emails:
-                        self.db.refresh(email_meta)
-                    
-                    all_stored_emails.extend(stored_emails)
-                    
-                    # Track total emails processed (don't update DB here - chunk storage is fast,
-                    # and updating would reset the fetch progress which confuses the UI)
-                    total_emails += len(email_chunk)
-                    logger.info(f"Stored chunk: {total_emails}/{len(emails)} emails (run_id={run_id})")
-                    print(f"[PRINT] Stored chunk: {total_emails}/{len(emails)} emails (run_id={run_id})")
+                # Store the batch analysis once; each result references it
+                summary = AnalysisSummary(
+                    account_id=self.account_id,
+                    analysis_run_id=run_id,
+                    range_start=range_start,
+                    range_end=range_end,
+                    encrypted_summary=self.enc_manager.encrypt(analysis_data),
+                    email_count=email_count
+                )
+                self.db.add(summary)
+                self.db.flush()
                 
-                # Analyze all emails together (analysis is more efficient on larger batches)
-                analysis_data = analyze_batch(emails)
+                # Sender cluster, subject cluster and category per email, streamed alongside the buffer
+                classifications = classify_batch(batch, analysis_data, email_categories, subject_clusters)
                 
-                # Store analysis results
-                for email_meta, email_data in zip(all_stored_emails, emails):
-                    # Determine clusters
-                    sender_cluster = self._get_sender_cluster(
-                        email_data['sender_email'],
-                        analysis_data['sender_patterns']
-                    )
-                    subject_cluster = self._get_subject_cluster(
-                        email_data.get('subject', ''),
-                        analysis_data['subject_clusters']
-                    )
-                    category = self._get_category(email_data, analysis_data['categories'])
-                    
-                    # Encrypt full analysis
+                # Store analysis results, flushing and detaching them page by page
+                result_page = []
+                for email_data, (sender_cluster, subject_cluster, category), custom_category_id in zip(
+                    buffer, classifications, custom_categories
+                ):
+                    # Encrypt this email's own fields only
                     encrypted_analysis = self.enc_manager.encrypt({
                         'sender_email': email_data['sender_email'],
                         'sender_name': email_data.get('sender_name'),
                         'subject': email_data.get('subject', ''),
                         'snippet': email_data.get('snippet', ''),
-                        'date_received': email_data['date_received'].isoformat(),
-                        'analysis': analysis_data
+                        'date_received': email_data['date_received'].isoformat()
                     })
                     
                     analysis_result = AnalysisResult(
-                        email_id=email_meta.id,
+                        email_id=email_data['email_id'],
                         analysis_run_id=run_id,
                         encrypted_analysis=encrypted_analysis,
+                        summary_id=summary.id,
                         sender_cluster=sender_cluster,
                         subject_cluster=subject_cluster,
-                        category=category
+                        category=category,
+                        custom_category_id=custom_category_id
                     )
                     self.db.add(analysis_result)
-                    # Track email IDs for potential revert
-                    self.processed_email_ids.append(email_meta.id)
+                    result_page.append(analysis_result)
+                    if len(result_page) >= RESULT_PAGE_SIZE:
+                        self._flush_results(result_page)
+                        result_page = []
+                self._flush_results(result_page)
+                # Fold this range into the account-wide state and the daily rollups in the same transaction
+                self.account_aggregates.merge_delta(aggregates)
+                self.rollups.add(batch_counts(batch, email_categories))
+                self.stats.bump_version()
                 
                 self.db.commit()
-                logger.info(f"Committed analysis results for {len(emails)} emails")
-                print(f"[PRINT] Committed analysis results for {len(emails)} emails")
+                buffer.close()
+                progress_registry.update(run_id, stage="finalizing")
+                logger.info(f"Committed analysis results for {email_count} emails")
+                print(f"[PRINT] Committed analysis results for {email_count} emails")
                 
                 # Note: total_emails was already updated after storing emails, before analysis
                 # So we don't need to update it again here
                 
                 # Mark range as processed
                 try:
-                    logger.info(f"Marking range as processed: {range_start} to {range_end}, emails: {len(emails)}")
-                    print(f"[PRINT] Marking range as processed: {range_start} to {range_end}, emails: {len(emails)}")
-                    self.date_tracker.mark_range_processed(range_start, range_end, len(emails))
+                    logger.info(f"Marking range as processed: {range_start} to {range_end}, emails: {email_count}")
+                    print(f"[PRINT] Marking range as processed: {range_start} to {range_end}, emails: {email_count}")
+                    self.date_tracker.mark_range_processed(range_start, range_end, email_count)
                     processed_ranges_in_this_run.append((range_start, range_end))
+                    self.processed_ranges.append((range_start, range_end))
+                    self.checkpoints.clear(range_start, range_end)
                     logger.info(f"Successfully marked range as processed")
                     print(f"[PRINT] Successfully marked range as processed")
                 except Exception as e:
@@ -391,43 +443,148 @@ class AnalysisService:
                     logger.error(f"ERROR: Failed to rollback processed date ranges: {rollback_e}", exc_info=True)
                     print(f"ERROR: Failed to rollback processed date ranges: {rollback_e}")
             raise  # Re-raise the original exception
+        finally:
+            if buffer is not None:
+                buffer.close()
     
-    def _get_sender_cluster(self, sender_email: str, sender_patterns: Dict) -> str:
-        """Get sender cluster identifier"""
-        top_senders = sender_patterns.get('top_senders', [])
-        for idx, sender_info in enumerate(top_senders[:10]):
-            if sender_info['email'] == sender_email:
-                return f"sender_top_{idx + 1}"
-        return "sender_other"
+    def _known_message_index(self) -> KnownMessageIndex:
+        """Message IDs stored for the account when this run first fetched (built once per run)."""
+        if self._known_ids is None:
+            self._known_ids = KnownMessageIndex.build(self.db, self.account_id)
+        return self._known_ids
     
-    def _get_subject_cluster(self, subject: str, subject_clusters: List[Dict]) -> str:
-        """Get subject cluster identifier"""
-        for cluster in subject_clusters:
-            if subject in cluster.get('subjects', []):
-                return f"subject_cluster_{cluster['cluster_id']}"
-        if len(subject_clusters) == 1:
-            return f"subject_cluster_{subject_clusters[0]['cluster_id']}"
-        return "subject_unclustered"
+    def _flush_results(self, results: List[AnalysisResult]) -> None:
+        """Write a page of pending results and detach them so the identity map stays small."""
+        if not results:
+            return
+        self.db.flush()
+        for result in results:
+            self.db.expunge(result)
     
-    def _get_category(self, email_data: Dict, categories: Dict) -> str:
-        """Get email category"""
-        # Rule-based category (aligned with email_batch_analysis heuristics)
-        subject = (email_data.get('subject', '') or '').lower()
-        sender = (email_data.get('sender_email', '') or '').lower()
+    def _store_email_chunk(self, email_chunk: List[Dict]) -> List[Tuple[Dict, int]]:
+        """
+        Insert metadata for new emails in the chunk; returns (email_data, email_id) pairs.
+        The EmailMetadata objects are detached afterwards, so nothing accumulates in the session.
+        """
+        # Store email metadata for this chunk
+        identities = [normalize_sender(email_data['sender_email']) for email_data in email_chunk]
+        # Account counters are updated in the chunk's transaction; senders are checked before inserting
+        stats = self.stats.get_or_refresh()
+        unseen_senders = self.stats.new_senders(identity.address for identity in identities)
+        inserted_senders = []
+        inserted_dates = []
+        stored = []
+        for email_data, identity in zip(email_chunk, identities):
+            # Check if email already exists
+            existing = self.db.query(EmailMetadata).filter(
+                EmailMetadata.message_id == email_data['message_id'],
+                EmailMetadata.account_id == self.account_id
+            ).first()
+            
+            if existing:
+                stored.append((email_data, existing))
+                continue
+            
+            # Create new metadata
+            email_meta = EmailMetadata(
+                account_id=self.account_id,
+                message_id=email_data['message_id'],
+                sender_email=email_data['sender_email'],
+                sender_name=email_data.get('sender_name'),
+                sender_normalized=identity.address,
+                sender_domain=identity.domain,
+                sender_registrable_domain=identity.registrable_domain,
+                subject=email_data.get('subject', ''),
+                date_received=email_data['date_received']
+            )
+            self.db.add(email_meta)
+            stored.append((email_data, email_meta))
+            inserted_senders.append((identity.address, email_data.get('sender_name')))
+            inserted_dates.append(email_data['date_received'])
+        self.stats.record_emails(
+            stats, inserted_dates, len(unseen_senders & {sender for sender, _ in inserted_senders})
+        )
+        self.sender_stats.add(inserted_senders)
+        self.sender_sketches.add(
+            (sender, received) for (sender, _), received in zip(inserted_senders, inserted_dates)
+        )
         
-        if any(kw in subject for kw in ['notification', 'alert', 'reminder']):
-            return 'notifications'
-        elif any(kw in subject or kw in sender for kw in ['newsletter', 'digest', 'unsubscribe']):
-            return 'newsletters'
-        elif any(kw in sender for kw in ['facebook', 'twitter', 'linkedin']):
-            return 'social'
-        elif any(kw in subject or kw in sender for kw in ['order', 'purchase', 'shipping']):
-            return 'shopping'
-        elif any(kw in subject for kw in ['meeting', 'calendar', 'team']):
-            return 'work'
-        elif '@' in sender and not any(kw in sender for kw in ['noreply', 'no-reply']):
-            return 'personal'
-        return 'other'
+        # Commit this chunk with error handling for race conditions
+        try:
+            self.db.commit()
+            logger.info(f"Committed chunk: {len(stored)} email metadata records")
+            print(f"[PRINT] Committed chunk: {len(stored)} emails")
+        except IntegrityError as e:
+            # Handle race condition: another process may have inserted the same email
+            logger.warning(f"IntegrityError during email commit (likely race condition): {e}")
+            print(f"[PRINT] IntegrityError during email commit (likely race condition): {e}")
+            self.db.rollback()
+            
+            # Re-fetch existing emails that may have been inserted by another process
+            # (the counter update was rolled back with them; recount what was committed)
+            self.stats.refresh()
+            self.sender_stats.rebuild()
+            self.sender_sketches.rebuild()
+            self.db.commit()
+            stored = []
+            for email_data in email_chunk:
+                existing = self.db.query(EmailMetadata).filter(
+                    EmailMetadata.message_id == email_data['message_id'],
+                    EmailMetadata.account_id == self.account_id
+                ).first()
+                
+                if existing:
+                    stored.append((email_data, existing))
+                else:
+                    # Try to insert again (shouldn't happen, but handle gracefully)
+                    logger.warning(f"Email {email_data['message_id']} not found after rollback, skipping")
+                    print(f"[PRINT] Email {email_data['message_id']} not found after rollback, skipping")
+        
+        # Read IDs (reloads the committed rows), then detach
+        pairs = []
+        for email_data, email_meta in stored:
+            self.db.refresh(email_meta)
+            pairs.append((email_data, email_meta.id))
+        for _, email_meta in stored:
+            if email_meta in self.db:
+                self.db.expunge(email_meta)
+        return pairs
+    
+    def _load_unanalyzed_emails(
+        self,
+        range_start: datetime,
+        range_end: datetime,
+        exclude_ids: set
+    ) -> Iterator[Dict]:
+        """Stored emails in [range_start, range_end) without analysis results (left by a failed attempt)."""
+        # Plain column rows: nothing enters the identity map
+        rows = self.db.query(
+            EmailMetadata.id,
+            EmailMetadata.message_id,
+            EmailMetadata.sender_email,
+            EmailMetadata.sender_name,
+            EmailMetadata.subject,
+            EmailMetadata.date_received
+        ).outerjoin(
+            AnalysisResult, AnalysisResult.email_id == EmailMetadata.id
+        ).filter(
+            EmailMetadata.account_id == self.account_id,
+            EmailMetadata.date_received >= range_start,
+            EmailMetadata.date_received < range_end,
+            AnalysisResult.id == None
+        ).yield_per(RESULT_PAGE_SIZE)
+        for row in rows:
+            if row.id in exclude_ids:
+                continue
+            yield {
+                'message_id': row.message_id,
+                'sender_email': row.sender_email,
+                'sender_name': row.sender_name,
+                'subject': row.subject or '',
+                'date_received': row.date_received,
+                'snippet': '',
+                'email_id': row.id
+            }
     
     def revert_run_changes(self):
         """Revert changes made by this analysis run"""
@@ -438,7 +595,8 @@ class AnalysisService:
         print(f"[PRINT] Reverting changes for run {self.run_id}")
         
         try:
-            # Delete analysis results created by this run
+            # Delete analysis results created by this run (and their rollup counts)
+            self.rollups.subtract_results(AnalysisResult.analysis_run_id == self.run_id)
             analysis_results = self.db.query(AnalysisResult).filter(
                 AnalysisResult.analysis_run_id == self.run_id
             ).all()
@@ -448,27 +606,48 @@ class AnalysisService:
                 email_ids_with_results.add(ar.email_id)
                 self.db.delete(ar)
             
-            # Delete emails that were created during this run and have no other analysis results
-            if self.processed_email_ids:
-                for email_id in self.processed_email_ids:
-                    if email_id in email_ids_with_results:
-                        # Check if this email has any other analysis results
-                        other_results = self.db.query(AnalysisResult).filter(
-                            AnalysisResult.email_id == email_id,
-                            AnalysisResult.analysis_run_id != self.run_id
-                        ).count()
-                        
-                        if other_results == 0:
-                            # This email was only analyzed by this run, delete it
-                            email = self.db.query(EmailMetadata).filter(
-                                EmailMetadata.id == email_id
-                            ).first()
-                            if email:
-                                self.db.delete(email)
+            # Ranges the run analyzed, from its summaries (a fresh service has no processed_ranges)
+            run_ranges = set(self.processed_ranges)
+            run_ranges.update(
+                (summary.range_start, summary.range_end)
+                for summary in self.db.query(AnalysisSummary.range_start, AnalysisSummary.range_end).filter(
+                    AnalysisSummary.analysis_run_id == self.run_id,
+                    AnalysisSummary.range_start.isnot(None),
+                    AnalysisSummary.range_end.isnot(None)
+                )
+            )
+            self.db.query(AnalysisSummary).filter(
+                AnalysisSummary.analysis_run_id == self.run_id
+            ).delete(synchronize_session=False)
+            
+            # Delete emails analyzed by this run that have no other analysis results
+            # (found by run id, so a fresh service for the run reverts the same emails)
+            for email_id in email_ids_with_results:
+                # Check if this email has any other analysis results
+                other_results = self.db.query(AnalysisResult).filter(
+                    AnalysisResult.email_id == email_id,
+                    AnalysisResult.analysis_run_id != self.run_id
+                ).count()
+                
+                if other_results == 0:
+                    # This email was only analyzed by this run, delete it
+                    email = self.db.query(EmailMetadata).filter(
+                        EmailMetadata.id == email_id
+                    ).first()
+                    if email:
+                        self.db.delete(email)
             
             # Revert processed date ranges
-            if self.processed_ranges:
-                self.date_tracker.remove_ranges(self.processed_ranges)
+            if run_ranges:
+                self.date_tracker.remove_ranges(sorted(run_ranges))
+            
+            # Checkpoints advanced by this run point past emails that are being deleted
+            self.checkpoints.clear_for_run(self.run_id)
+            # Deltas merged by this run are being removed
+            self.account_aggregates.invalidate()
+            self.stats.refresh()
+            self.sender_stats.rebuild()
+            self.sender_sketches.rebuild()
             
             self.db.commit()
             logger.info(f"Successfully reverted changes for run {self.run_id}")
@@ -0,0 +1,158 @@
+"""
+Bounded-memory streaming top-k (Space-Saving) for senders and domains.
+
+``SpaceSaving(capacity)`` keeps at most ``capacity`` (item, count, error) counters.
+An unmonitored item evicts the smallest counter and inherits its count as error,
+so for every monitored item
+
+    count - error <= true count <= count
+
+and any item whose true count exceeds total / capacity is monitored. When the
+summary is full, an unmonitored item's true count is at most ``floor`` (the
+smallest count). Summaries merge (Agarwal et al., "Mergeable Summaries"): each
+side contributes its floor for items it does not monitor, then the largest
+``capacity`` counters are kept, with the same guarantees over the union.
+"""
+import heapq
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Counters per sketch; the reported error of any count is at most total / capacity
+DEFAULT_CAPACITY = 1000
+
+
+class TopItem(NamedTuple):
+    item: str
+    count: int  # Upper bound on the true count
+    error: int  # count - error is a lower bound
+
+
+class SpaceSaving:
+    """Space-Saving top-k summary over string items with integer weights."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        # (count, item) entries; stale ones (count no longer current) are skipped on pop
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def full(self) -> bool:
+        return len(self.counts) >= self.capacity
+
+    @property
+    def floor(self) -> int:
+        """Upper bound on the true count of any unmonitored item."""
+        return min(self.counts.values()) if self.full else 0
+
+    def update(self, item: str, weight: int = 1) -> None:
+        self.total += weight
+        if item in self.counts:
+            self.counts[item] += weight
+        elif not self.full:
+            self.counts[item] = weight
+            self.errors[item] = 0
+        else:
+            floor_item, floor_count = self._pop_min()
+            del self.counts[floor_item]
+            del self.errors[floor_item]
+            self.counts[item] = floor_count + weight
+            self.errors[item] = floor_count
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def _pop_min(self) -> Tuple[str, int]:
+        while True:
+            count, item = self._heap[0]
+            if self.counts.get(item) == count:
+                return item, count
+            heapq.heappop(self._heap)
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(count, item) for item, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, limit: Optional[int] = None) -> List[TopItem]:
+        """Monitored items by descending count (ties by item)."""
+        ranked = sorted(self.counts.items(), key=lambda entry: (-entry[1], entry[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [TopItem(item, count, self.errors[item]) for item, count in ranked]
+
+    @classmethod
+    def from_counts(cls, counts: Dict[str, int], capacity: int = DEFAULT_CAPACITY) -> "SpaceSaving":
+        """
+        Summary of exact counts (one batch): the largest ``capacity`` counts with zero error.
+        Dropped items are no larger than the smallest kept count, so floor still bounds them.
+        """
+        sketch = cls(capacity)
+        sketch.total = sum(counts.values())
+        kept = heapq.nlargest(capacity, counts.items(), key=lambda entry: (entry[1], entry[0]))
+        for item, count in kept:
+            sketch.counts[item] = count
+            sketch.errors[item] = 0
+        sketch._rebuild_heap()
+        return sketch
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Summary of both streams; neither operand is modified."""
+        capacity = max(self.capacity, other.capacity)
+        self_floor, other_floor = self.floor, other.floor
+        combined = {}
+        for item in self.counts.keys() | other.counts.keys():
+            count = self.counts.get(item, self_floor) + other.counts.get(item, other_floor)
+            error = self.errors.get(item, self_floor) + other.errors.get(item, other_floor)
+            combined[item] = (count, error)
+        kept = heapq.nlargest(capacity, combined.items(), key=lambda entry: (entry[1][0], entry[0]))
+
+        merged = SpaceSaving(capacity)
+        merged.total = self.total + other.total
+        for item, (count, error) in kept:
+            merged.counts[item] = count
+            merged.errors[item] = error
+        merged._rebuild_heap()
+        return merged
+
+    def to_state(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "items": [[item, count, self.errors[item]] for item, count in self.counts.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state: Optional[Dict], capacity: int = DEFAULT_CAPACITY) -> "SpaceSaving":
+        if not state:
+            return cls(capacity)
+        sketch = cls(state.get("capacity", capacity))
+        sketch.total = state.get("total", 0)
+        for item, count, error in state.get("items", []):
+            sketch.counts[item] = count
+            sketch.errors[item] = error
+        sketch._rebuild_heap()
+        return sketch
+
+    def report(self, limit: int) -> Dict:
+        """Top items with bounds, for API responses."""
+        return {
+            "items": [
+                {
+                    "value": entry.item,
+                    "count": entry.count,
+                    "error": entry.error,
+                    "min_count": entry.count - entry.error,
+                }
+                for entry in self.top(limit)
+            ],
+            "total": self.total,
+            "capacity": self.capacity,
+            # Any item not listed in the summary has a true count of at most this
+            "unmonitored_max_count": self.floor,
+            # Worst-case overcount of any reported count
+            "max_error": self.total // self.capacity,
+        }
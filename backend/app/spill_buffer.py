@@ -0,0 +1,153 @@
+"""
+Columnar email record buffer with a memory budget and on-disk spill.
+
+The analysis service keeps every email of a range until the batch has been
+analyzed. ``ColumnarSpillBuffer`` holds those records column-wise in memory and,
+once the estimated size passes the budget, appends the columns to temporary
+files (one newline-delimited JSON file per column) and starts over in memory.
+Iterating yields the records in insertion order, disk segment first, so callers
+can make several passes without holding the whole range in RAM.
+"""
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Columns kept for each analyzed email (email_id is the stored EmailMetadata.id; category is
+# set when the connector's parse stage already classified the email)
+EMAIL_COLUMNS = (
+    "message_id",
+    "sender_email",
+    "sender_name",
+    "subject",
+    "date_received",
+    "snippet",
+    "email_id",
+    "category",
+)
+
+# Rough per-record overhead of the dicts/objects rebuilt around the column values
+_RECORD_OVERHEAD_BYTES = 400
+
+DEFAULT_MEMORY_BUDGET_MB = int(os.getenv("MAILMIND_ANALYSIS_MEMORY_MB", "256"))
+
+
+def _estimate_bytes(record: Dict) -> int:
+    size = _RECORD_OVERHEAD_BYTES
+    for value in record.values():
+        if isinstance(value, str):
+            size += sys.getsizeof(value)
+    return size
+
+
+def _encode(value) -> str:
+    if isinstance(value, datetime):
+        return json.dumps({"$dt": value.isoformat()})
+    return json.dumps(value)
+
+
+def _decode(line: str):
+    value = json.loads(line)
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+class ColumnarSpillBuffer:
+    """Append-only, re-iterable record store bounded by memory_budget_bytes."""
+
+    def __init__(
+        self,
+        memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024,
+        columns=EMAIL_COLUMNS,
+        spill_dir: Optional[str] = None,
+    ):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.columns = tuple(columns)
+        self._spill_parent = spill_dir
+        self._spill_path: Optional[str] = None
+        self._memory: Dict[str, List] = {c: [] for c in self.columns}
+        self._memory_bytes = 0
+        self._spilled = 0
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def spilled(self) -> int:
+        """Number of records currently on disk."""
+        return self._spilled
+
+    def append(self, record: Dict) -> None:
+        for column in self.columns:
+            self._memory[column].append(record.get(column))
+        self._length += 1
+        self._memory_bytes += _estimate_bytes(record)
+        if self._memory_bytes > self.memory_budget_bytes:
+            self._spill()
+
+    def extend(self, records) -> None:
+        for record in records:
+            self.append(record)
+
+    def _spill(self) -> None:
+        count = len(self._memory[self.columns[0]])
+        if not count:
+            return
+        if self._spill_path is None:
+            self._spill_path = tempfile.mkdtemp(prefix="mailmind_spill_", dir=self._spill_parent)
+        for column in self.columns:
+            with open(os.path.join(self._spill_path, column), "a", encoding="utf-8") as f:
+                for value in self._memory[column]:
+                    f.write(_encode(value))
+                    f.write("\n")
+            self._memory[column] = []
+        self._spilled += count
+        logger.info(
+            f"Spilled {count} records to disk ({self._spilled} on disk, "
+            f"budget {self.memory_budget_bytes // (1024 * 1024)} MB)"
+        )
+        self._memory_bytes = 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        if self._spilled:
+            handles = [
+                open(os.path.join(self._spill_path, column), encoding="utf-8")
+                for column in self.columns
+            ]
+            try:
+                for lines in zip(*handles):
+                    yield {
+                        column: _decode(line)
+                        for column, line in zip(self.columns, lines)
+                    }
+            finally:
+                for handle in handles:
+                    handle.close()
+        memory_columns = [self._memory[column] for column in self.columns]
+        for values in zip(*memory_columns):
+            yield dict(zip(self.columns, values))
+
+    def close(self) -> None:
+        """Remove spill files and drop in-memory records."""
+        if self._spill_path:
+            shutil.rmtree(self._spill_path, ignore_errors=True)
+            self._spill_path = None
+        self._memory = {c: [] for c in self.columns}
+        self._memory_bytes = 0
+        self._spilled = 0
+        self._length = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,141 @@
+"""
+Near-duplicate subject clustering with MinHash and LSH banding.
+
+Subjects are normalized (case, reply/forward prefixes, digit runs, punctuation),
+split into word shingles and summarized by a MinHash signature. Signatures
+are cut into bands; subjects sharing any band bucket are candidates, and a
+candidate is accepted when the estimated Jaccard similarity to the cluster's
+leader signature reaches SIMILARITY_THRESHOLD. Each unique normalized subject
+costs one signature plus a few bucket lookups, so clustering is near-linear.
+
+Shingle hashes come from salted BLAKE2b and band keys from fixed arithmetic, so
+signatures and band keys are stable across processes and can be persisted (app.subject_clusters).
+"""
+import hashlib
+import re
+import struct
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+# Estimated Jaccard similarity needed to join an existing cluster
+SIMILARITY_THRESHOLD = 0.5
+# Candidate clusters verified per subject (most band hits first)
+MAX_CANDIDATES = 20
+
+# Each shingle is hashed to NUM_PERMUTATIONS independent 32-bit values: 16 per salted BLAKE2b digest
+_VALUES_PER_DIGEST = 16
+_DIGEST_SALTS = tuple(
+    i.to_bytes(16, "little") for i in range(NUM_PERMUTATIONS // _VALUES_PER_DIGEST)
+)
+_DIGEST_LAYOUT = struct.Struct(f"<{_VALUES_PER_DIGEST}I")
+# Band rows are folded into one 64-bit key by polynomial hashing with this odd multiplier
+_BAND_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+# Reply/forward markers stripped from the start of subjects
+REPLY_PREFIXES = ("re", "fw", "fwd", "aw", "sv", "tr")
+_REPLY_PREFIX = re.compile(r"^(?:(?:%s)\s*(?:\[\d+\])?\s*:\s*)+" % "|".join(REPLY_PREFIXES))
+_DIGITS = re.compile(r"\d+")
+_NON_WORD = re.compile(r"[^\w#]+")
+
+
+@lru_cache(maxsize=65536)
+def normalize_subject(subject: Optional[str]) -> str:
+    """Lowercase, drop Re:/Fwd: prefixes, fold digit runs to '#', collapse punctuation and spaces."""
+    text = (subject or "").lower().strip()
+    text = _REPLY_PREFIX.sub("", text)
+    text = _DIGITS.sub("#", text)
+    text = _NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+def shingles(normalized: str) -> set:
+    """
+    Word shingles of a normalized subject. Subjects are short, so single words keep the
+    set small (one hash row per word) while template variants still share most of it.
+    """
+    return set(normalized.split()) or {""}
+
+
+@lru_cache(maxsize=1 << 17)
+def _shingle_values(shingle: str) -> Tuple[int, ...]:
+    """The shingle's value under each of the NUM_PERMUTATIONS hash functions."""
+    data = shingle.encode("utf-8")
+    values = ()
+    for salt in _DIGEST_SALTS:
+        values += _DIGEST_LAYOUT.unpack(hashlib.blake2b(data, digest_size=64, salt=salt).digest())
+    return values
+
+
+def minhash(normalized: str) -> Tuple[int, ...]:
+    """MinHash signature: per hash function, the minimum value over the subject's shingles."""
+    return tuple(map(min, zip(*[_shingle_values(s) for s in shingles(normalized)])))
+
+
+def band_keys(signature: Tuple[int, ...]) -> List[int]:
+    """One signed 64-bit bucket key per band (band index is mixed into the key)."""
+    keys = []
+    for band in range(BANDS):
+        key = band + 1
+        for value in signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]:
+            key = (key * _BAND_MULTIPLIER + value) & _MASK64
+        keys.append(key - (1 << 64) if key >= (1 << 63) else key)
+    return keys
+
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTATIONS
+
+
+class LeaderIndex:
+    """In-memory LSH buckets over cluster leader signatures."""
+
+    def __init__(self):
+        self.buckets: Dict[int, List[int]] = {}
+        self.signatures: Dict[int, Tuple[int, ...]] = {}
+
+    def add(self, cluster_id: int, signature: Tuple[int, ...], keys: List[int]) -> None:
+        self.signatures[cluster_id] = signature
+        for key in keys:
+            self.buckets.setdefault(key, []).append(cluster_id)
+
+    def match(self, signature: Tuple[int, ...], keys: List[int]) -> Optional[int]:
+        """Most similar cluster sharing a bucket, if it clears SIMILARITY_THRESHOLD."""
+        hits: Dict[int, int] = {}
+        for key in keys:
+            for cluster_id in self.buckets.get(key, ()):
+                hits[cluster_id] = hits.get(cluster_id, 0) + 1
+        if not hits:
+            return None
+        candidates = sorted(hits, key=lambda cid: (-hits[cid], cid))[:MAX_CANDIDATES]
+        best_id, best_score = None, SIMILARITY_THRESHOLD
+        for cluster_id in candidates:
+            score = similarity(signature, self.signatures[cluster_id])
+            if score >= best_score and (best_id is None or score > best_score):
+                best_id, best_score = cluster_id, score
+        return best_id
+
+
+def cluster_subjects(subjects: Iterable[str]) -> Dict[str, int]:
+    """
+    normalized subject -> cluster id (0, 1, ... in order of first appearance) for a batch,
+    without persistence. The first subject of each cluster is its leader.
+    """
+    index = LeaderIndex()
+    clusters: Dict[str, int] = {}
+    for subject in subjects:
+        normalized = normalize_subject(subject)
+        if normalized in clusters:
+            continue
+        signature = minhash(normalized)
+        keys = band_keys(signature)
+        cluster_id = index.match(signature, keys)
+        if cluster_id is None:
+            cluster_id = len(index.signatures)
+            index.add(cluster_id, signature, keys)
+        clusters[normalized] = cluster_id
+    return clusters
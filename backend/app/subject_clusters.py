@@ -0,0 +1,98 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Tuple
+import logging
+from app.database import SubjectCluster, SubjectClusterBand
+from app.subject_clustering import LeaderIndex, band_keys, minhash, normalize_subject
+
+logger = logging.getLogger(__name__)
+
+# Band keys per IN (...) lookup, well under SQLite's bound-parameter limit
+_LOOKUP_CHUNK = 500
+
+
+class SubjectClusterStore:
+    """
+    Stable subject cluster IDs for one account.
+
+    Clusters and their LSH band buckets are persisted, so a subject seen in a later
+    run joins the cluster its near-duplicates were assigned to before; only subjects
+    matching no stored leader found new clusters. Only the buckets touched by the
+    batch are loaded. Flushes but leaves the commit to the caller.
+    """
+
+    def __init__(self, db: Session, account_id: int):
+        self.db = db
+        self.account_id = account_id
+
+    def _load_candidates(self, keys: Iterable[int]) -> LeaderIndex:
+        """Stored clusters sharing any of ``keys``, as an in-memory LeaderIndex."""
+        index = LeaderIndex()
+        keys = list(keys)
+        cluster_keys: Dict[int, List[int]] = {}
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            rows = self.db.query(SubjectClusterBand.band_key, SubjectClusterBand.cluster_id).filter(
+                SubjectClusterBand.account_id == self.account_id,
+                SubjectClusterBand.band_key.in_(keys[start:start + _LOOKUP_CHUNK])
+            )
+            for band_key, cluster_id in rows:
+                cluster_keys.setdefault(cluster_id, []).append(band_key)
+
+        cluster_ids = list(cluster_keys)
+        for start in range(0, len(cluster_ids), _LOOKUP_CHUNK):
+            rows = self.db.query(SubjectCluster.id, SubjectCluster.signature).filter(
+                SubjectCluster.id.in_(cluster_ids[start:start + _LOOKUP_CHUNK])
+            )
+            for cluster_id, signature in rows:
+                index.add(cluster_id, tuple(signature), cluster_keys[cluster_id])
+        return index
+
+    def assign(self, subjects: Iterable[str]) -> Dict[str, int]:
+        """normalized subject -> stored cluster id for every subject, creating clusters as needed."""
+        batch: Dict[str, Tuple[str, Tuple[int, ...], List[int]]] = {}
+        for subject in subjects:
+            normalized = normalize_subject(subject)
+            if normalized not in batch:
+                signature = minhash(normalized)
+                batch[normalized] = (subject or "", signature, band_keys(signature))
+        if not batch:
+            return {}
+
+        index = self._load_candidates({key for _, _, keys in batch.values() for key in keys})
+
+        # New clusters get temporary negative ids so later subjects of the batch can join them
+        assignments: Dict[str, int] = {}
+        new_clusters: Dict[int, Tuple[SubjectCluster, List[int]]] = {}
+        for normalized, (subject, signature, keys) in batch.items():
+            cluster_id = index.match(signature, keys)
+            if cluster_id is None:
+                cluster_id = -(len(new_clusters) + 1)
+                cluster = SubjectCluster(
+                    account_id=self.account_id,
+                    representative=subject,
+                    signature=list(signature)
+                )
+                new_clusters[cluster_id] = (cluster, keys)
+                index.add(cluster_id, signature, keys)
+            assignments[normalized] = cluster_id
+
+        if new_clusters:
+            self.db.add_all(cluster for cluster, _ in new_clusters.values())
+            self.db.flush()
+            self.db.bulk_insert_mappings(SubjectClusterBand, [
+                {'account_id': self.account_id, 'band_key': key, 'cluster_id': cluster.id}
+                for cluster, keys in new_clusters.values()
+                for key in keys
+            ])
+            real_ids = {temp_id: cluster.id for temp_id, (cluster, _) in new_clusters.items()}
+            assignments = {
+                normalized: real_ids.get(cluster_id, cluster_id)
+                for normalized, cluster_id in assignments.items()
+            }
+            for cluster, _ in new_clusters.values():
+                self.db.expunge(cluster)
+
+        logger.info(
+            f"Assigned {len(batch)} unique subjects to clusters for account {self.account_id} "
+            f"({len(new_clusters)} new clusters)"
+        )
+        return assignments
@@ -9,6 +9,7 @@ from dotenv import load_dotenv
 from app.database import init_db
 from app.routers import emails, analysis, insights, oauth
 from app.exceptions import MailMindException
+from app import parse_pool
 
 load_dotenv()
 
@@ -30,7 +31,7 @@ async def lifespan(app: FastAPI):
     init_db()
     yield
     # Shutdown
-    pass
+    parse_pool.shutdown()
 
 app = FastAPI(
     title="Mail Mind API",
@@ -0,0 +1,148 @@
+"""
+Merge-versus-rebuild check for the account-wide aggregates.
+
+Analyzes Gmail-style emails (timezone-aware ``date_received`` with several
+offsets, senders whose display name changes between emails) into a throwaway
+SQLite database through AnalysisService.analyze_date_range, one range at a time
+and not in date order, so the account state is built by merging deltas
+(app.account_aggregates). Then compares that state and its entry rows with
+what a rebuild from email_metadata stores. Exits with status 1 on any difference.
+
+Run (from backend/):
+  python3 -m scripts.check_account_aggregates
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+EMAILS = 240
+PAGE_SIZE = 40
+# Analyzed in this order: the later months first, then the earlier ones
+RANGES = (
+    (datetime(2024, 3, 1), datetime(2024, 5, 1)),
+    (datetime(2024, 1, 1), datetime(2024, 3, 1)),
+)
+OFFSETS = (timezone(timedelta(hours=-7)), timezone.utc, timezone(timedelta(hours=5, minutes=30)))
+SUBJECTS = ("Your order {n} has shipped", "Weekly digest #{n}", "Meeting notes", "Invoice {n} is ready")
+
+
+def _emails() -> list:
+    start = datetime(2024, 1, 1, 3, 0)
+    emails = []
+    for n in range(EMAILS):
+        sender = n % 23
+        emails.append({
+            "message_id": f"aggregates-check-{n}",
+            "sender_email": f"sender{sender}@example{sender % 5}.com",
+            # The same sender appears under different names
+            "sender_name": f"Sender {sender}" if n % 3 else f"S. {sender}",
+            "subject": SUBJECTS[n % len(SUBJECTS)].format(n=n),
+            "snippet": "",
+            # Received out of date order, as pages of a provider listing can be
+            "date_received": (start + timedelta(hours=(n * 37) % (24 * 120))).replace(tzinfo=OFFSETS[n % len(OFFSETS)]),
+        })
+    return emails
+
+
+class _Connector:
+    """In-memory connector returning the emails of a window in pages."""
+
+    def __init__(self, emails: list):
+        self.emails = emails
+
+    def _window(self, start: datetime, end: datetime) -> list:
+        from app.range_semantics import naive_utc_instant
+
+        return [email for email in self.emails if start <= naive_utc_instant(email["date_received"]) < end]
+
+    def get_email_count_by_date_range(self, start: datetime, end: datetime) -> int:
+        return len(self._window(start, end))
+
+    def fetch_emails_by_date_range(self, start, end, progress_callback=None, resume_cursor=None,
+                                   page_callback=None, known_ids=None, cancel_token=None):
+        emails = self._window(start, end)
+        for offset in range(0, len(emails), PAGE_SIZE):
+            page = [dict(email) for email in emails[offset:offset + PAGE_SIZE]]
+            if progress_callback:
+                progress_callback(offset + len(page), len(emails))
+            page_callback(page, str(offset + PAGE_SIZE) if offset + PAGE_SIZE < len(emails) else None)
+        return []
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp(prefix="mailmind-aggregates-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'aggregates.db')}"
+    os.environ.setdefault("ENCRYPTION_KEY", "aggregates-check-" + "0" * 15)
+
+    from app.account_aggregates import AccountAggregateStore  # noqa: E402
+    from app.database import (  # noqa: E402
+        AccountAggregateEntry,
+        AnalysisRun,
+        EmailAccount,
+        SessionLocal,
+        User,
+        init_db,
+    )
+    from app.services.analysis_service import AnalysisService  # noqa: E402
+
+    init_db()
+    db = SessionLocal()
+    try:
+        user = User(username="aggregates-check")
+        db.add(user)
+        db.flush()
+        account = EmailAccount(user_id=user.id, provider="gmail", email="aggregates@example.com",
+                               encrypted_credentials="-")
+        db.add(account)
+        db.commit()
+
+        connector = _Connector(_emails())
+        for start, end in RANGES:
+            run = AnalysisRun(user_id=user.id, account_id=account.id, start_date=start, end_date=end,
+                              status="processing")
+            db.add(run)
+            db.commit()
+            AnalysisService(db, user.id, account.id, run.id).analyze_date_range(connector, start, end)
+
+        def snapshot():
+            db.expire_all()
+            aggregates = store.load()
+            entries = {
+                (entry.kind, entry.key): (entry.count, entry.detail)
+                for entry in db.query(AccountAggregateEntry).filter(AccountAggregateEntry.account_id == account.id)
+            }
+            return {**aggregates.to_state(), "entries": entries}, aggregates.to_analysis()
+
+        store = AccountAggregateStore(db, user.id, account.id)
+        if store.load() is None:
+            print("no merged state stored")
+            sys.exit(1)
+        merged_state, merged_analysis = snapshot()
+        store.rebuild()
+        rebuilt_state, rebuilt_analysis = snapshot()
+        failures = 0
+        for field in rebuilt_state:
+            status = "ok" if merged_state.get(field) == rebuilt_state[field] else "MISMATCH"
+            failures += status != "ok"
+            print(f"{field:24} {status}")
+            if status != "ok":
+                print(f"    merged:  {str(merged_state.get(field))[:200]}")
+                print(f"    rebuilt: {str(rebuilt_state[field])[:200]}")
+        analysis_equal = merged_analysis == rebuilt_analysis
+        failures += not analysis_equal
+        print(f"{'analysis dict':24} {'ok' if analysis_equal else 'MISMATCH'}")
+    finally:
+        db.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Ingestion check for the per-account counters behind /summary.
+
+Stores Gmail-style emails (timezone-aware ``date_received``, as
+app.email_connectors.parsing returns them) into a throwaway SQLite database
+through AnalysisService._store_email_chunk, in several chunks committed one at a
+time and on an account that already holds emails, then compares the account's
+stats row with the expected counts and stored (wall clock) earliest/latest
+dates, and with the row ``refresh()`` recomputes from email_metadata. Exits with
+status 1 on any mismatch.
+
+Run (from backend/):
+  python3 -m scripts.check_account_stats
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+CHUNKS = 3
+CHUNK_SIZE = 50
+# Offsets of the sending servers; stored counters must not depend on them
+OFFSETS = (timezone(timedelta(hours=-7)), timezone.utc, timezone(timedelta(hours=5, minutes=30)))
+
+
+def _chunk(index: int) -> list:
+    start = datetime(2024, 3, 1, 12, 0)
+    emails = []
+    for i in range(CHUNK_SIZE):
+        n = index * CHUNK_SIZE + i
+        emails.append({
+            "message_id": f"stats-check-{n}",
+            "sender_email": f"sender{n % 17}@example.com",
+            "sender_name": f"Sender {n % 17}",
+            "subject": f"Subject {n}",
+            "date_received": (start + timedelta(hours=5 * n)).replace(tzinfo=OFFSETS[n % len(OFFSETS)]),
+        })
+    return emails
+
+
+def main() -> None:
+    workdir = tempfile.mkdtemp(prefix="mailmind-stats-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'stats.db')}"
+    os.environ.setdefault("ENCRYPTION_KEY", "stats-check-" + "0" * 20)
+
+    from app.account_stats import AccountStatsStore  # noqa: E402
+    from app.database import AnalysisRun, EmailAccount, SessionLocal, User, init_db  # noqa: E402
+    from app.range_semantics import stored_wall_clock  # noqa: E402
+    from app.services.analysis_service import AnalysisService  # noqa: E402
+
+    init_db()
+    db = SessionLocal()
+    try:
+        user = User(username="stats-check")
+        db.add(user)
+        db.flush()
+        account = EmailAccount(user_id=user.id, provider="gmail", email="stats@example.com",
+                               encrypted_credentials="-")
+        db.add(account)
+        db.flush()
+        run = AnalysisRun(user_id=user.id, account_id=account.id, start_date=datetime(2024, 1, 1),
+                          end_date=datetime(2025, 1, 1), status="processing")
+        db.add(run)
+        db.commit()
+
+        chunks = [_chunk(index) for index in range(CHUNKS)]
+        # The first chunk is stored by an earlier run, so the next run starts on a populated account
+        AnalysisService(db, user.id, account.id, run.id)._store_email_chunk(chunks[0])
+        service = AnalysisService(db, user.id, account.id, run.id)
+        for chunk in chunks[1:]:
+            service._store_email_chunk(chunk)
+        # Re-storing a chunk inserts nothing
+        service._store_email_chunk(chunks[-1])
+
+        db.expire_all()
+        stats = AccountStatsStore(db, account.id).get()
+        emails = [email for chunk in chunks for email in chunk]
+        dates = [stored_wall_clock(email["date_received"]) for email in emails]
+        expected = {
+            "email_count": len(emails),
+            "sender_count": len({email["sender_email"] for email in emails}),
+            "earliest_date": min(dates),
+            "latest_date": max(dates),
+        }
+        incremental = {field: getattr(stats, field) for field in expected}
+        refreshed = AccountStatsStore(db, account.id).refresh()
+        failures = 0
+        for field, value in expected.items():
+            actual = incremental[field]
+            recomputed = getattr(refreshed, field)
+            status = "ok" if actual == value == recomputed else "MISMATCH"
+            failures += status != "ok"
+            print(f"{field:14} {status:8} stored={actual} refreshed={recomputed} expected={value}")
+    finally:
+        db.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
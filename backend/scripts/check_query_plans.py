@@ -0,0 +1,248 @@
+"""
+Query-plan regression check for the insights and run-listing endpoints.
+
+Seeds a throwaway SQLite database (schema from app.database) with a small
+account, calls each read endpoint and the category-filtered recount and
+custom-category reapply queries, records every SELECT they issue, and runs
+EXPLAIN QUERY PLAN on each. Fails (exit status 1) when a plan reads a table with
+a full scan ("SCAN <table>", also "SCAN <table> USING [COVERING] INDEX ...", a
+full pass in index order), i.e. a query that no index narrows. Scans of
+subqueries and CTE results are fine, as are full scans of tiny lookup tables
+listed in ALLOWED_SCANS.
+
+With --against the recorded queries are explained on another database instead
+(e.g. production after running scripts.migrate_composite_indexes), without
+writing to it.
+
+Run (from backend/):
+  python3 -m scripts.check_query_plans
+  python3 -m scripts.check_query_plans --verbose
+  python3 -m scripts.check_query_plans --against sqlite:///./data/mailmind.db
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+# Tables a full scan is acceptable for (empty here); name them with the reason
+ALLOWED_SCANS: dict = {}
+
+# "SCAN email_metadata", "SCAN email_metadata USING INDEX ..." (SQLite >= 3.36 wording)
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+EMAILS = 400
+SENDERS = 60
+
+
+def _seed(db) -> tuple:
+    """One user and account with emails, results and every derived store; returns (username, account_id)."""
+    from app.database import (
+        AnalysisResult,
+        AnalysisRun,
+        CustomCategory,
+        EmailAccount,
+        EmailMetadata,
+        ProcessedDateRange,
+        SubjectRule,
+        User,
+    )
+    from app.account_stats import AccountStatsStore
+    from app.daily_rollups import DailyRollupStore
+    from app.sender_identity import normalize_sender
+    from app.sender_sketches import SenderSketchStore
+    from app.sender_stats import SenderStatsStore
+
+    user = User(username="plan-check")
+    db.add(user)
+    db.flush()
+    account = EmailAccount(user_id=user.id, provider="gmail", email="plan@example.com", encrypted_credentials="-")
+    db.add(account)
+    db.flush()
+    start = datetime(2023, 1, 1)
+    run = AnalysisRun(user_id=user.id, account_id=account.id, start_date=start, end_date=datetime(2024, 1, 1),
+                      status="completed", created_at=start)
+    db.add(run)
+    db.flush()
+    categories = ("personal", "shopping", "newsletter", "work")
+    for i in range(EMAILS):
+        sender = f"sender{i % SENDERS}@domain{i % 7}.example.com"
+        identity = normalize_sender(sender)
+        email = EmailMetadata(
+            account_id=account.id,
+            message_id=f"plan-{i}",
+            sender_email=sender,
+            sender_name=f"Sender {i % SENDERS}",
+            sender_normalized=identity.address,
+            sender_domain=identity.domain,
+            sender_registrable_domain=identity.registrable_domain,
+            subject=f"Subject {i % 13}",
+            date_received=start + timedelta(hours=i * 13),
+        )
+        db.add(email)
+        db.flush()
+        db.add(AnalysisResult(
+            email_id=email.id,
+            analysis_run_id=run.id,
+            encrypted_analysis="-",
+            category=categories[i % len(categories)],
+        ))
+    db.add(ProcessedDateRange(account_id=account.id, start_date=start, end_date=datetime(2024, 1, 1),
+                              emails_count=EMAILS))
+    category = CustomCategory(user_id=user.id, name="Plan check")
+    db.add(category)
+    db.flush()
+    db.add(SubjectRule(user_id=user.id, custom_category_id=category.id, subject_contains="subject 1"))
+    DailyRollupStore(db, account.id).rebuild()
+    AccountStatsStore(db, account.id).refresh()
+    SenderStatsStore(db, account.id).rebuild()
+    SenderSketchStore(db, account.id).rebuild()
+    db.commit()
+    return user.username, account.id, category.id
+
+
+def _request():
+    from starlette.requests import Request
+
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+
+
+def _exercise(db, username: str, account_id: int, category_id: int) -> None:
+    """Call every read endpoint once (senders and runs also on their second page)."""
+    import json
+
+    from app.routers import analysis, insights
+
+    def body(response):
+        return json.loads(response.body) if hasattr(response, "body") else response
+
+    calls = [
+        lambda: insights.get_summary(request=_request(), username=username, db=db),
+        lambda: insights.get_account_summary(request=_request(), username=username, account_id=account_id, db=db),
+        lambda: insights.get_top_senders(request=_request(), username=username, account_id=account_id, db=db),
+        lambda: insights.get_distinct_senders(request=_request(), username=username, start_month="2023-03",
+                                              end_month="2023-06", db=db),
+        lambda: insights.get_distinct_senders(request=_request(), username=username, exact=True, db=db),
+        lambda: insights.get_category_insights(
+            request=_request(), username=username, account_id=account_id, db=db),
+        lambda: insights.get_category_domains(request=_request(), username=username, account_id=account_id,
+                                              category="shopping", db=db),
+        lambda: insights.get_frequency_insights(request=_request(), username=username, account_id=account_id, db=db),
+        lambda: insights.get_yearly_frequency_insights(request=_request(), username=username,
+                                                       account_id=account_id, db=db),
+        lambda: insights.get_frequency_heatmap(request=_request(), username=username, account_id=account_id, db=db),
+        lambda: insights.get_frequency_seasonality(request=_request(), username=username,
+                                                   account_id=account_id, db=db),
+        lambda: insights.get_processed_ranges(username=username, account_id=account_id, db=db),
+        lambda: insights.get_processed_range_gaps(username=username, account_id=account_id,
+                                                  start_date=datetime(2022, 6, 1), end_date=datetime(2024, 6, 1),
+                                                  db=db),
+        lambda: insights.get_custom_category_breakdown(request=_request(), username=username, db=db),
+        lambda: insights.get_diagnostic_info(username=username, account_id=account_id, db=db),
+        lambda: insights.list_custom_categories(username=username, db=db),
+        lambda: insights.list_subject_rules(username=username, category_id=category_id, db=db),
+    ]
+    for call in calls:
+        asyncio.run(call())
+
+    page = body(asyncio.run(insights.get_sender_insights(request=_request(), username=username,
+                                                         account_id=account_id, limit=10, db=db)))
+    asyncio.run(insights.get_sender_insights(request=_request(), username=username, account_id=account_id,
+                                             limit=10, cursor=page["next_cursor"], db=db))
+    runs = asyncio.run(analysis.list_analysis_runs(username=username, account_id=account_id, limit=1, db=db))
+    if runs["next_cursor"]:
+        asyncio.run(analysis.list_analysis_runs(username=username, account_id=account_id, limit=1,
+                                                cursor=runs["next_cursor"], db=db))
+
+    # Category-filtered reads: a per-category rollup recount and custom-category reapplies
+    from app.daily_rollups import DailyRollupStore
+    from app.database import AnalysisResult, User
+
+    user_id = db.query(User.id).filter(User.username == username).scalar()
+    DailyRollupStore(db, account_id).result_counts(AnalysisResult.category == "shopping")
+    insights._reapply_custom_rules(db, user_id, custom_category_id=category_id)
+    insights._reapply_custom_rules(db, user_id, senders=["sender1@domain1.example.com"])
+    db.rollback()
+
+
+def _full_scans(plan_rows, tables: set) -> list:
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        match = _SCAN.match(detail)
+        if not match:
+            continue
+        table = match.group(1)
+        if table in tables and table not in ALLOWED_SCANS:
+            scans.append(detail)
+    return scans
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fail when an endpoint query plan falls back to a full table scan")
+    parser.add_argument("--against", help="Explain the recorded queries on this database URL instead")
+    parser.add_argument("--verbose", action="store_true", help="Print every query plan")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="mailmind-plans-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'plans.db')}"
+    os.environ.setdefault("ENCRYPTION_KEY", "plan-check-" + "0" * 21)
+
+    from sqlalchemy import create_engine, event, text  # noqa: E402
+
+    from app.database import Base, SessionLocal, engine, init_db  # noqa: E402
+
+    init_db()
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")) and not executemany:
+            statements.append((statement, parameters))
+
+    db = SessionLocal()
+    try:
+        username, account_id, category_id = _seed(db)
+        statements.clear()
+        _exercise(db, username, account_id, category_id)
+    finally:
+        db.close()
+    event.remove(engine, "before_cursor_execute", _record)
+
+    explain_engine = create_engine(args.against) if args.against else engine
+    tables = set(Base.metadata.tables)
+    seen = set()
+    failures = 0
+    with explain_engine.connect() as conn:
+        for statement, parameters in statements:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            scans = _full_scans(plan, tables)
+            if scans or args.verbose:
+                print("-" * 72)
+                print(" ".join(statement.split()))
+                for row in plan:
+                    print(f"    {row[-1]}")
+            if scans:
+                failures += 1
+                for detail in scans:
+                    print(f"  FULL SCAN: {detail}")
+
+    print("=" * 72)
+    print(f"{len(seen)} distinct queries explained, {failures} with full table scans.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
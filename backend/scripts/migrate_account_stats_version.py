@@ -0,0 +1,86 @@
+"""
+Add account_stats.data_version.
+
+The insights response cache (app.response_cache) keys entries by each account's
+data_version. Creates account_stats if it does not exist yet, else adds the
+column; existing rows start at 0. New databases get both from init_db.
+
+Run (from backend/):
+  python3 -m scripts.migrate_account_stats_version --dry-run
+  python3 -m scripts.migrate_account_stats_version
+
+Set DATABASE_URL if needed.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+COLUMN = "data_version"
+
+
+def _abs_sqlite_url(url: str) -> str:
+    if not url.startswith("sqlite:///"):
+        return url
+    raw = url.replace("sqlite:///", "", 1)
+    if raw.startswith("./"):
+        raw = raw[2:]
+    if os.path.isabs(raw):
+        return f"sqlite:///{raw}"
+    abs_path = str((_backend_root / raw).resolve())
+    return f"sqlite:///{abs_path}"
+
+
+def _prepare_database_url() -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv(_backend_root / ".env")
+    url = os.getenv("DATABASE_URL", "sqlite:///./data/mailmind.db")
+    if url.startswith("sqlite:///"):
+        url = _abs_sqlite_url(url)
+        os.environ["DATABASE_URL"] = url
+    return url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Add account_stats.data_version")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would change, do not write")
+    args = parser.parse_args()
+
+    resolved = _prepare_database_url()
+    print(f"DATABASE_URL (resolved): {resolved}")
+
+    from app.database import AccountStats, engine  # noqa: E402
+
+    inspector = inspect(engine)
+    if not inspector.has_table(AccountStats.__tablename__):
+        print(f"Creating table {AccountStats.__tablename__} (rows are filled on first /summary)")
+        if not args.dry_run:
+            AccountStats.__table__.create(bind=engine, checkfirst=True)
+    elif COLUMN in {column["name"] for column in inspector.get_columns(AccountStats.__tablename__)}:
+        print(f"Column {COLUMN} already exists.")
+        return
+    else:
+        print(f"Adding column {COLUMN}")
+        if not args.dry_run:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"ALTER TABLE {AccountStats.__tablename__} ADD COLUMN {COLUMN} INTEGER NOT NULL DEFAULT 0"
+                ))
+
+    if args.dry_run:
+        print("Dry run: nothing written. Re-run without --dry-run to apply.")
+    else:
+        print("Migration complete.")
+
+
+if __name__ == "__main__":
+    main()
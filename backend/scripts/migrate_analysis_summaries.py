@@ -0,0 +1,184 @@
+"""
+Compact analysis_results: move the per-batch analysis blob into analysis_summaries.
+
+Older rows carry the full analyze_batch output (top senders, domains, up to 500
+subjects) inside every row's encrypted_analysis. This migration:
+
+  1) adds analysis_results.summary_id and creates analysis_summaries if missing
+  2) decrypts each result, stores its batch analysis once per (account, run, blob)
+     in analysis_summaries and re-encrypts the row with only its own fields
+  3) runs VACUUM so SQLite returns the freed pages to the filesystem
+
+Run (from backend/):
+  python3 -m scripts.migrate_analysis_summaries --dry-run
+  python3 -m scripts.migrate_analysis_summaries
+
+Set DATABASE_URL and ENCRYPTION_KEY if needed.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import func, text
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+BATCH_SIZE = 1000
+
+
+def _abs_sqlite_url(url: str) -> str:
+    if not url.startswith("sqlite:///"):
+        return url
+    raw = url.replace("sqlite:///", "", 1)
+    if raw.startswith("./"):
+        raw = raw[2:]
+    if os.path.isabs(raw):
+        return f"sqlite:///{raw}"
+    abs_path = str((_backend_root / raw).resolve())
+    return f"sqlite:///{abs_path}"
+
+
+def _prepare_database_url() -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv(_backend_root / ".env")
+    url = os.getenv("DATABASE_URL", "sqlite:///./data/mailmind.db")
+    if url.startswith("sqlite:///"):
+        url = _abs_sqlite_url(url)
+        os.environ["DATABASE_URL"] = url
+    return url
+
+
+def _has_summary_column(db) -> bool:
+    columns = [row[1] for row in db.execute(text("PRAGMA table_info(analysis_results)")).fetchall()]
+    return "summary_id" in columns
+
+
+def _ensure_schema(db) -> None:
+    from app.database import Base, engine  # noqa: E402
+
+    Base.metadata.create_all(bind=engine)
+    if not _has_summary_column(db):
+        print("Adding analysis_results.summary_id column...")
+        db.execute(text("ALTER TABLE analysis_results ADD COLUMN summary_id INTEGER REFERENCES analysis_summaries(id)"))
+        db.execute(text("CREATE INDEX IF NOT EXISTS ix_analysis_results_summary_id ON analysis_results (summary_id)"))
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move per-batch analysis out of analysis_results into analysis_summaries")
+    parser.add_argument("--dry-run", action="store_true", help="Count rows that would change, do not commit")
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip VACUUM after compacting")
+    args = parser.parse_args()
+
+    resolved = _prepare_database_url()
+    print(f"DATABASE_URL (resolved): {resolved}")
+
+    from app.database import SessionLocal, AnalysisResult, AnalysisSummary, EmailMetadata, EmailAccount  # noqa: E402
+    from app.encryption import EncryptionManager  # noqa: E402
+
+    db = SessionLocal()
+    try:
+        if not args.dry_run:
+            _ensure_schema(db)
+        elif not _has_summary_column(db):
+            print("Dry run: would add analysis_results.summary_id and create analysis_summaries.")
+
+        accounts = db.query(EmailAccount.id, EmailAccount.user_id).order_by(EmailAccount.id).all()
+        compacted = 0
+        summaries_created = 0
+        for account in accounts:
+            enc_manager = EncryptionManager(account.user_id)
+            # (run_id, sha256 of canonical analysis JSON) -> AnalysisSummary.id
+            summary_ids: dict = {}
+            last_id = 0
+            while True:
+                # Only the columns read here: databases this migrates may lack later columns
+                rows = (
+                    db.query(AnalysisResult.id, AnalysisResult.analysis_run_id, AnalysisResult.encrypted_analysis)
+                    .join(EmailMetadata, AnalysisResult.email_id == EmailMetadata.id)
+                    .filter(EmailMetadata.account_id == account.id, AnalysisResult.id > last_id)
+                    .order_by(AnalysisResult.id)
+                    .limit(BATCH_SIZE)
+                    .all()
+                )
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                updates = []
+                for row in rows:
+                    try:
+                        payload = enc_manager.decrypt_json(row.encrypted_analysis)
+                    except Exception as e:
+                        print(f"  result id={row.id}: cannot decrypt ({e}); left unchanged")
+                        continue
+                    if "analysis" not in payload:
+                        continue
+                    analysis = payload.pop("analysis")
+                    compacted += 1
+                    if args.dry_run:
+                        continue
+
+                    canonical = json.dumps(analysis, sort_keys=True)
+                    key = (row.analysis_run_id, hashlib.sha256(canonical.encode()).hexdigest())
+                    if key not in summary_ids:
+                        summary = AnalysisSummary(
+                            account_id=account.id,
+                            analysis_run_id=row.analysis_run_id,
+                            encrypted_summary=enc_manager.encrypt(analysis),
+                            email_count=0,
+                        )
+                        db.add(summary)
+                        db.flush()
+                        summary_ids[key] = summary.id
+                        summaries_created += 1
+                    updates.append({
+                        "id": row.id,
+                        "summary_id": summary_ids[key],
+                        "encrypted_analysis": enc_manager.encrypt(payload),
+                    })
+
+                if not args.dry_run:
+                    db.bulk_update_mappings(AnalysisResult, updates)
+                    db.commit()
+                print(f"  account_id={account.id}: processed results up to id={last_id}")
+
+            if not args.dry_run and summary_ids:
+                for summary_id in summary_ids.values():
+                    count = db.query(func.count(AnalysisResult.id)).filter(
+                        AnalysisResult.summary_id == summary_id
+                    ).scalar()
+                    db.query(AnalysisSummary).filter(AnalysisSummary.id == summary_id).update({"email_count": count})
+                db.commit()
+
+        if args.dry_run:
+            print(f"Dry run: would compact {compacted} analysis result(s).")
+            db.rollback()
+            return
+
+        print(f"Compacted {compacted} analysis result(s) into {summaries_created} summary row(s).")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if not args.no_vacuum:
+        from app.database import engine  # noqa: E402
+
+        print("Running VACUUM...")
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        print("VACUUM complete.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Add the per-day coverage columns of analysis_checkpoints.
+
+day_counts and frontier_day (app.checkpoints) let a resumed range fetch only the days
+it has not covered yet. Creates analysis_checkpoints if it does not exist yet, else
+adds the missing columns; existing checkpoints start without coverage and resume
+from their cursor. New databases get both from init_db.
+
+Run (from backend/):
+  python3 -m scripts.migrate_checkpoint_coverage --dry-run
+  python3 -m scripts.migrate_checkpoint_coverage
+
+Set DATABASE_URL if needed.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+COLUMNS = {"day_counts": "JSON", "frontier_day": "DATE"}
+
+
+def _abs_sqlite_url(url: str) -> str:
+    if not url.startswith("sqlite:///"):
+        return url
+    raw = url.replace("sqlite:///", "", 1)
+    if raw.startswith("./"):
+        raw = raw[2:]
+    if os.path.isabs(raw):
+        return f"sqlite:///{raw}"
+    abs_path = str((_backend_root / raw).resolve())
+    return f"sqlite:///{abs_path}"
+
+
+def _prepare_database_url() -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv(_backend_root / ".env")
+    url = os.getenv("DATABASE_URL", "sqlite:///./data/mailmind.db")
+    if url.startswith("sqlite:///"):
+        url = _abs_sqlite_url(url)
+        os.environ["DATABASE_URL"] = url
+    return url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Add analysis_checkpoints coverage columns")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would change, do not write")
+    args = parser.parse_args()
+
+    resolved = _prepare_database_url()
+    print(f"DATABASE_URL (resolved): {resolved}")
+
+    from app.database import AnalysisCheckpoint, engine  # noqa: E402
+
+    table = AnalysisCheckpoint.__tablename__
+    inspector = inspect(engine)
+    if not inspector.has_table(table):
+        print(f"Creating table {table}")
+        if not args.dry_run:
+            AnalysisCheckpoint.__table__.create(bind=engine, checkfirst=True)
+    else:
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for name, column_type in COLUMNS.items():
+            if name in existing:
+                print(f"Column {name} already exists.")
+                continue
+            print(f"Adding column {name}")
+            if not args.dry_run:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
+
+    if args.dry_run:
+        print("Dry run: nothing written. Re-run without --dry-run to apply.")
+    else:
+        print("Migration complete.")
+
+
+if __name__ == "__main__":
+    main()
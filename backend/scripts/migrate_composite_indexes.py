@@ -0,0 +1,116 @@
+"""
+Create the composite indexes behind the dashboard queries on an existing database.
+
+init_db creates indexes only with their tables, so databases created before the
+indexes were declared on the models lack them. This creates every index declared
+on INDEXED_TABLES that is missing and drops indexes replaced by wider ones
+(SUPERSEDED_INDEXES). scripts/check_query_plans.py --against <url> then confirms
+the read endpoints avoid full scans.
+
+Run (from backend/):
+  python3 -m scripts.migrate_composite_indexes --dry-run
+  python3 -m scripts.migrate_composite_indexes
+
+Set DATABASE_URL if needed.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+INDEXED_TABLES = (
+    "email_accounts",
+    "email_metadata",
+    "analysis_results",
+    "analysis_runs",
+    "processed_date_ranges",
+    "daily_rollups",
+)
+SUPERSEDED_INDEXES = (
+    # (account_id, sender_normalized), now a prefix of ix_email_metadata_account_sender_name
+    "ix_email_metadata_account_sender_normalized",
+    # (category), now a prefix of ix_analysis_results_category_email
+    "ix_analysis_results_category",
+    # (account_id, day, email_count), served the frequency endpoints, which now group email_metadata
+    "ix_daily_rollups_account_day_count",
+)
+
+
+def _abs_sqlite_url(url: str) -> str:
+    if not url.startswith("sqlite:///"):
+        return url
+    raw = url.replace("sqlite:///", "", 1)
+    if raw.startswith("./"):
+        raw = raw[2:]
+    if os.path.isabs(raw):
+        return f"sqlite:///{raw}"
+    abs_path = str((_backend_root / raw).resolve())
+    return f"sqlite:///{abs_path}"
+
+
+def _prepare_database_url() -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv(_backend_root / ".env")
+    url = os.getenv("DATABASE_URL", "sqlite:///./data/mailmind.db")
+    if url.startswith("sqlite:///"):
+        url = _abs_sqlite_url(url)
+        os.environ["DATABASE_URL"] = url
+    return url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create missing composite indexes")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would change, do not write")
+    args = parser.parse_args()
+
+    resolved = _prepare_database_url()
+    print(f"DATABASE_URL (resolved): {resolved}")
+
+    from app.database import Base, engine  # noqa: E402
+
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    created = 0
+    present = set()
+    for table_name in INDEXED_TABLES:
+        if table_name not in tables:
+            print(f"Table {table_name} does not exist; init_db creates it with its indexes.")
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table_name)}
+        present |= existing
+        for index in sorted(Base.metadata.tables[table_name].indexes, key=lambda index: index.name):
+            if index.name in existing:
+                print(f"Index {index.name} already exists.")
+                continue
+            columns = ", ".join(column.name for column in index.columns) or str(index.expressions)
+            print(f"Creating index {index.name} on {table_name} ({columns})")
+            if not args.dry_run:
+                index.create(bind=engine, checkfirst=True)
+            created += 1
+
+    superseded = [name for name in SUPERSEDED_INDEXES if name in present]
+    for name in superseded:
+        print(f"Dropping index {name} (superseded)")
+
+    if args.dry_run:
+        print(f"Dry run: would create {created} index(es) and drop {len(superseded)}. "
+              "Re-run without --dry-run to apply.")
+        return
+
+    with engine.begin() as conn:
+        for name in superseded:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    print(f"Migration complete: created {created} index(es), dropped {len(superseded)}.")
+
+
+if __name__ == "__main__":
+    main()
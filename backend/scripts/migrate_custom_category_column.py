@@ -0,0 +1,116 @@
+"""
+Add and backfill analysis_results.custom_category_id.
+
+Adds the column (resolved at ingestion by app.custom_rules) and its index, then
+resolves it for existing results of every user with sender mappings or subject
+rules. New databases get the column from init_db; only the backfill applies.
+
+Run (from backend/):
+  python3 -m scripts.migrate_custom_category_column --dry-run
+  python3 -m scripts.migrate_custom_category_column
+
+Set DATABASE_URL if needed.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+COLUMN = "custom_category_id"
+
+
+def _abs_sqlite_url(url: str) -> str:
+    if not url.startswith("sqlite:///"):
+        return url
+    raw = url.replace("sqlite:///", "", 1)
+    if raw.startswith("./"):
+        raw = raw[2:]
+    if os.path.isabs(raw):
+        return f"sqlite:///{raw}"
+    abs_path = str((_backend_root / raw).resolve())
+    return f"sqlite:///{abs_path}"
+
+
+def _prepare_database_url() -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv(_backend_root / ".env")
+    url = os.getenv("DATABASE_URL", "sqlite:///./data/mailmind.db")
+    if url.startswith("sqlite:///"):
+        url = _abs_sqlite_url(url)
+        os.environ["DATABASE_URL"] = url
+    return url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Add and backfill analysis_results.custom_category_id")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would change, do not write")
+    args = parser.parse_args()
+
+    resolved = _prepare_database_url()
+    print(f"DATABASE_URL (resolved): {resolved}")
+
+    from app.database import (  # noqa: E402
+        SessionLocal,
+        AnalysisResult,
+        EmailAccount,
+        SenderCategoryMapping,
+        SubjectRule,
+        engine,
+    )
+    from app.custom_rules import CustomRuleEngine  # noqa: E402
+
+    existing = {column["name"] for column in inspect(engine).get_columns("analysis_results")}
+    if COLUMN in existing:
+        print(f"Column {COLUMN} already exists.")
+    else:
+        print(f"Adding column {COLUMN}")
+        if args.dry_run:
+            print("Dry run: the backfill needs the column; re-run without --dry-run to apply.")
+            return
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE analysis_results ADD COLUMN {COLUMN} INTEGER"))
+    if not args.dry_run:
+        for index in AnalysisResult.__table__.indexes:
+            if any(column.name == COLUMN for column in index.columns):
+                index.create(bind=engine, checkfirst=True)
+                print(f"Index {index.name} ready.")
+
+    db = SessionLocal()
+    try:
+        user_ids = sorted(
+            {user_id for (user_id,) in db.query(SenderCategoryMapping.user_id).distinct()}
+            | {user_id for (user_id,) in db.query(SubjectRule.user_id).distinct()}
+        )
+        updated = 0
+        for user_id in user_ids:
+            account_ids = [
+                account_id for (account_id,) in db.query(EmailAccount.id).filter(EmailAccount.user_id == user_id)
+            ]
+            count = CustomRuleEngine.load(db, user_id).reapply(db, account_ids)
+            print(f"  user {user_id}: {count} result(s) resolved")
+            updated += count
+
+        if args.dry_run:
+            print(f"Dry run: would update {updated} result(s). Re-run without --dry-run to apply.")
+            db.rollback()
+        else:
+            db.commit()
+            print(f"Migration complete: updated {updated} result(s).")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
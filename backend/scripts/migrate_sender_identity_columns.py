@@ -0,0 +1,151 @@
+"""
+Add and backfill the normalized sender identity columns of email_metadata.
+
+Adds sender_normalized, sender_domain and sender_registrable_domain (computed by
+app.sender_identity at ingest) plus their (account_id, column) indexes, then fills
+the columns for existing rows in id order, a batch at a time. New databases get
+the columns from init_db; only the backfill applies to them. Indexes replaced by
+wider ones (SUPERSEDED_INDEXES) are dropped.
+
+Run (from backend/):
+  python3 -m scripts.migrate_sender_identity_columns --dry-run
+  python3 -m scripts.migrate_sender_identity_columns
+  python3 -m scripts.migrate_sender_identity_columns --recompute   # e.g. after replacing the suffix list
+
+Set DATABASE_URL if needed.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import func, inspect, text
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+COLUMNS = ("sender_normalized", "sender_domain", "sender_registrable_domain")
+BATCH_SIZE = 5000
+# (account_id, sender_domain), now a prefix of ix_email_metadata_account_domain_name
+SUPERSEDED_INDEXES = ("ix_email_metadata_account_sender_domain",)
+
+
+def _abs_sqlite_url(url: str) -> str:
+    if not url.startswith("sqlite:///"):
+        return url
+    raw = url.replace("sqlite:///", "", 1)
+    if raw.startswith("./"):
+        raw = raw[2:]
+    if os.path.isabs(raw):
+        return f"sqlite:///{raw}"
+    abs_path = str((_backend_root / raw).resolve())
+    return f"sqlite:///{abs_path}"
+
+
+def _prepare_database_url() -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv(_backend_root / ".env")
+    url = os.getenv("DATABASE_URL", "sqlite:///./data/mailmind.db")
+    if url.startswith("sqlite:///"):
+        url = _abs_sqlite_url(url)
+        os.environ["DATABASE_URL"] = url
+    return url
+
+
+def _add_missing_columns(engine, dry_run: bool) -> list:
+    """Add the columns and indexes; returns the columns that were missing."""
+    from app.database import EmailMetadata  # noqa: E402
+
+    existing = {column["name"] for column in inspect(engine).get_columns("email_metadata")}
+    missing = [name for name in COLUMNS if name not in existing]
+    for name in COLUMNS:
+        if name not in missing:
+            print(f"Column {name} already exists.")
+            continue
+        print(f"Adding column {name}")
+        if not dry_run:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE email_metadata ADD COLUMN {name} VARCHAR"))
+
+    if dry_run:
+        return missing
+    for index in EmailMetadata.__table__.indexes:
+        if any(column.name in COLUMNS for column in index.columns):
+            index.create(bind=engine, checkfirst=True)
+            print(f"Index {index.name} ready.")
+    with engine.begin() as conn:
+        for name in SUPERSEDED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            print(f"Index {name} dropped (superseded).")
+    return missing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Add and backfill normalized sender identity columns")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would change, do not write")
+    parser.add_argument(
+        "--recompute",
+        action="store_true",
+        help="Recompute every row, not only rows with an empty sender_normalized",
+    )
+    args = parser.parse_args()
+
+    resolved = _prepare_database_url()
+    print(f"DATABASE_URL (resolved): {resolved}")
+
+    from app.database import SessionLocal, EmailMetadata, engine  # noqa: E402
+    from app.sender_identity import normalize_sender  # noqa: E402
+
+    missing = _add_missing_columns(engine, args.dry_run)
+
+    db = SessionLocal()
+    try:
+        if args.dry_run and missing:
+            # The backfill query needs the columns; every row would be filled
+            total = db.query(func.count(EmailMetadata.id)).scalar()
+            print(f"Dry run: would backfill {total} row(s) once the columns exist.")
+            return
+
+        updated = 0
+        last_id = 0
+        while True:
+            query = db.query(EmailMetadata.id, EmailMetadata.sender_email).filter(EmailMetadata.id > last_id)
+            if not args.recompute:
+                query = query.filter(EmailMetadata.sender_normalized.is_(None))
+            rows = query.order_by(EmailMetadata.id).limit(BATCH_SIZE).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            mappings = []
+            for row in rows:
+                identity = normalize_sender(row.sender_email)
+                mappings.append({
+                    "id": row.id,
+                    "sender_normalized": identity.address,
+                    "sender_domain": identity.domain,
+                    "sender_registrable_domain": identity.registrable_domain,
+                })
+            if not args.dry_run:
+                db.bulk_update_mappings(EmailMetadata, mappings)
+                db.commit()
+            updated += len(mappings)
+            print(f"  ... {updated} row(s) through id {last_id}")
+
+        if args.dry_run:
+            print(f"Dry run: would backfill {updated} row(s). Re-run without --dry-run to apply.")
+            db.rollback()
+        else:
+            print(f"Migration complete: backfilled {updated} row(s).")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
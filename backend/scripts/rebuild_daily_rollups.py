@@ -0,0 +1,101 @@
+"""
+Rebuild the daily_rollups table from analysis results.
+
+Recomputes the (day, category, domain) counts of each account (or one account)
+from its analysis results. Use it to fill the table for accounts analyzed before
+it existed, or to repair it; analysis runs keep it current afterwards. The table
+itself is created by init_db; indexes added since it was created are created here.
+
+Run (from backend/):
+  python3 -m scripts.rebuild_daily_rollups --dry-run
+  python3 -m scripts.rebuild_daily_rollups
+  python3 -m scripts.rebuild_daily_rollups --account-id 3
+
+Set DATABASE_URL if needed.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+
+def _abs_sqlite_url(url: str) -> str:
+    if not url.startswith("sqlite:///"):
+        return url
+    raw = url.replace("sqlite:///", "", 1)
+    if raw.startswith("./"):
+        raw = raw[2:]
+    if os.path.isabs(raw):
+        return f"sqlite:///{raw}"
+    abs_path = str((_backend_root / raw).resolve())
+    return f"sqlite:///{abs_path}"
+
+
+def _prepare_database_url() -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv(_backend_root / ".env")
+    url = os.getenv("DATABASE_URL", "sqlite:///./data/mailmind.db")
+    if url.startswith("sqlite:///"):
+        url = _abs_sqlite_url(url)
+        os.environ["DATABASE_URL"] = url
+    return url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild daily rollups from analysis results")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would change, do not write")
+    parser.add_argument("--account-id", type=int, help="Only rebuild this account")
+    args = parser.parse_args()
+
+    resolved = _prepare_database_url()
+    print(f"DATABASE_URL (resolved): {resolved}")
+
+    from app.database import SessionLocal, DailyRollup, EmailAccount, engine, init_db  # noqa: E402
+    from app.daily_rollups import DailyRollupStore  # noqa: E402
+
+    if not args.dry_run:
+        init_db()
+        for index in DailyRollup.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+            print(f"Index {index.name} ready.")
+
+    db = SessionLocal()
+    try:
+        query = db.query(EmailAccount.id).order_by(EmailAccount.id)
+        if args.account_id is not None:
+            query = query.filter(EmailAccount.id == args.account_id)
+        account_ids = [account_id for (account_id,) in query]
+        if not account_ids:
+            print("No matching accounts.")
+            return
+
+        for account_id in account_ids:
+            store = DailyRollupStore(db, account_id)
+            if args.dry_run:
+                counts = store.result_counts()
+                print(f"  account {account_id}: would write {len(counts)} row(s) for {sum(counts.values())} result(s)")
+                continue
+            rows = store.rebuild()
+            db.commit()
+            print(f"  account {account_id}: {rows} row(s)")
+
+        if args.dry_run:
+            print("Dry run: no changes written. Re-run without --dry-run to apply.")
+        else:
+            print(f"Rebuild complete for {len(account_ids)} account(s).")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
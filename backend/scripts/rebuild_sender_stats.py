@@ -0,0 +1,108 @@
+"""
+Rebuild the sender_stats and sender_sketches tables and add the analysis_runs
+pagination indexes.
+
+Recomputes the per-sender email counts behind /insights/senders and the monthly
+distinct-sender sketches behind /summary and /insights/distinct-senders for each
+account (or one account) from email_metadata, and creates the (created_at, id)
+indexes the keyset-paginated /analysis/runs reads. Ingestion keeps both tables
+current afterwards; the endpoints also build a missing account on first read.
+
+Run (from backend/):
+  python3 -m scripts.rebuild_sender_stats --dry-run
+  python3 -m scripts.rebuild_sender_stats
+  python3 -m scripts.rebuild_sender_stats --account-id 3
+
+Set DATABASE_URL if needed.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+_backend_root = Path(__file__).resolve().parent.parent
+if str(_backend_root) not in sys.path:
+    sys.path.insert(0, str(_backend_root))
+
+
+def _abs_sqlite_url(url: str) -> str:
+    if not url.startswith("sqlite:///"):
+        return url
+    raw = url.replace("sqlite:///", "", 1)
+    if raw.startswith("./"):
+        raw = raw[2:]
+    if os.path.isabs(raw):
+        return f"sqlite:///{raw}"
+    abs_path = str((_backend_root / raw).resolve())
+    return f"sqlite:///{abs_path}"
+
+
+def _prepare_database_url() -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv(_backend_root / ".env")
+    url = os.getenv("DATABASE_URL", "sqlite:///./data/mailmind.db")
+    if url.startswith("sqlite:///"):
+        url = _abs_sqlite_url(url)
+        os.environ["DATABASE_URL"] = url
+    return url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild sender stats and sketches and add analysis run indexes")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would change, do not write")
+    parser.add_argument("--account-id", type=int, help="Only rebuild this account")
+    args = parser.parse_args()
+
+    resolved = _prepare_database_url()
+    print(f"DATABASE_URL (resolved): {resolved}")
+
+    from sqlalchemy import func  # noqa: E402
+
+    from app.database import SessionLocal, AnalysisRun, EmailAccount, EmailMetadata, engine, init_db  # noqa: E402
+    from app.sender_stats import SenderStatsStore  # noqa: E402
+    from app.sender_sketches import SenderSketchStore  # noqa: E402
+
+    if not args.dry_run:
+        init_db()
+        for index in AnalysisRun.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+            print(f"Index {index.name} ready.")
+
+    db = SessionLocal()
+    try:
+        query = db.query(EmailAccount.id).order_by(EmailAccount.id)
+        if args.account_id is not None:
+            query = query.filter(EmailAccount.id == args.account_id)
+        account_ids = [account_id for (account_id,) in query]
+        if not account_ids:
+            print("No matching accounts.")
+            return
+
+        for account_id in account_ids:
+            if args.dry_run:
+                senders = db.query(func.count(func.distinct(EmailMetadata.sender_normalized))).filter(
+                    EmailMetadata.account_id == account_id
+                ).scalar()
+                print(f"  account {account_id}: would write about {senders} row(s)")
+                continue
+            rows = SenderStatsStore(db, account_id).rebuild()
+            months = SenderSketchStore(db, account_id).rebuild()
+            db.commit()
+            print(f"  account {account_id}: {rows} sender row(s), {months} monthly sketch(es)")
+
+        if args.dry_run:
+            print("Dry run: no changes written. Re-run without --dry-run to apply.")
+        else:
+            print(f"Rebuild complete for {len(account_ids)} account(s).")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -67,6 +67,7 @@ export interface AnalysisRun {
   id: number
   account_id: number
   status: string
+  stage?: string | null
   emails_processed: number
   total_emails?: number | null
   current_chunk?: number | null
@@ -88,12 +89,16 @@ export interface AnalysisRunsResponse {
   runs: AnalysisRun[]
   total: number
   has_more: boolean
+  /** Pass as cursor to fetch the next page; null on the last page */
+  next_cursor: string | null
 }
 
 export interface Summary {
   total_accounts: number
   total_emails: number
   total_senders: number
+  /** False when total_senders is a HyperLogLog estimate (several accounts) */
+  total_senders_exact: boolean
   accounts: Array<{
     id: number
     email: string
@@ -123,6 +128,8 @@ export interface SenderInsights {
   offset: number
   limit: number
   has_more: boolean
+  /** Pass as cursor to fetch the next page; null on the last page */
+  next_cursor: string | null
 }
 
 export interface CategoryInsights {
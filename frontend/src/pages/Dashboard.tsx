@@ -31,7 +31,7 @@ export default function Dashboard() {
   const [currentTab, setCurrentTab] = useState<TabType>('analysis')
   const [showAddAccountModal, setShowAddAccountModal] = useState(false)
   const [analysisRuns, setAnalysisRuns] = useState<AnalysisRun[]>([])
-  const [analysisRunsOffset, setAnalysisRunsOffset] = useState(0)
+  const [analysisRunsCursor, setAnalysisRunsCursor] = useState<string | null>(null)
   const [hasMoreRuns, setHasMoreRuns] = useState(false)
   const [loadingMoreRuns, setLoadingMoreRuns] = useState(false)
   const [currentRunningRunId, setCurrentRunningRunId] = useState<number | null>(null)
@@ -149,7 +149,7 @@ export default function Dashboard() {
       loadAnalysisRuns(true)
     } else {
       setAnalysisRuns([])
-      setAnalysisRunsOffset(0)
+      setAnalysisRunsCursor(null)
       setHasMoreRuns(false)
       setCurrentRunningRunId(null)
     }
@@ -175,25 +175,25 @@ export default function Dashboard() {
   const loadAnalysisRuns = async (reset: boolean = false) => {
     if (!selectedAccount || !username) {
       setAnalysisRuns([])
-      setAnalysisRunsOffset(0)
+      setAnalysisRunsCursor(null)
       setHasMoreRuns(false)
       return
     }
     
-    const offset = reset ? 0 : analysisRunsOffset
+    const cursor = reset ? null : analysisRunsCursor
     const limit = 5
     
     try {
-      const response = await api.get(`/api/analysis/runs?username=${username}&account_id=${selectedAccount}&limit=${limit}&offset=${offset}`)
+      const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''
+      const response = await api.get(`/api/analysis/runs?username=${username}&account_id=${selectedAccount}&limit=${limit}${cursorParam}`)
       const data = response.data
       
       if (reset) {
         setAnalysisRuns(data.runs || [])
-        setAnalysisRunsOffset(limit)
       } else {
         setAnalysisRuns(prev => [...prev, ...(data.runs || [])])
-        setAnalysisRunsOffset(prev => prev + limit)
       }
+      setAnalysisRunsCursor(data.next_cursor || null)
       setHasMoreRuns(data.has_more || false)
     } catch (err: any) {
       console.error('Failed to load analysis runs:', err)